@@ -0,0 +1,132 @@
+"""
+Savings of the frame policies on pages with many iframes, e.g. ads, against a local server (no network access
+needed). The page embeds cross-origin (localhost instead of 127.0.0.1) and same-origin iframes.
+
+For every browser and case (no evasions, then all evasions with every frame policy) measures:
+ - load: goto() until the load event, in ms
+ - script: CPU time spent running scripts while loading, in ms (chromium only, via CDP Performance.getMetrics)
+ - js_heap: JS heap used by the loaded page and its iframes in bytes (chromium only)
+ - stealthed_frames: how many frames ran the evasions
+
+Chromium is launched without site isolation so the page's metrics include its cross-origin iframes:
+
+    python -m benchmarks.bench_frames --browsers chromium firefox --cross-origin 30 --output results.jsonl
+"""
+import argparse
+import asyncio
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from benchmarks.common import Recorder, local_server, summarize
+from playwright_stealth import ALL_EVASIONS_DISABLED_KWARGS, Stealth
+
+CASES: List[Tuple[str, Stealth]] = [
+    ("none", Stealth(**ALL_EVASIONS_DISABLED_KWARGS, navigator_platform_override="stealth-platform")),
+    *(
+        (f"all:{policy}", Stealth(frame_policy=policy, navigator_platform_override="stealth-platform"))
+        for policy in ("all", "same-origin", "top")
+    ),
+]
+
+# a bit of script in every frame, like the ad and tracking snippets this is about
+FRAME = b"<!doctype html><html><body><p>frame</p><script>document.title = navigator.userAgent;</script></body></html>"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        """/page?cross=N&same=M: a page with N cross-origin and M same-origin iframes, anything else: FRAME"""
+        url = urlsplit(self.path)
+        body = FRAME
+        if url.path == "/page":
+            query = parse_qs(url.query)
+            port = self.server.server_port
+            sources = [f"http://localhost:{port}/frame/{i}" for i in range(int(query["cross"][0]))]
+            sources += [f"/frame/{i}" for i in range(int(query["same"][0]))]
+            body = ("<!doctype html><html><body>" + "".join(f"<iframe src='{src}'></iframe>" for src in sources)
+                    + "</body></html>").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+async def metrics(session: Optional[async_api.CDPSession]) -> Dict[str, float]:
+    if session is None:
+        return {}
+    await session.send("HeapProfiler.collectGarbage")
+    result = await session.send("Performance.getMetrics")
+    return {metric["name"]: metric["value"] for metric in result["metrics"]}
+
+
+async def run_case(browser: async_api.Browser, stealth: Stealth, url: str, iterations: int) -> Dict[str, Any]:
+    samples: Dict[str, List[float]] = {"load": [], "script": [], "js_heap": [], "stealthed_frames": []}
+    context = await browser.new_context()
+    await stealth.apply_stealth_async(context)
+    try:
+        # the first iteration warms up the browser and isn't recorded
+        for iteration in range(iterations + 1):
+            page = await context.new_page()
+            session = None
+            if browser.browser_type.name == "chromium":
+                session = await context.new_cdp_session(page)
+                await session.send("Performance.enable")
+            before = await metrics(session)
+            started = time.perf_counter()
+            await page.goto(url, wait_until="load")
+            loaded = time.perf_counter()
+            after = await metrics(session)
+            platforms = [await frame.evaluate("navigator.platform") for frame in page.frames]
+            await page.close()
+
+            if iteration == 0:
+                continue
+            samples["load"].append((loaded - started) * 1000)
+            samples["stealthed_frames"].append(platforms.count("stealth-platform"))
+            if after:
+                samples["script"].append((after["ScriptDuration"] - before["ScriptDuration"]) * 1000)
+                samples["js_heap"].append(after["JSHeapUsedSize"])
+    finally:
+        await context.close()
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+async def main(browsers: List[str], iterations: int, cross_origin: int, same_origin: int,
+               output: Optional[str]) -> None:
+    with open(output, "a") if output else nullcontext() as output_file, local_server(_Handler) as url:
+        page_url = f"{url}/page?cross={cross_origin}&same={same_origin}"
+        async with async_playwright() as playwright:
+            for browser_type in browsers:
+                args = []
+                if browser_type == "chromium":
+                    args = ["--disable-site-isolation-trials", "--disable-features=IsolateOrigins,site-per-process"]
+                browser = await playwright[browser_type].launch(args=args)
+                recorder = Recorder(output_file, browser=browser_type, browser_version=browser.version)
+                for case, stealth in CASES:
+                    result = await run_case(browser, stealth, page_url, iterations)
+                    recorder.record("frames", case=case, iterations=iterations, cross_origin=cross_origin,
+                                    same_origin=same_origin, **result)
+                await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--browsers", nargs="+", default=["chromium", "firefox"])
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--cross-origin", type=int, default=20, help="cross-origin iframes per page")
+    parser.add_argument("--same-origin", type=int, default=2, help="same-origin iframes per page")
+    parser.add_argument("--output", help="append results to this JSON lines file")
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.browsers, arguments.iterations, arguments.cross_origin, arguments.same_origin,
+                     arguments.output))
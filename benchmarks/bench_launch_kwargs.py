@@ -0,0 +1,105 @@
+"""
+Micro-benchmark of the per-launch overhead added by the hooked launch methods (CLI arg patching).
+
+Compares the previous implementation (inspect.signature + deepcopy on every launch, copied unchanged from before
+signatures were cached) with the current one. No browser is started. Prints one JSON object per case:
+
+    python -m benchmarks.bench_launch_kwargs
+"""
+import inspect
+import json
+import re
+import timeit
+import warnings
+from collections.abc import Callable
+from copy import deepcopy
+from typing import Any, Dict, List, Optional
+
+from playwright import async_api
+
+from playwright_stealth import Stealth
+
+LAUNCH_KWARGS = {
+    "headless": True,
+    "args": ["--mute-audio", "--disable-gpu"],
+    "proxy": {"server": "http://localhost:3128", "username": "user", "password": "secret"},
+    "env": {f"VAR_{i}": "x" * 64 for i in range(200)},
+}
+
+
+class PreviousStealth(Stealth):
+    """The CLI arg patching before signatures were cached and the deepcopy was dropped, kept for comparison"""
+
+    def _kwargs_with_patched_cli_arg(self, method: Callable, packed_kwargs: Dict[str, Any], chromium_mode: bool) -> \
+            Dict[str, Any]:
+        signature = inspect.signature(method).parameters
+        args_parameter = signature.get("args")
+
+        # deep just in case
+        new_kwargs = deepcopy(packed_kwargs)
+        if args_parameter is not None:
+            if chromium_mode and not self.init_scripts_only:
+                new_cli_args = new_kwargs.get("args", args_parameter.default)
+                if self.navigator_webdriver:
+                    new_cli_args = self._patch_blink_features_cli_args(new_cli_args or [])
+                if self.navigator_languages:
+                    languages_cli_flag = f"--accept-lang={','.join(self.navigator_languages_override)}"
+                    new_cli_args = self._patch_cli_arg(new_cli_args or [], languages_cli_flag)
+                new_kwargs["args"] = new_cli_args
+        return new_kwargs
+
+    @staticmethod
+    def _patch_blink_features_cli_args(existing_args: Optional[List[str]]) -> List[str]:
+        """Patches CLI args list to disable AutomationControlled blink feature, while preserving other args"""
+        new_args = []
+        disable_blink_features_prefix = "--disable-blink-features="
+        automation_controlled_feature_name = "AutomationControlled"
+        for arg in existing_args or []:
+            stripped_arg = arg.strip()
+            if stripped_arg.startswith(disable_blink_features_prefix):
+                if automation_controlled_feature_name not in stripped_arg:
+                    stripped_arg += f",{automation_controlled_feature_name}"
+                new_args.append(stripped_arg)
+            else:
+                new_args.append(arg)
+        else:  # no break
+            # the user has specified no extra blink features disabled,
+            # so no need to be careful how we modify the command line
+            new_args.append(f"{disable_blink_features_prefix}{automation_controlled_feature_name}")
+        return new_args
+
+    @staticmethod
+    def _patch_cli_arg(existing_args: List[str], flag: str) -> List[str]:
+        """Patches CLI args list with any arg, warns if the user passed their own value in themselves"""
+        new_args = []
+        switch_name = re.search("(.*)=?", flag).group(1)
+        for arg in existing_args:
+            stripped_arg = arg.strip()
+            if stripped_arg.startswith(switch_name):
+                warnings.warn("playwright-stealth is trying to modify a flag you have set yourself already."
+                              f"Either disable the mitigation or don't specify this flag manually {flag=}"
+                              f"to avoid this warning. playwright-stealth has overridden your flag")
+                new_args.append(flag)
+                break
+            else:
+                new_args.append(arg)
+        else:  # no break
+            # none of the existing switches overlap with the one we're trying to set
+            new_args.append(flag)
+        return new_args
+
+
+def main(number: int = 2000) -> None:
+    stealth, previous = Stealth(), PreviousStealth()
+    method = async_api.BrowserType.launch
+    cases = {
+        "previous": lambda: previous._kwargs_with_patched_cli_arg(method, LAUNCH_KWARGS, chromium_mode=True),
+        "current": lambda: stealth._kwargs_with_patched_cli_arg(method, LAUNCH_KWARGS, chromium_mode=True),
+    }
+    for name, case in cases.items():
+        best = min(timeit.repeat(case, number=number, repeat=5)) / number
+        print(json.dumps({"benchmark": "launch_kwargs", "case": name, "seconds_per_launch": best}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Overhead of the evasions on page creation and navigation, against a local server (no network access needed).
+
+For every browser and case (no evasions, all evasions with a shared or an option-specialized bundle, each evasion
+alone and all evasions but one) measures:
+ - new_page: new_page() including registering the payload, in ms
+ - load: goto() until the load event, in ms
+ - evaluate: time spent running the payload itself in the page, in ms
+ - js_heap: JS heap used by a loaded page in bytes, via CDP Performance.getMetrics on chromium and
+   performance.memory where a browser has it. Firefox and WebKit expose neither, their rows have js_heap_source null
+   (unsupported) instead of a measurement
+
+Prints one JSON object per browser and case, results can be appended to a file to track them over time:
+
+    python -m benchmarks.bench_pages --browsers chromium firefox --iterations 20 --output results.jsonl
+"""
+import argparse
+import asyncio
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from benchmarks.common import Recorder, local_server, summarize
+from playwright_stealth import ALL_EVASIONS_DISABLED_KWARGS, Stealth
+
+EVASIONS = list(ALL_EVASIONS_DISABLED_KWARGS)
+
+# runs the payload in a page that wasn't stealthed yet and reports how long that took
+EVALUATE_PAYLOAD = """script => {
+    const started = performance.now();
+    (0, eval)(script);
+    return performance.now() - started;
+}"""
+
+
+def cases(evasions: List[str], without: bool) -> List[Tuple[str, Stealth]]:
+    result = [
+        ("none", Stealth(**ALL_EVASIONS_DISABLED_KWARGS)),
+        ("all", Stealth()),
+        ("all:specialized", Stealth(specialize_payload=True)),
+    ]
+    result += [(f"only:{name}", Stealth(**{**ALL_EVASIONS_DISABLED_KWARGS, name: True})) for name in evasions]
+    if without:
+        result += [(f"without:{name}", Stealth(**{name: False})) for name in evasions]
+    return result
+
+
+# non-standard, but the only in-page heap size there is (measureUserAgentSpecificMemory needs cross-origin isolation)
+PERFORMANCE_MEMORY = "() => performance.memory ? performance.memory.usedJSHeapSize : null"
+
+
+async def js_heap_used(page: async_api.Page) -> Tuple[Optional[int], Optional[str]]:
+    """Returns: the JS heap used by the page in bytes and how it was measured, (None, None) if it can't be"""
+    if page.context.browser.browser_type.name == "chromium":
+        session = await page.context.new_cdp_session(page)
+        try:
+            await session.send("HeapProfiler.collectGarbage")
+            await session.send("Performance.enable")
+            metrics = await session.send("Performance.getMetrics")
+            heap = next(int(metric["value"]) for metric in metrics["metrics"] if metric["name"] == "JSHeapUsedSize")
+            return heap, "cdp"
+        finally:
+            await session.detach()
+    heap = await page.evaluate(PERFORMANCE_MEMORY)
+    return (heap, "performance.memory") if heap is not None else (None, None)
+
+
+async def run_case(browser: async_api.Browser, stealth: Stealth, url: str, iterations: int) -> Dict[str, Any]:
+    # the engine's payload variant, the one hooked pages of this browser get
+    engine = browser.browser_type.name
+    compiled = stealth.compile(engine)
+    samples: Dict[str, List[float]] = {"new_page": [], "load": [], "evaluate": [], "js_heap": []}
+    errors: List[str] = []
+    heap_source = None
+    stealthed_context = await browser.new_context()
+    plain_context = await browser.new_context()
+    try:
+        # the first iteration warms up the browser and the payload caches and isn't recorded
+        for iteration in range(iterations + 1):
+            started = time.perf_counter()
+            page = await stealthed_context.new_page()
+            await stealth.apply_stealth_async(page, engine)
+            opened = time.perf_counter()
+            await page.goto(f"{url}/{iteration}", wait_until="load")
+            loaded = time.perf_counter()
+            heap, heap_source = await js_heap_used(page)
+            await page.close()
+
+            evaluated = None
+            if compiled.bundle:
+                page = await plain_context.new_page()
+                await page.goto(f"{url}/{iteration}", wait_until="load")
+                try:
+                    evaluated = await page.evaluate(EVALUATE_PAYLOAD, compiled.script)
+                except async_api.Error as error:
+                    errors.append(error.message.splitlines()[0])
+                await page.close()
+
+            if iteration == 0:
+                continue
+            samples["new_page"].append((opened - started) * 1000)
+            samples["load"].append((loaded - opened) * 1000)
+            if evaluated is not None:
+                samples["evaluate"].append(evaluated)
+            if heap is not None:
+                samples["js_heap"].append(heap)
+    finally:
+        await stealthed_context.close()
+        await plain_context.close()
+    return {
+        "payload_bytes": len(compiled.script),
+        **{name: summarize(values) for name, values in samples.items()},
+        "js_heap_source": heap_source,
+        "errors": sorted(set(errors)),
+    }
+
+
+async def main(browsers: List[str], iterations: int, evasions: List[str], without: bool, output: Optional[str]) -> None:
+    with open(output, "a") if output else nullcontext() as output_file, local_server() as url:
+        async with async_playwright() as playwright:
+            for browser_type in browsers:
+                browser = await playwright[browser_type].launch()
+                recorder = Recorder(output_file, browser=browser_type, browser_version=browser.version)
+                for case, stealth in cases(evasions, without):
+                    result = await run_case(browser, stealth, url, iterations)
+                    recorder.record("pages", case=case, iterations=iterations, **result)
+                await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--browsers", nargs="+", default=["chromium", "firefox"])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--evasions", nargs="+", default=EVASIONS, choices=EVASIONS, metavar="EVASION")
+    parser.add_argument("--no-without", dest="without", action="store_false",
+                        help="skip the all-but-one cases")
+    parser.add_argument("--output", help="append results to this JSON lines file")
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.browsers, arguments.iterations, arguments.evasions, arguments.without,
+                     arguments.output))
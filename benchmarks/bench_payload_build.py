@@ -0,0 +1,63 @@
+"""
+Payload build time for every evasion on its own and for all of them, cold (all caches cleared, sources read from
+disk) and warm (compile() on a new Stealth with the same configuration). No browser is started:
+
+    python -m benchmarks.bench_payload_build --output results.jsonl
+"""
+import argparse
+import time
+from contextlib import nullcontext
+from typing import Callable, List, Optional
+
+from benchmarks.common import Recorder, summarize
+from playwright_stealth import ALL_EVASIONS_DISABLED_KWARGS, Stealth
+from playwright_stealth import bundler, stealth as stealth_module
+
+EVASIONS = list(ALL_EVASIONS_DISABLED_KWARGS)
+
+
+def clear_payload_caches() -> None:
+    stealth_module.SCRIPTS._sources.clear()
+    stealth_module._COMPILED_PAYLOADS.clear()
+    stealth_module._BUNDLES.clear()
+    for cached in (bundler.minify, bundler.build_bundle, bundler.bundle_evasions, bundler.uses_magic_arrays,
+                   bundler._prebuilt_bundles):
+        cached.cache_clear()
+
+
+def timed(build: Callable[[], object], repeat: int, cold: bool) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        if cold:
+            clear_payload_caches()
+        started = time.perf_counter()
+        build()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main(repeat: int, output_path: Optional[str] = None) -> None:
+    configurations = [("all", {})] + [
+        (f"only:{name}", {**ALL_EVASIONS_DISABLED_KWARGS, name: True}) for name in EVASIONS
+    ]
+    with open(output_path, "a") if output_path else nullcontext() as output:
+        recorder = Recorder(output)
+        for case, kwargs in configurations:
+            for minify_payload in (True, False):
+                build = lambda: Stealth(minify_payload=minify_payload, **kwargs).compile()
+                recorder.record(
+                    "payload_build",
+                    case=case,
+                    minify_payload=minify_payload,
+                    payload_bytes=len(build().script),
+                    cold_ms=summarize(timed(build, repeat, cold=True)),
+                    warm_ms=summarize(timed(build, repeat, cold=False)),
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="append results to this JSON lines file")
+    arguments = parser.parse_args()
+    main(arguments.repeat, arguments.output)
@@ -0,0 +1,84 @@
+"""
+Overhead of hooking a Playwright session, for runners that open and close many of them. Needs the Playwright
+driver but no browser:
+
+    python -m benchmarks.bench_sessions --sessions 20 --output results.jsonl
+
+ - hook: hook_playwright_context alone, compared with the previous implementation (inspect.getmembers over every
+   BrowserType attribute and two fresh closures per hooked method)
+ - session: entering and leaving `async with Stealth().use_async(async_playwright())` compared with plain
+   `async with async_playwright()`, dominated by starting the driver
+"""
+import argparse
+import asyncio
+import inspect
+import time
+import timeit
+from contextlib import nullcontext
+from typing import Optional
+
+from playwright.async_api import async_playwright
+
+from benchmarks.common import Recorder, summarize
+from playwright_stealth import Stealth
+from playwright_stealth.hooks import hookable_method_names
+
+
+def previous_hook_playwright_context(stealth: Stealth, ctx) -> None:
+    """The implementation before hookable methods were cached per class and hooks became objects"""
+    for browser_type in (ctx.chromium, ctx.firefox, ctx.webkit):
+        for name, method in inspect.getmembers(browser_type, predicate=inspect.ismethod):
+            if method.__annotations__.get("return") in ("Browser", "BrowserContext"):
+                def make_hooks(method=method):
+                    async def async_hooked_method(*args, **kwargs):
+                        return await method(*args, **kwargs)
+
+                    def sync_hooked_method(*args, **kwargs):
+                        return method(*args, **kwargs)
+
+                    return async_hooked_method if inspect.iscoroutinefunction(method) else sync_hooked_method
+
+                setattr(browser_type, name, make_hooks())
+
+
+def unhook(ctx) -> None:
+    for browser_type in (ctx.chromium, ctx.firefox, ctx.webkit):
+        for name in hookable_method_names(type(browser_type)):
+            vars(browser_type).pop(name, None)
+
+
+async def main(sessions: int, number: int, output: Optional[str]) -> None:
+    with open(output, "a") if output else nullcontext() as output_file:
+        recorder = Recorder(output_file)
+        stealth = Stealth()
+
+        async with async_playwright() as playwright:
+            cases = {
+                "previous": lambda: previous_hook_playwright_context(stealth, playwright),
+                "current": lambda: stealth.hook_playwright_context(playwright),
+            }
+            for case, hook in cases.items():
+                best = min(timeit.repeat(lambda: (hook(), unhook(playwright)), number=number, repeat=5)) / number
+                recorder.record("hook", case=case, seconds_per_hook=best)
+
+        cases = {
+            "plain": lambda: async_playwright(),
+            "stealth": lambda: stealth.use_async(async_playwright()),
+        }
+        for case, manager in cases.items():
+            samples = []
+            for _ in range(sessions):
+                started = time.perf_counter()
+                async with manager():
+                    pass
+                samples.append((time.perf_counter() - started) * 1000)
+            recorder.record("session", case=case, sessions=sessions, ms=summarize(samples))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--number", type=int, default=500, help="hook calls per timing")
+    parser.add_argument("--output", help="append results to this JSON lines file")
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.sessions, arguments.number, arguments.output))
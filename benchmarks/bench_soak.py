@@ -0,0 +1,191 @@
+"""
+Soak test for memory growth over long-running hooked sessions, against a local server (no network access needed).
+
+Opens and closes many contexts and pages through Stealth.use_async while a long-lived probe page keeps creating
+and removing iframes, and samples at regular intervals:
+ - rss: resident memory of the Python process in bytes
+ - objects: number of objects tracked by the Python garbage collector, and which types grew the most
+ - js_heap: JS heap used by the probe page in bytes (chromium only, via CDP Performance.getMetrics)
+
+Exits with status 1 if memory grew past the thresholds. The growth is then attributed to evasions by soaking
+shorter runs with each evasion enabled alone (also with --attribute), compared with no evasions at all:
+
+    python -m benchmarks.bench_soak --browser chromium --rounds 20000 --output results.jsonl
+"""
+import argparse
+import asyncio
+import gc
+import os
+import resource
+import sys
+from collections import Counter
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from benchmarks.common import Recorder, local_server
+from playwright_stealth import ALL_EVASIONS_DISABLED_KWARGS, Stealth
+
+EVASIONS = list(ALL_EVASIONS_DISABLED_KWARGS)
+
+# what the payload has to deal with over and over in a long-lived page: iframes being added and removed
+CHURN_FRAMES = """count => {
+    for (let i = 0; i < count; i++) {
+        const iframe = document.createElement("iframe");
+        iframe.srcdoc = "<p>frame</p>";
+        document.body.appendChild(iframe);
+        void iframe.contentWindow.navigator.userAgent;
+        iframe.remove();
+    }
+}"""
+
+
+def current_rss() -> int:
+    """Current resident set size in bytes, the peak where /proc isn't available"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Probe:
+    """Long-lived stealthed page whose JS heap is sampled"""
+
+    def __init__(self, page: async_api.Page, session: Optional[async_api.CDPSession]):
+        self.page = page
+        self.session = session
+
+    @classmethod
+    async def open(cls, browser: async_api.Browser, url: str) -> "Probe":
+        page = await browser.new_page()
+        await page.goto(url)
+        session = None
+        if browser.browser_type.name == "chromium":
+            session = await page.context.new_cdp_session(page)
+            await session.send("Performance.enable")
+        return cls(page, session)
+
+    async def churn(self, frames: int) -> None:
+        await self.page.evaluate(CHURN_FRAMES, frames)
+
+    async def js_heap_used(self) -> Optional[int]:
+        if self.session is None:
+            return None
+        await self.session.send("HeapProfiler.collectGarbage")
+        metrics = await self.session.send("Performance.getMetrics")
+        return next(int(metric["value"]) for metric in metrics["metrics"] if metric["name"] == "JSHeapUsedSize")
+
+
+async def sample(probe: Probe) -> Dict[str, Any]:
+    gc.collect()
+    objects = gc.get_objects()
+    return {
+        "rss": current_rss(),
+        "objects": len(objects),
+        "types": Counter(type(obj).__name__ for obj in objects),
+        "js_heap": await probe.js_heap_used(),
+    }
+
+
+def growth(samples: List[Dict[str, Any]], key: str) -> Optional[int]:
+    if samples[0][key] is None:
+        return None
+    return samples[-1][key] - samples[0][key]
+
+
+async def soak(stealth: Stealth, browser_name: str, url: str, rounds: int, pages: int, frames: int,
+               samples: int) -> Dict[str, Any]:
+    """Returns the growth between the first sample (after one warm-up interval) and the last one"""
+    interval = max(1, rounds // samples)
+    series: List[Dict[str, Any]] = []
+    async with stealth.use_async(async_playwright()) as playwright:
+        browser = await playwright[browser_name].launch()
+        version = browser.version
+        probe = await Probe.open(browser, url)
+        for round_ in range(rounds + interval):
+            context = await browser.new_context()
+            for _ in range(pages):
+                page = await context.new_page()
+                await page.goto(url)
+                await page.close()
+            await context.close()
+            await probe.churn(frames)
+            if (round_ + 1) % interval == 0:
+                series.append(await sample(probe))
+        await browser.close()
+    type_growth = series[-1]["types"] - series[0]["types"]
+    return {
+        "browser_version": version,
+        "rounds": rounds,
+        "rss_growth": growth(series, "rss"),
+        "objects_growth": growth(series, "objects"),
+        "js_heap_growth": growth(series, "js_heap"),
+        "top_growing_types": type_growth.most_common(10),
+        "series": [{key: value for key, value in point.items() if key != "types"} for point in series],
+    }
+
+
+async def main(browser_name: str, rounds: int, pages: int, frames: int, samples: int, max_rss_growth: float,
+               max_js_heap_growth: float, attribute: bool, attribution_rounds: int, evasions: List[str],
+               output: Optional[str]) -> bool:
+    """Returns: whether memory stayed within the thresholds"""
+    with open(output, "a") if output else nullcontext() as output_file, local_server() as url:
+        recorder = Recorder(output_file, browser=browser_name)
+        result = await soak(Stealth(), browser_name, url, rounds, pages, frames, samples)
+        failures = []
+        if result["rss_growth"] > max_rss_growth * 2 ** 20:
+            failures.append("rss")
+        if result["js_heap_growth"] is not None and result["js_heap_growth"] > max_js_heap_growth * 2 ** 20:
+            failures.append("js_heap")
+        recorder.record("soak", case="all", failures=failures, **result)
+
+        if failures or attribute:
+            baseline = await soak(
+                Stealth(**ALL_EVASIONS_DISABLED_KWARGS), browser_name, url, attribution_rounds, pages, frames, samples
+            )
+            recorder.record("soak", case="none", **baseline)
+            attribution = []
+            for name in evasions:
+                stealth = Stealth(**{**ALL_EVASIONS_DISABLED_KWARGS, name: True})
+                alone = await soak(stealth, browser_name, url, attribution_rounds, pages, frames, samples)
+                recorder.record("soak", case=f"only:{name}", **alone)
+                attribution.append({
+                    "evasion": name,
+                    **{
+                        f"{key}_over_baseline": None if alone[key] is None else alone[key] - baseline[key]
+                        for key in ("rss_growth", "objects_growth", "js_heap_growth")
+                    },
+                })
+            # the likeliest culprit first
+            attribution.sort(
+                key=lambda item: (item["js_heap_growth_over_baseline"] or 0, item["rss_growth_over_baseline"]),
+                reverse=True,
+            )
+            recorder.record("soak_attribution", rounds=attribution_rounds, evasions=attribution)
+        return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--browser", default="chromium", choices=["chromium", "firefox", "webkit"])
+    parser.add_argument("--rounds", type=int, default=10_000, help="contexts opened and closed")
+    parser.add_argument("--pages", type=int, default=2, help="pages opened and closed per context")
+    parser.add_argument("--frames", type=int, default=5, help="iframes added to the probe page per round")
+    parser.add_argument("--samples", type=int, default=20, help="memory samples over the run")
+    parser.add_argument("--max-rss-growth", type=float, default=64, help="in MiB")
+    parser.add_argument("--max-js-heap-growth", type=float, default=8, help="in MiB")
+    parser.add_argument("--attribute", action="store_true", help="always attribute growth to evasions")
+    parser.add_argument("--attribution-rounds", type=int, default=1_000)
+    parser.add_argument("--evasions", nargs="+", default=EVASIONS, choices=EVASIONS, metavar="EVASION")
+    parser.add_argument("--output", help="append results to this JSON lines file")
+    arguments = parser.parse_args()
+    passed = asyncio.run(main(
+        arguments.browser, arguments.rounds, arguments.pages, arguments.frames, arguments.samples,
+        arguments.max_rss_growth, arguments.max_js_heap_growth, arguments.attribute, arguments.attribution_rounds,
+        arguments.evasions, arguments.output,
+    ))
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,132 @@
+"""
+Serving several fingerprint profiles from one browser (new_context(stealth=profile)) compared with launching a
+browser per profile, against a local server (no network access needed).
+
+For every setup measures:
+ - setup: launching the browser(s), in ms
+ - pages_per_second: throughput of opening a context, loading a page and closing it, round robin over the profiles
+ - rss: resident memory of all browser processes once every profile has a context open, in bytes (Linux only)
+
+    python -m benchmarks.bench_tenants --browser chromium --profiles 6 --pages 60 --output results.jsonl
+"""
+import argparse
+import asyncio
+import os
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from benchmarks.common import Recorder, local_server
+from playwright_stealth import Stealth
+from playwright_stealth.profiles import DEFAULT_CATALOG
+
+
+def process_tree_rss(root: int) -> Optional[int]:
+    """Sum of the resident memory of all descendants of a process, None where /proc isn't available"""
+    if not os.path.isdir("/proc"):
+        return None
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status") as status:
+                fields = dict(line.split(":", 1) for line in status if ":" in line)
+        except OSError:
+            continue
+        children.setdefault(int(fields["PPid"]), []).append(int(entry))
+        if "VmRSS" in fields:
+            rss[int(entry)] = int(fields["VmRSS"].split()[0]) * 1024
+    total, pending = 0, list(children.get(root, []))
+    while pending:
+        pid = pending.pop()
+        total += rss.get(pid, 0)
+        pending.extend(children.get(pid, []))
+    return total
+
+
+async def load(browser: async_api.Browser, url: str, stealth: Optional[str] = None) -> None:
+    context = await (browser.new_context(stealth=stealth) if stealth else browser.new_context())
+    page = await context.new_page()
+    await page.goto(url)
+    await context.close()
+
+
+async def shared(browser_name: str, profiles: List[str], pages: int, url: str) -> Dict[str, Optional[float]]:
+    started = time.perf_counter()
+    async with Stealth().use_async(async_playwright()) as playwright:
+        browser = await playwright[browser_name].launch()
+        launched = time.perf_counter()
+        contexts = [await browser.new_context(stealth=profile) for profile in profiles]
+        for context in contexts:
+            await (await context.new_page()).goto(url)
+        rss = process_tree_rss(os.getpid())
+        for context in contexts:
+            await context.close()
+
+        loading = time.perf_counter()
+        for i in range(pages):
+            await load(browser, url, profiles[i % len(profiles)])
+        loaded = time.perf_counter()
+        await browser.close()
+    return {
+        "setup": (launched - started) * 1000,
+        "pages_per_second": pages / (loaded - loading),
+        "rss": rss,
+    }
+
+
+async def browser_per_profile(browser_name: str, profiles: List[str], pages: int,
+                              url: str) -> Dict[str, Optional[float]]:
+    started = time.perf_counter()
+    managers = [Stealth.from_profile(profile).use_async(async_playwright()) for profile in profiles]
+    browsers = []
+    try:
+        for manager in managers:
+            playwright = await manager.__aenter__()
+            browsers.append(await playwright[browser_name].launch())
+        launched = time.perf_counter()
+        contexts = [await browser.new_context() for browser in browsers]
+        for context in contexts:
+            await (await context.new_page()).goto(url)
+        rss = process_tree_rss(os.getpid())
+        for context in contexts:
+            await context.close()
+
+        loading = time.perf_counter()
+        for i in range(pages):
+            await load(browsers[i % len(browsers)], url)
+        loaded = time.perf_counter()
+    finally:
+        for browser in browsers:
+            await browser.close()
+        for manager in managers:
+            await manager.__aexit__(None, None, None)
+    return {
+        "setup": (launched - started) * 1000,
+        "pages_per_second": pages / (loaded - loading),
+        "rss": rss,
+    }
+
+
+async def main(browser_name: str, profile_count: int, pages: int, output: Optional[str]) -> None:
+    profiles = DEFAULT_CATALOG.names[:profile_count]
+    with open(output, "a") if output else nullcontext() as output_file, local_server() as url:
+        recorder = Recorder(output_file, browser=browser_name)
+        for setup, run in (("shared", shared), ("browser_per_profile", browser_per_profile)):
+            result = await run(browser_name, profiles, pages, url)
+            recorder.record("tenants", setup=setup, profiles=len(profiles), pages=pages, **result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--browser", default="chromium", choices=["chromium", "firefox", "webkit"])
+    parser.add_argument("--profiles", type=int, default=6, help=f"at most {len(DEFAULT_CATALOG.names)}")
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--output", help="append results to this JSON lines file")
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.browser, arguments.profiles, arguments.pages, arguments.output))
@@ -0,0 +1,70 @@
+"""
+In-page cost of Function.prototype.toString once the evasions patched it, which frameworks and bundlers call on
+their own functions. With a single registry-backed toString proxy the cost must not depend on how many evasions
+(and thus patched functions) are enabled:
+
+    python -m benchmarks.bench_to_string --browsers chromium firefox --output results.jsonl
+
+Prints nanoseconds per call for a page script function, a native function and a function patched by the evasions.
+"""
+import argparse
+import asyncio
+from contextlib import nullcontext
+from typing import List, Optional
+
+from playwright.async_api import async_playwright
+
+from benchmarks.common import Recorder, local_server
+from playwright_stealth import ALL_EVASIONS_DISABLED_KWARGS, Stealth
+
+CASES = {
+    "none": Stealth(**ALL_EVASIONS_DISABLED_KWARGS),
+    "only:media_codecs": Stealth(**{**ALL_EVASIONS_DISABLED_KWARGS, "media_codecs": True}),
+    "all": Stealth(),
+}
+
+MEASURE_TO_STRING = """calls => {
+    const targets = {
+        page_function: function pageFunction(a, b) { return a + b; },
+        native_function: Element.prototype.getAttribute,
+        patched_function: HTMLMediaElement.prototype.canPlayType,
+    };
+    const result = {};
+    for (const [name, fn] of Object.entries(targets)) {
+        let length = 0;
+        const started = performance.now();
+        for (let i = 0; i < calls; i++) {
+            length += fn.toString().length;
+        }
+        result[name] = ((performance.now() - started) * 1e6) / calls;
+    }
+    return result;
+}"""
+
+
+async def main(browsers: List[str], calls: int, output: Optional[str]) -> None:
+    with open(output, "a") if output else nullcontext() as output_file, local_server() as url:
+        async with async_playwright() as playwright:
+            for browser_type in browsers:
+                browser = await playwright[browser_type].launch()
+                recorder = Recorder(output_file, browser=browser_type, browser_version=browser.version)
+                for case, stealth in CASES.items():
+                    context = await browser.new_context()
+                    await stealth.apply_stealth_async(context)
+                    page = await context.new_page()
+                    await page.goto(url)
+                    # the first run lets the JIT settle
+                    await page.evaluate(MEASURE_TO_STRING, calls // 10)
+                    ns_per_call = await page.evaluate(MEASURE_TO_STRING, calls)
+                    recorder.record("to_string", case=case, calls=calls, ns_per_call=ns_per_call)
+                    await context.close()
+                await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--browsers", nargs="+", default=["chromium", "firefox"])
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--output", help="append results to this JSON lines file")
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.browsers, arguments.calls, arguments.output))
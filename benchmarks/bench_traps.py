@@ -0,0 +1,73 @@
+"""
+In-page cost of the hottest proxied APIs (document.createElement, HTMLMediaElement.prototype.canPlayType and
+WebGLRenderingContext.prototype.getParameter) with and without the evasions that proxy them:
+
+    python -m benchmarks.bench_traps --browsers chromium firefox --output results.jsonl
+
+Prints nanoseconds per call, for arguments that are spoofed and for the far more common ones that aren't.
+"""
+import argparse
+import asyncio
+from contextlib import nullcontext
+from typing import List, Optional
+
+from playwright.async_api import async_playwright
+
+from benchmarks.common import Recorder, local_server
+from playwright_stealth import ALL_EVASIONS_DISABLED_KWARGS, Stealth
+
+CASES = {
+    "none": Stealth(**ALL_EVASIONS_DISABLED_KWARGS),
+    "traps": Stealth(**{**ALL_EVASIONS_DISABLED_KWARGS, "iframe_content_window": True, "media_codecs": True,
+                        "webgl_vendor": True}),
+    "all": Stealth(),
+}
+
+MEASURE_TRAPS = """calls => {
+    const video = document.createElement("video");
+    const gl = document.createElement("canvas").getContext("webgl");
+    const calls_of = {
+        create_element: () => document.createElement("div"),
+        can_play_type: () => video.canPlayType('video/webm; codecs="vp8, vorbis"'),
+        can_play_type_spoofed: () => video.canPlayType('video/mp4; codecs="avc1.42E01E"'),
+        get_parameter: () => gl && gl.getParameter(gl.MAX_TEXTURE_SIZE),
+        get_parameter_spoofed: () => gl && gl.getParameter(37445),
+    };
+    const result = {};
+    for (const [name, call] of Object.entries(calls_of)) {
+        const started = performance.now();
+        for (let i = 0; i < calls; i++) {
+            call();
+        }
+        result[name] = ((performance.now() - started) * 1e6) / calls;
+    }
+    return result;
+}"""
+
+
+async def main(browsers: List[str], calls: int, output: Optional[str]) -> None:
+    with open(output, "a") if output else nullcontext() as output_file, local_server() as url:
+        async with async_playwright() as playwright:
+            for browser_type in browsers:
+                browser = await playwright[browser_type].launch()
+                recorder = Recorder(output_file, browser=browser_type, browser_version=browser.version)
+                for case, stealth in CASES.items():
+                    context = await browser.new_context()
+                    await stealth.apply_stealth_async(context)
+                    page = await context.new_page()
+                    await page.goto(url)
+                    # the first run lets the JIT settle
+                    await page.evaluate(MEASURE_TRAPS, calls // 10)
+                    ns_per_call = await page.evaluate(MEASURE_TRAPS, calls)
+                    recorder.record("traps", case=case, calls=calls, ns_per_call=ns_per_call)
+                    await context.close()
+                await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--browsers", nargs="+", default=["chromium", "firefox"])
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--output", help="append results to this JSON lines file")
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.browsers, arguments.calls, arguments.output))
@@ -0,0 +1,88 @@
+"""
+Shared helpers for the benchmarks: a local HTTP server (no network access needed), summary statistics and
+JSON lines output.
+"""
+import json
+import platform
+from importlib import metadata
+import statistics
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Type
+
+# a small but not entirely trivial document, so the load event isn't dominated by the empty page fast path
+PAGE = (
+    "<!doctype html><html><head><title>benchmark</title><style>li { margin: 2px }</style></head><body>"
+    + "<ul>" + "".join(f"<li>item {i}</li>" for i in range(200)) + "</ul>"
+    + "<iframe srcdoc='<p>frame</p>'></iframe></body></html>"
+).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def local_server(handler: Type[BaseHTTPRequestHandler] = _Handler) -> Iterator[str]:
+    """Serves PAGE (or whatever the handler serves) on localhost for every path, yields the base URL"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def summarize(samples: List[float]) -> Dict[str, Optional[float]]:
+    """Median, p95, mean and min of a list of samples, all None if there are none"""
+    if not samples:
+        return {"median": None, "p95": None, "mean": None, "min": None}
+    ordered = sorted(samples)
+    return {
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        "mean": statistics.fmean(ordered),
+        "min": ordered[0],
+    }
+
+
+def _package_version(name: str) -> Optional[str]:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+class Recorder:
+    """Writes one JSON object per result to stdout and optionally to a file, every record carries the run metadata"""
+
+    def __init__(self, output: Optional[TextIO] = None, **metadata: Any):
+        self.output = output
+        self.metadata = {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "playwright": _package_version("playwright"),
+            "platform": sys.platform,
+            **metadata,
+        }
+
+    def record(self, benchmark: str, **fields: Any) -> None:
+        line = json.dumps({"benchmark": benchmark, **fields, "meta": self.metadata})
+        print(line, flush=True)
+        if self.output is not None:
+            self.output.write(line + "\n")
+            self.output.flush()
@@ -1,2 +1,3 @@
 # -*- coding: utf-8 -*-
-from playwright_stealth.stealth import Stealth, ALL_EVASIONS_DISABLED_KWARGS
+from playwright_stealth.stealth import Stealth, CompiledPayload, TargetResult, ALL_EVASIONS_DISABLED_KWARGS
+from playwright_stealth.pool import AsyncStealthPool, SyncStealthPool, PoolStats
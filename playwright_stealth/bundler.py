@@ -0,0 +1,562 @@
+# -*- coding: utf-8 -*-
+"""
+Pure-Python bundling of the evasion scripts: strips comments and whitespace, and tree-shakes `utils.*` helpers
+that none of the enabled evasions use. No Node toolchain is needed, and results are cached per evasion set.
+Bundles can further drop logging calls and be specialized for one set of option values (see specialize).
+The bundles of the default evasion set are minified when the package is built (see write_prebuilt_bundles) and
+shipped in js/bundles.json, the minifier only runs at runtime for other evasion sets.
+"""
+import functools
+import hashlib
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+
+
+class Token(NamedTuple):
+    kind: str  # one of "name", "num", "str", "template", "regex", "punct"
+    text: str
+    newline_before: bool
+
+
+_NAME_RE = re.compile(r"[A-Za-z_$\u0080-\uffff][\w$\u0080-\uffff]*")
+_NUM_RE = re.compile(
+    r"0[xX][0-9a-fA-F_]+n?|0[bB][01_]+n?|0[oO][0-7_]+n?|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?n?"
+)
+_PUNCTUATORS = sorted(
+    """
+    >>>= ... === !== **= <<= >>= >>> &&= ||= ??= => == != <= >= && || ?? ?. ++ -- += -= *= /= %= &= |= ^= ** << >>
+    { } ( ) [ ] ; , < > + - * / % & | ^ ! ~ ? : = . @
+    """.split(),
+    key=len,
+    reverse=True,
+)
+# a `/` after any of these keywords starts a regex literal rather than a division
+_KEYWORDS_BEFORE_EXPRESSION = {
+    "return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw", "case", "do", "else", "yield",
+    "await",
+}
+# a statement can't end with any of these tokens, so a line break after them can never trigger automatic
+# semicolon insertion and is safe to drop
+_CONTINUATION_PUNCTUATORS = set(_PUNCTUATORS) - {")", "]", "}", "++", "--"}
+_IDENTIFIER_CHARS = re.compile(r"[\w$\u0080-\uffff]")
+# the logging helpers defined at the end of utils.js
+_LOGGING_FUNCTIONS = {"log", "warn"}
+# tokens after which a new statement starts
+_STATEMENT_BOUNDARIES = {";", "{", "}"}
+_VOID = (Token("name", "void", False), Token("num", "0", False))
+PREBUILT_BUNDLES_PATH = Path(__file__).parent / "js" / "bundles.json"
+BundleInputs = Tuple[str, str, Tuple[str, ...], Tuple[str, ...], bool]
+_ASSIGNMENT_OPERATORS = {
+    p for p in _PUNCTUATORS if p.endswith("=") and p not in ("==", "===", "!=", "!==", "<=", ">=", "=>")
+} | {"++", "--"}
+
+
+def _skip_string(source: str, i: int) -> int:
+    """Returns the index after the string literal starting at i"""
+    quote = source[i]
+    i += 1
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == quote:
+            return i + 1
+        i += 1
+    raise ValueError("unterminated string literal")
+
+
+def _skip_template(source: str, i: int) -> int:
+    """Returns the index after the template literal starting at i, including any nested `${}` expressions"""
+    i += 1
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "`":
+            return i + 1
+        if source.startswith("${", i):
+            i += 2
+            depth = 1
+            while depth:
+                char = source[i]
+                if char in "'\"":
+                    i = _skip_string(source, i)
+                    continue
+                if char == "`":
+                    i = _skip_template(source, i)
+                    continue
+                if char == "{":
+                    depth += 1
+                elif char == "}":
+                    depth -= 1
+                i += 1
+            continue
+        i += 1
+    raise ValueError("unterminated template literal")
+
+
+def _skip_regex(source: str, i: int) -> int:
+    """Returns the index after the regex literal (including flags) starting at i"""
+    i += 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "\n":
+            raise ValueError("unterminated regex literal")
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            i += 1
+            break
+        i += 1
+    while i < len(source) and _IDENTIFIER_CHARS.match(source[i]):
+        i += 1
+    return i
+
+
+def _regex_allowed(previous: Optional[Token]) -> bool:
+    if previous is None:
+        return True
+    if previous.kind == "punct":
+        return previous.text not in (")", "]", "}")
+    if previous.kind == "name":
+        return previous.text in _KEYWORDS_BEFORE_EXPRESSION
+    return False
+
+
+def tokenize(source: str) -> List[Token]:
+    """Splits JS source into tokens, dropping comments and whitespace but remembering where line breaks were"""
+    tokens: List[Token] = []
+    i = 0
+    newline_before = False
+    while i < len(source):
+        char = source[i]
+        if char in " \t\r\n\ufeff\u00a0":
+            newline_before = newline_before or char == "\n"
+            i += 1
+            continue
+        if source.startswith("//", i):
+            end = source.find("\n", i)
+            i = len(source) if end == -1 else end
+            continue
+        if source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            if end == -1:
+                raise ValueError("unterminated block comment")
+            newline_before = newline_before or "\n" in source[i:end]
+            i = end + 2
+            continue
+
+        previous = tokens[-1] if tokens else None
+        start = i
+        if char in "'\"":
+            kind, i = "str", _skip_string(source, i)
+        elif char == "`":
+            kind, i = "template", _skip_template(source, i)
+        elif char == "/" and _regex_allowed(previous):
+            kind, i = "regex", _skip_regex(source, i)
+        elif char.isdigit() or (char == "." and source[i + 1:i + 2].isdigit()):
+            kind, i = "num", _NUM_RE.match(source, i).end()
+        elif _NAME_RE.match(source, i):
+            kind, i = "name", _NAME_RE.match(source, i).end()
+        else:
+            punctuator = next((p for p in _PUNCTUATORS if source.startswith(p, i)), None)
+            if punctuator is None:
+                raise ValueError(f"unexpected character {char!r} at offset {i}")
+            kind, i = "punct", i + len(punctuator)
+        tokens.append(Token(kind, source[start:i], newline_before))
+        newline_before = False
+    return tokens
+
+
+def _needs_space(previous: Token, current: Token) -> bool:
+    last, first = previous.text[-1], current.text[0]
+    if _IDENTIFIER_CHARS.match(last) and _IDENTIFIER_CHARS.match(first):
+        return True
+    if previous.kind == "regex" and _IDENTIFIER_CHARS.match(first):
+        return True
+    if previous.kind == "num" and first == ".":
+        return True
+    # `a - -b`, `a + ++b`, `a / /re/`, and anything that would form an HTML-like comment
+    if last in "+-/" and first == last:
+        return True
+    if last == "/" and first == "*":
+        return True
+    return (previous.text.endswith("--") and first == ">") or (last == "<" and first == "!")
+
+
+def emit(tokens: Iterable[Token]) -> str:
+    """Joins tokens back into source with as little whitespace as possible without changing semantics"""
+    parts: List[str] = []
+    previous: Optional[Token] = None
+    for token in tokens:
+        if previous is not None:
+            if token.newline_before and not (
+                    previous.kind == "punct" and previous.text in _CONTINUATION_PUNCTUATORS
+            ):
+                # keep line breaks wherever automatic semicolon insertion might depend on them
+                parts.append("\n")
+            elif _needs_space(previous, token):
+                parts.append(" ")
+        parts.append(token.text)
+        previous = token
+    return "".join(parts)
+
+
+@functools.lru_cache(maxsize=None)
+def minify(source: str) -> str:
+    """Strips comments and redundant whitespace from JS source"""
+    return emit(tokenize(source))
+
+
+def split_statements(tokens: Sequence[Token]) -> List[Tuple[Token, ...]]:
+    """Splits a token stream into its top level statements"""
+    statements = []
+    current: List[Token] = []
+    depth = 0
+    for token in tokens:
+        current.append(token)
+        if token.kind != "punct":
+            continue
+        if token.text in ("{", "(", "["):
+            depth += 1
+        elif token.text in ("}", ")", "]"):
+            depth -= 1
+            if depth == 0 and token.text == "}" and current[0].text == "function":
+                statements.append(tuple(current))
+                current = []
+        elif token.text == ";" and depth == 0:
+            statements.append(tuple(current))
+            current = []
+    if current:
+        statements.append(tuple(current))
+    return statements
+
+
+def referenced_utils(tokens: Sequence[Token]) -> Set[str]:
+    """Names of all `utils.<name>` members referenced in a token stream"""
+    return {
+        tokens[i + 2].text
+        for i in range(len(tokens) - 2)
+        if tokens[i].text == "utils" and tokens[i + 1].text == "." and tokens[i + 2].kind == "name"
+    }
+
+
+def _defined_util(statement: Sequence[Token]) -> Optional[str]:
+    """Returns the helper name if the statement is a top level `utils.<name> = ...` definition"""
+    if len(statement) > 3 and statement[0].text == "utils" and statement[1].text == "." and statement[3].text == "=":
+        return statement[2].text
+    return None
+
+
+def tree_shake_utils(
+        utils_source: str, dependants: Iterable[str], overrides: Iterable[str] = ()
+) -> List[Tuple[Token, ...]]:
+    """
+    Returns the statements of utils.js without helpers that none of the dependant scripts (transitively) use.
+    Statements that don't define a helper are always kept. Helpers defined in overrides replace the ones in utils.js.
+    """
+    replacements = {
+        _defined_util(statement): statement
+        for source in overrides
+        for statement in split_statements(tokenize(source))
+    }
+    statements = [
+        replacements.get(_defined_util(statement), statement) for statement in split_statements(tokenize(utils_source))
+    ]
+    definitions = {_defined_util(statement): statement for statement in statements if _defined_util(statement)}
+
+    required: Set[str] = set()
+    pending = set()
+    for source in dependants:
+        pending |= referenced_utils(tokenize(source))
+    for statement in statements:
+        if _defined_util(statement) is None:
+            pending |= referenced_utils(statement)
+    while pending:
+        name = pending.pop()
+        if name in required or name not in definitions:
+            continue
+        required.add(name)
+        pending |= referenced_utils(definitions[name])
+
+    return [statement for statement in statements if _defined_util(statement) in required | {None}]
+
+
+def _matching(tokens: Sequence[Token], i: int) -> int:
+    """Index of the bracket closing the one at tokens[i]"""
+    depth = 0
+    for j in range(i, len(tokens)):
+        if tokens[j].kind != "punct":
+            continue
+        if tokens[j].text in ("{", "(", "["):
+            depth += 1
+        elif tokens[j].text in ("}", ")", "]"):
+            depth -= 1
+            if depth == 0:
+                return j
+    raise ValueError(f"unbalanced {tokens[i].text!r}")
+
+
+def strip_logging(tokens: Sequence[Token]) -> List[Token]:
+    """
+    Removes the `log(...)` and `warn(...)` calls, so their arguments aren't evaluated either. Calls that are whole
+    statements are dropped, calls within an expression (or after a line without a semicolon, where only the line
+    break ends the previous statement) become `void 0`. The helpers themselves are kept.
+    """
+    result: List[Token] = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        previous = result[-1] if result else None
+        if (
+                token.kind == "name" and token.text in _LOGGING_FUNCTIONS
+                and i + 1 < len(tokens) and tokens[i + 1].text == "("
+                and (previous is None or previous.text not in (".", "function"))
+        ):
+            end = _matching(tokens, i + 1) + 1
+            # a method shorthand named log (`{ log(x) { ... } }`) is a definition, not a call
+            if end >= len(tokens) or tokens[end].text != "{":
+                if previous is None or previous.text in _STATEMENT_BOUNDARIES:
+                    if end < len(tokens) and tokens[end].text == ";":
+                        end += 1
+                else:
+                    # the line break before the call may be what ends the previous statement
+                    result.append(_VOID[0]._replace(newline_before=token.newline_before))
+                    result.append(_VOID[1])
+                i = end
+                continue
+        result.append(token)
+        i += 1
+    return result
+
+
+def inline_options(tokens: Sequence[Token], options: Mapping[str, Any]) -> List[Token]:
+    """Replaces `opts.<name>` reads with the literal value of the option, for None, bool, number and string values"""
+    literals = {}
+    for name, value in options.items():
+        if value is None or isinstance(value, bool):
+            literals[name] = Token("name", json.dumps(value), False)
+        elif isinstance(value, (int, float)) and value >= 0:
+            literals[name] = Token("num", json.dumps(value), False)
+        elif isinstance(value, str):
+            literals[name] = Token("str", json.dumps(value), False)
+    result: List[Token] = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if (
+                token.text == "opts" and token.kind == "name" and i + 2 < len(tokens)
+                and tokens[i + 1].text == "." and tokens[i + 2].text in literals
+                and not (result and result[-1].text == ".")
+                and not (i + 3 < len(tokens) and tokens[i + 3].text in _ASSIGNMENT_OPERATORS)
+        ):
+            result.append(literals[tokens[i + 2].text]._replace(newline_before=token.newline_before))
+            i += 3
+            continue
+        result.append(token)
+        i += 1
+    return result
+
+
+def _numeric_value(text: str) -> Optional[float]:
+    """Value of a numeric literal (hex, octal, binary, BigInt and numeric separators included), None if unknown"""
+    text = text.replace("_", "")
+    if text.endswith("n"):
+        text = text[:-1]
+    try:
+        if text[:2].lower() in ("0x", "0o", "0b"):
+            return int(text, 0)
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _constant_truthiness(condition: Sequence[Token]) -> Optional[bool]:
+    """Truthiness of a condition made of a literal and any number of `!`, None if it isn't constant"""
+    negations = 0
+    while negations < len(condition) and condition[negations].text == "!":
+        negations += 1
+    if len(condition) != negations + 1:
+        return None
+    literal = condition[-1]
+    if literal.kind == "name" and literal.text in ("true", "false", "null", "undefined"):
+        truthy = literal.text == "true"
+    elif literal.kind == "num":
+        value = _numeric_value(literal.text)
+        if value is None:
+            return None
+        truthy = value != 0
+    elif literal.kind == "str":
+        truthy = len(literal.text) > 2
+    else:
+        return None
+    return truthy != (negations % 2 == 1)
+
+
+def fold_constant_branches(tokens: Sequence[Token]) -> List[Token]:
+    """
+    Replaces `if (<literal>) { ... } else { ... }` statements with the block that would run. Statements whose
+    branches aren't blocks are left alone.
+    """
+    result: List[Token] = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if (
+                token.kind != "name" or token.text != "if" or (result and result[-1].text == ".")
+                or i + 1 >= len(tokens) or tokens[i + 1].text != "("
+        ):
+            result.append(token)
+            i += 1
+            continue
+        condition_end = _matching(tokens, i + 1)
+        truthy = _constant_truthiness(tokens[i + 2:condition_end])
+        if truthy is None or condition_end + 1 >= len(tokens) or tokens[condition_end + 1].text != "{":
+            result.append(token)
+            i += 1
+            continue
+        block_end = _matching(tokens, condition_end + 1)
+        end = block_end + 1
+        else_block = None
+        if end < len(tokens) and tokens[end].text == "else":
+            if end + 1 >= len(tokens) or tokens[end + 1].text != "{":
+                result.append(token)
+                i += 1
+                continue
+            else_end = _matching(tokens, end + 1)
+            else_block = tokens[end + 1:else_end + 1]
+            end = else_end + 1
+
+        kept = tokens[condition_end + 1:block_end + 1] if truthy else else_block
+        if kept is not None:
+            kept = fold_constant_branches(kept)
+        elif result and result[-1].text not in _STATEMENT_BOUNDARIES:
+            # e.g. `else if (false) { ... }` still needs a statement
+            kept = [Token("punct", ";", False)]
+        else:
+            kept = []
+        if kept:
+            # the line break before the `if` may matter for automatic semicolon insertion
+            kept[0] = kept[0]._replace(newline_before=token.newline_before)
+        result.extend(kept)
+        i = end
+    return result
+
+
+@functools.lru_cache(maxsize=64)
+def specialize(bundle: str, options: Tuple[Tuple[str, Any], ...]) -> str:
+    """
+    Specializes a bundle for one set of option values: inlines the options given as (name, value) pairs and drops
+    the branches they decide. Cached per bundle and options.
+    """
+    return emit(fold_constant_branches(inline_options(tokenize(bundle), dict(options))))
+
+
+@functools.lru_cache(maxsize=64)
+def uses_magic_arrays(evasion_sources: Tuple[str, ...]) -> bool:
+    """Whether any of the evasions needs the helpers from generate.magic.arrays.js"""
+    return any(token.text == "generateMagicArray" for source in evasion_sources for token in tokenize(source))
+
+
+@functools.lru_cache(maxsize=64)
+def build_bundle(
+        utils_source: str,
+        magic_arrays_source: str,
+        evasion_sources: Tuple[str, ...],
+        utils_overrides: Tuple[str, ...] = (),
+        without_logging: bool = False,
+) -> str:
+    """
+    Builds the minified bundle for one evasion set: tree-shaken utils, the magic arrays helpers and the evasions
+    themselves. Pass an empty magic_arrays_source if no evasion uses them (see uses_magic_arrays).
+    utils_overrides are `utils.<name> = ...` statements replacing helpers of the same name.
+    without_logging drops the log / warn calls (see strip_logging).
+    Cached per evasion set.
+    """
+    dependants = list(evasion_sources) + [magic_arrays_source]
+    utils_statements = tree_shake_utils(utils_source, dependants, utils_overrides)
+    utils_tokens = [token for statement in utils_statements for token in statement]
+
+    def process(source: str) -> str:
+        return emit(strip_logging(tokenize(source))) if without_logging else minify(source)
+
+    parts = [emit(strip_logging(utils_tokens) if without_logging else utils_tokens)]
+    if magic_arrays_source:
+        parts.append(process(magic_arrays_source))
+    parts.extend(process(source) for source in evasion_sources)
+    return "\n".join(parts)
+
+
+@functools.lru_cache(maxsize=None)
+def _bundler_digest() -> str:
+    """Pre-built bundles made by another version of this module are never used"""
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+
+def bundle_key(*inputs: Any) -> str:
+    """Key of a bundle in the pre-built bundles, by the arguments of bundle_evasions"""
+    return hashlib.sha256(json.dumps([_bundler_digest(), *inputs]).encode()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _prebuilt_bundles() -> Dict[str, str]:
+    try:
+        with open(PREBUILT_BUNDLES_PATH) as bundles_file:
+            return json.load(bundles_file)
+    except (OSError, ValueError):
+        # e.g. a source checkout, everything is minified at runtime
+        return {}
+
+
+@functools.lru_cache(maxsize=64)
+def bundle_evasions(
+        utils_source: str,
+        magic_arrays_source: str,
+        evasion_sources: Tuple[str, ...],
+        utils_overrides: Tuple[str, ...] = (),
+        without_logging: bool = False,
+) -> str:
+    """
+    build_bundle, with the magic arrays helpers only included if an evasion uses them.
+    Returns the pre-built bundle shipped with the package if there is one for these sources.
+    """
+    prebuilt = _prebuilt_bundles().get(
+        bundle_key(utils_source, magic_arrays_source, evasion_sources, utils_overrides, without_logging)
+    )
+    if prebuilt is not None:
+        return prebuilt
+    if not uses_magic_arrays(evasion_sources):
+        magic_arrays_source = ""
+    return build_bundle(utils_source, magic_arrays_source, evasion_sources, utils_overrides, without_logging)
+
+
+def write_prebuilt_bundles(path: str, inputs: Iterable[BundleInputs]) -> None:
+    """Minifies the bundles of the given bundle_evasions arguments into a file read as pre-built bundles"""
+    bundles = {}
+    for arguments in inputs:
+        utils_source, magic_arrays_source, evasion_sources, utils_overrides, without_logging = arguments
+        if not uses_magic_arrays(evasion_sources):
+            magic_arrays_source = ""
+        bundles[bundle_key(*arguments)] = build_bundle(
+            utils_source, magic_arrays_source, evasion_sources, utils_overrides, without_logging
+        )
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(descriptor, "w") as bundles_file:
+        json.dump(bundles, bundles_file)
+    # mkstemp creates the file readable by its owner only
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, path)
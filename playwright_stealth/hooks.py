@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Objects replacing the hooked Playwright methods (BrowserType.launch & co., Browser.new_context, new_page).
+
+They are created for every browser, context and Playwright session, so they are small __slots__ objects instead of
+closures, and only hold a weak reference to the bound method they replace: the object owning the method holds the
+hook, which then doesn't keep the object alive through a reference cycle.
+"""
+import asyncio
+import functools
+import inspect
+import weakref
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, Union
+
+from playwright import async_api, sync_api
+
+if TYPE_CHECKING:
+    # stealth.py imports this module
+    from playwright_stealth.stealth import Stealth
+
+
+@functools.lru_cache(maxsize=None)
+def hookable_method_names(browser_type_class: type) -> Tuple[str, ...]:
+    """Names of the methods of a BrowserType class that return a Browser or BrowserContext, computed once per class"""
+    return tuple(
+        name
+        for name, function in inspect.getmembers(browser_type_class, predicate=inspect.isfunction)
+        if function.__annotations__.get("return") in ("Browser", "BrowserContext")
+    )
+
+
+def _reference(method: Callable) -> Callable[[], Optional[Callable]]:
+    """Weak reference to a bound method, anything else (e.g. a plain function) is referenced strongly"""
+    if inspect.ismethod(method):
+        return weakref.WeakMethod(method)
+    return lambda: method
+
+
+def _coroutine_function(hook_class: type) -> type:
+    """
+    Makes the instances of an async hook pass as coroutine functions, like the methods they replace:
+    inspect.iscoroutinefunction from Python 3.12 on, asyncio.iscoroutinefunction on every version
+    """
+    if hasattr(inspect, "markcoroutinefunction"):
+        inspect.markcoroutinefunction(hook_class)
+    if hasattr(asyncio.coroutines, "_is_coroutine"):
+        hook_class._is_coroutine = asyncio.coroutines._is_coroutine
+    return hook_class
+
+
+class _Hook:
+    __slots__ = ("stealth", "engine", "_method", "__weakref__")
+
+    def __init__(self, stealth: "Stealth", method: Callable, engine: Optional[str]):
+        self.stealth = stealth
+        self.engine = engine
+        self._method = _reference(method)
+
+    @property
+    def method(self) -> Callable:
+        method = self._method()
+        if method is None:
+            raise ReferenceError("the object of the hooked Playwright method no longer exists")
+        return method
+
+
+@_coroutine_function
+class AsyncLaunchHook(_Hook):
+    __slots__ = ("chromium_mode",)
+
+    def __init__(self, stealth: "Stealth", method: Callable, engine: Optional[str], chromium_mode: bool):
+        super().__init__(stealth, method, engine)
+        self.chromium_mode = chromium_mode
+
+    async def __call__(self, *args, **kwargs) -> Union[async_api.Browser, async_api.BrowserContext]:
+        stealth, engine, method = self.stealth, self.engine, self.method
+        with stealth._span("launch", engine):
+            kwargs = _patched_kwargs(stealth, method, kwargs, self.chromium_mode, engine)
+            tenant = stealth
+            if stealth.native_first and method.__name__ == "launch_persistent_context":
+                tenant, kwargs = stealth._native_context(kwargs)
+            browser_or_context = await method(*args, **kwargs)
+            if isinstance(browser_or_context, async_api.BrowserContext):
+                context: async_api.BrowserContext = browser_or_context
+                if tenant.injection_strategy == "context":
+                    await tenant._apply_stealth_to_context_once_async(context, engine)
+                _mark_tenant_context(stealth, tenant, context)
+                context.new_page = AsyncNewPageHook(tenant, context.new_page, engine)
+            elif isinstance(browser_or_context, async_api.Browser):
+                browser: async_api.Browser = browser_or_context
+                browser.new_page = AsyncNewPageHook(stealth, browser.new_page, engine)
+                browser.new_context = AsyncNewContextHook(stealth, browser.new_context, engine)
+            else:
+                raise TypeError(
+                    f"unexpected type from function (bug): {method.__name__} returned {browser_or_context}"
+                )
+        return browser_or_context
+
+
+class SyncLaunchHook(_Hook):
+    __slots__ = ("chromium_mode",)
+
+    def __init__(self, stealth: "Stealth", method: Callable, engine: Optional[str], chromium_mode: bool):
+        super().__init__(stealth, method, engine)
+        self.chromium_mode = chromium_mode
+
+    def __call__(self, *args, **kwargs) -> Union[sync_api.Browser, sync_api.BrowserContext]:
+        stealth, engine, method = self.stealth, self.engine, self.method
+        with stealth._span("launch", engine):
+            kwargs = _patched_kwargs(stealth, method, kwargs, self.chromium_mode, engine)
+            tenant = stealth
+            if stealth.native_first and method.__name__ == "launch_persistent_context":
+                tenant, kwargs = stealth._native_context(kwargs)
+            browser_or_context = method(*args, **kwargs)
+            if isinstance(browser_or_context, sync_api.BrowserContext):
+                context: sync_api.BrowserContext = browser_or_context
+                if tenant.injection_strategy == "context":
+                    tenant._apply_stealth_to_context_once_sync(context, engine)
+                _mark_tenant_context(stealth, tenant, context)
+                context.new_page = SyncNewPageHook(tenant, context.new_page, engine)
+            elif isinstance(browser_or_context, sync_api.Browser):
+                browser: sync_api.Browser = browser_or_context
+                browser.new_page = SyncNewPageHook(stealth, browser.new_page, engine)
+                browser.new_context = SyncNewContextHook(stealth, browser.new_context, engine)
+            else:
+                raise TypeError(
+                    f"unexpected type from function (bug): {method.__name__} returned {browser_or_context}"
+                )
+        return browser_or_context
+
+
+def _patched_kwargs(stealth: "Stealth", method: Callable, kwargs: Dict[str, Any], chromium_mode: bool,
+                    engine: Optional[str]) -> Dict[str, Any]:
+    with stealth._span("patch_cli_args", engine):
+        return stealth._kwargs_with_patched_cli_arg(method, kwargs, chromium_mode)
+
+
+def _mark_tenant_context(stealth: "Stealth", tenant: "Stealth", context: Any) -> None:
+    """Records a context stealthed by another configuration as stealthed for the launching instance as well"""
+    if tenant is not stealth:
+        # e.g. its apply_to_browser_async must not register a second, different payload on it
+        stealth._stealthed_contexts.add(context)
+
+
+@_coroutine_function
+class AsyncNewContextHook(_Hook):
+    __slots__ = ()
+
+    async def __call__(self, *args, **kwargs) -> async_api.BrowserContext:
+        stealth, engine = self.stealth, self.engine
+        with stealth._span("new_context", engine):
+            # new_context(stealth=...) stealths this context with another configuration than the browser's
+            tenant, kwargs = stealth._context_tenant(kwargs)
+            if tenant.native_first:
+                browser = getattr(self.method, "__self__", None)
+                tenant, kwargs = await tenant._native_context_async(browser, kwargs)
+            context = await self.method(*args, **kwargs)
+            if tenant.injection_strategy == "context":
+                await tenant._apply_stealth_to_context_once_async(context, engine)
+            _mark_tenant_context(stealth, tenant, context)
+        context.new_page = AsyncNewPageHook(tenant, context.new_page, engine)
+        return context
+
+
+class SyncNewContextHook(_Hook):
+    __slots__ = ()
+
+    def __call__(self, *args, **kwargs) -> sync_api.BrowserContext:
+        stealth, engine = self.stealth, self.engine
+        with stealth._span("new_context", engine):
+            # new_context(stealth=...) stealths this context with another configuration than the browser's
+            tenant, kwargs = stealth._context_tenant(kwargs)
+            if tenant.native_first:
+                browser = getattr(self.method, "__self__", None)
+                tenant, kwargs = tenant._native_context_sync(browser, kwargs)
+            context = self.method(*args, **kwargs)
+            if tenant.injection_strategy == "context":
+                tenant._apply_stealth_to_context_once_sync(context, engine)
+            _mark_tenant_context(stealth, tenant, context)
+        context.new_page = SyncNewPageHook(tenant, context.new_page, engine)
+        return context
+
+
+@_coroutine_function
+class AsyncNewPageHook(_Hook):
+    """
+    *args and **kwargs even though new_page may not take any number of arguments,
+    we want to preserve accurate stack traces when caller passes args improperly
+    """
+    __slots__ = ()
+
+    async def __call__(self, *args, **kwargs) -> async_api.Page:
+        stealth, engine = self.stealth, self.engine
+        with stealth._span("new_page", engine):
+            page = await self.method(*args, **kwargs)
+            if stealth.injection_strategy == "context":
+                # context init scripts also apply to pages that already exist in that context
+                await stealth._apply_stealth_to_context_once_async(page.context, engine)
+            elif page.context not in stealth._stealthed_contexts:
+                # e.g. contexts stealthed by apply_to_browser_async already cover their new pages
+                await stealth.apply_stealth_async(page, engine)
+        return page
+
+
+class SyncNewPageHook(_Hook):
+    __slots__ = ()
+
+    def __call__(self, *args, **kwargs) -> sync_api.Page:
+        stealth, engine = self.stealth, self.engine
+        with stealth._span("new_page", engine):
+            page = self.method(*args, **kwargs)
+            if stealth.injection_strategy == "context":
+                # context init scripts also apply to pages that already exist in that context
+                stealth._apply_stealth_to_context_once_sync(page.context, engine)
+            elif page.context not in stealth._stealthed_contexts:
+                # e.g. contexts stealthed by apply_to_browser_async already cover their new pages
+                stealth.apply_stealth_sync(page, engine)
+        return page
+
+
+def is_coroutine_function(method: Callable) -> bool:
+    """inspect.iscoroutinefunction, which before Python 3.12 doesn't recognize async hooks, e.g. hooked twice"""
+    return inspect.iscoroutinefunction(method) or isinstance(
+        method, (AsyncLaunchHook, AsyncNewContextHook, AsyncNewPageHook)
+    )
@@ -12,16 +12,18 @@ if (!window.chrome) {
 }
 
 // app in window.chrome means we're running headful and don't need to mock anything
+// the mock is only built when a page first looks at `chrome.app`
 if (!("app" in window.chrome)) {
-  const makeError = {
-    ErrorInInvocation: (fn) => {
-      const err = new TypeError(`Error in invocation of app.${fn}()`);
-      return utils.stripErrorWithAnchor(err, `at ${fn} (eval at <anonymous>`);
-    },
-  };
+  window.chrome.app = utils.lazyObject((app) => {
+    const makeError = {
+      ErrorInInvocation: (fn) => {
+        const err = new TypeError(`Error in invocation of app.${fn}()`);
+        return utils.stripErrorWithAnchor(err, `at ${fn} (eval at <anonymous>`);
+      },
+    };
 
-  const APP_STATIC_DATA = JSON.parse(
-    `
+    const APP_STATIC_DATA = JSON.parse(
+      `
 {
   "isInstalled": false,
   "InstallState": {
@@ -35,34 +37,36 @@ if (!("app" in window.chrome)) {
     "RUNNING": "running"
   }
 }
-        `.trim()
-  );
+          `.trim()
+    );
 
-  window.chrome.app = {
-    ...APP_STATIC_DATA,
+    const properties = {
+      ...APP_STATIC_DATA,
 
-    get isInstalled() {
-      return false;
-    },
+      get isInstalled() {
+        return false;
+      },
 
-    getDetails: function getDetails() {
-      if (arguments.length) {
-        throw makeError.ErrorInInvocation(`getDetails`);
-      }
-      return null;
-    },
-    getIsInstalled: function getDetails() {
-      if (arguments.length) {
-        throw makeError.ErrorInInvocation(`getIsInstalled`);
-      }
-      return false;
-    },
-    runningState: function getDetails() {
-      if (arguments.length) {
-        throw makeError.ErrorInInvocation(`runningState`);
-      }
-      return "cannot_run";
-    },
-  };
-  utils.patchToStringNested(window.chrome.app);
+      getDetails: function getDetails() {
+        if (arguments.length) {
+          throw makeError.ErrorInInvocation(`getDetails`);
+        }
+        return null;
+      },
+      getIsInstalled: function getDetails() {
+        if (arguments.length) {
+          throw makeError.ErrorInInvocation(`getIsInstalled`);
+        }
+        return false;
+      },
+      runningState: function getDetails() {
+        if (arguments.length) {
+          throw makeError.ErrorInInvocation(`runningState`);
+        }
+        return "cannot_run";
+      },
+    };
+    Object.defineProperties(app, Object.getOwnPropertyDescriptors(properties));
+    utils.patchToStringNested(app);
+  });
 }
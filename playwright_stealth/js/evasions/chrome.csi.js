@@ -14,7 +14,7 @@ if (!window.chrome) {
 // Check if we're running headful and don't need to mock anything
 // Check that the Navigation Timing API v1 is available, we need that
 if (!("csi" in window.chrome) && window.performance?.timing) {
-  const { csi_timing } = window.performance;
+  const { timing: csi_timing } = window.performance;
 
   log("loading chrome.csi.js");
   window.chrome.csi = function () {
@@ -1,5 +1,7 @@
 log("loading chrome.hairline.js");
 // inspired by: https://intoli.com/blog/making-chrome-headless-undetectable/
+// offsetHeight is inherited from HTMLElement, every other div keeps the native getter
+const elementDescriptor = Object.getOwnPropertyDescriptor(HTMLElement.prototype, "offsetHeight");
 utils.replaceProperty(HTMLDivElement.prototype, "offsetHeight", {
   get: function () {
     // hmmm not sure about this
@@ -65,22 +65,23 @@ try {
     return iframe;
   };
 
+  // createElement is called in tight loops, so the common case (a string that can't be "iframe") is decided
+  // without allocating a new string
+  const isIframeTagName = (tagName) =>
+    typeof tagName === "string"
+      ? tagName.length === 6 && tagName.toLowerCase() === "iframe"
+      : `${tagName}`.toLowerCase() === "iframe";
+
   // Adds a hook to intercept iframe creation events
   const addIframeCreationSniffer = () => {
     /* global document */
     const createElementHandler = {
-      // Make toString() native
-      get(target, key) {
-        return Reflect.get(target, key);
-      },
       apply: function (target, thisArg, args) {
-        const isIframe = args && args.length && `${args[0]}`.toLowerCase() === "iframe";
-        if (!isIframe) {
+        if (args.length === 0 || !isIframeTagName(args[0])) {
           // Everything as usual
-          return target.apply(thisArg, args);
-        } else {
-          return handleIframeCreation(target, thisArg, args);
+          return utils.cache.Reflect.apply(target, thisArg, args);
         }
+        return handleIframeCreation(target, thisArg, args);
       },
     };
     // All this just due to iframes with srcdoc bug
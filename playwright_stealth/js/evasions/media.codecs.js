@@ -29,30 +29,65 @@ const parseInput = (arg) => {
   };
 };
 
+// Only these mime types are ever spoofed
+const spoofedMimeTypes = ["video/mp4", "audio/x-m4a", "audio/aac"];
+
+/**
+ * Returns our answer for a canPlayType argument, or null if the native implementation should answer.
+ *
+ * @param {String} arg
+ */
+const spoofCanPlayType = (arg) => {
+  if (!spoofedMimeTypes.some((mimeType) => arg.includes(mimeType))) {
+    return null;
+  }
+  const { mime, codecs } = parseInput(arg);
+  // This specific mp4 codec is missing in Chromium
+  if (mime === "video/mp4") {
+    if (codecs.includes("avc1.42E01E")) {
+      return "probably";
+    }
+  }
+  // This mimetype is only supported if no codecs are specified
+  if (mime === "audio/x-m4a" && !codecs.length) {
+    return "maybe";
+  }
+
+  // This mimetype is only supported if no codecs are specified
+  if (mime === "audio/aac" && !codecs.length) {
+    return "probably";
+  }
+  return null;
+};
+
+// Pages tend to probe the same handful of types over and over, bound so page scripts can't tamper with the lookups
+const spoofedResults = new Map();
+const getSpoofedResult = Map.prototype.get.bind(spoofedResults);
+const setSpoofedResult = Map.prototype.set.bind(spoofedResults);
+const clearSpoofedResults = Map.prototype.clear.bind(spoofedResults);
+const spoofedResultsSize = Object.getOwnPropertyDescriptor(Map.prototype, "size").get.bind(spoofedResults);
+
 const canPlayType = {
   // Intercept certain requests
   apply: function (target, ctx, args) {
-    if (!args || !args.length) {
-      return target.apply(ctx, args);
+    const arg = args[0];
+    // Anything that isn't a string is converted by the native implementation
+    if (typeof arg !== "string") {
+      return utils.cache.Reflect.apply(target, ctx, args);
     }
-    const { mime, codecs } = parseInput(args[0]);
-    // This specific mp4 codec is missing in Chromium
-    if (mime === "video/mp4") {
-      if (codecs.includes("avc1.42E01E")) {
-        return "probably";
+    let result = getSpoofedResult(arg);
+    if (result === undefined) {
+      result = spoofCanPlayType(arg);
+      if (spoofedResultsSize() >= 256) {
+        clearSpoofedResults();
       }
+      setSpoofedResult(arg, result);
     }
-    // This mimetype is only supported if no codecs are specified
-    if (mime === "audio/x-m4a" && !codecs.length) {
-      return "maybe";
-    }
-
-    // This mimetype is only supported if no codecs are specified
-    if (mime === "audio/aac" && !codecs.length) {
-      return "probably";
+    if (result !== null) {
+      return result;
     }
     // Everything else as usual
-    return target.apply(ctx, args);
+    return utils.cache.Reflect.apply(target, ctx, args);
   },
 };
 
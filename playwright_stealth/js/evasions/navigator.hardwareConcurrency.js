@@ -2,6 +2,6 @@ log("loading navigator.hardwareConcurrency");
 
 utils.replaceProperty(Object.getPrototypeOf(navigator), "hardwareConcurrency", {
   get() {
-    return 4;
+    return opts.navigator_hardware_concurrency;
   },
 });
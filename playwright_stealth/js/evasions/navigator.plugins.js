@@ -52,31 +52,40 @@ const data = {
 // That means we're running headful
 const hasPlugins = "plugins" in navigator && navigator.plugins.length;
 if (!hasPlugins) {
-  const mimeTypes = generateMagicArray(data.mimeTypes, MimeTypeArray.prototype, MimeType.prototype, "type");
-  const plugins = generateMagicArray(data.plugins, PluginArray.prototype, Plugin.prototype, "name");
+  // the arrays are only built when a page first reads `navigator.mimeTypes` or `navigator.plugins`
+  let magicArrays = null;
+  const materialize = () => {
+    if (magicArrays) {
+      return magicArrays;
+    }
+    const mimeTypes = generateMagicArray(data.mimeTypes, MimeTypeArray.prototype, MimeType.prototype, "type");
+    const plugins = generateMagicArray(data.plugins, PluginArray.prototype, Plugin.prototype, "name");
 
-  // Plugin and MimeType cross-reference each other, let's do that now
-  // Note: We're looping through `data.plugins` here, not the generated `plugins`
-  for (const pluginData of data.plugins) {
-    pluginData.__mimeTypes.forEach((type, index) => {
-      plugins[pluginData.name][index] = mimeTypes[type];
-      plugins[type] = mimeTypes[type];
-      Object.defineProperty(mimeTypes[type], "enabledPlugin", {
-        value: JSON.parse(JSON.stringify(plugins[pluginData.name])),
-        writable: false,
-        enumerable: false, // Important: `JSON.stringify(navigator.plugins)`
-        configurable: false,
+    // Plugin and MimeType cross-reference each other, let's do that now
+    // Note: We're looping through `data.plugins` here, not the generated `plugins`
+    for (const pluginData of data.plugins) {
+      pluginData.__mimeTypes.forEach((type, index) => {
+        plugins[pluginData.name][index] = mimeTypes[type];
+        plugins[type] = mimeTypes[type];
+        Object.defineProperty(mimeTypes[type], "enabledPlugin", {
+          value: JSON.parse(JSON.stringify(plugins[pluginData.name])),
+          writable: false,
+          enumerable: false, // Important: `JSON.stringify(navigator.plugins)`
+          configurable: false,
+        });
       });
-    });
-  }
+    }
+    magicArrays = { mimeTypes, plugins };
+    return magicArrays;
+  };
 
-  const patchNavigator = (name, value) =>
+  const patchNavigator = (name) =>
     utils.replaceProperty(Object.getPrototypeOf(navigator), name, {
       get() {
-        return value;
+        return materialize()[name];
       },
     });
 
-  patchNavigator("mimeTypes", mimeTypes);
-  patchNavigator("plugins", plugins);
+  patchNavigator("mimeTypes");
+  patchNavigator("plugins");
 }
@@ -2,7 +2,7 @@ log("loading webgl.vendor.js");
 
 const getParameterProxyHandler = {
   apply: function (target, ctx, args) {
-    const param = (args || [])[0];
+    const param = args[0];
     // UNMASKED_VENDOR_WEBGL
     if (param === 37445) {
       return opts.webgl_vendor || "Intel Inc."; // default in headless: Google Inc.
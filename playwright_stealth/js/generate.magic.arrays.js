@@ -1,4 +1,4 @@
-generateFunctionMocks = (proto, itemMainProp, dataArray) => ({
+const generateFunctionMocks = (proto, itemMainProp, dataArray) => ({
   item: utils.createProxy(proto.item, {
     apply(target, ctx, args) {
       if (!args.length) {
@@ -0,0 +1,69 @@
+/**
+ * Opt-in instrumentation (Stealth(instrumentation=True)), only included in the payload when enabled.
+ *
+ * Records how long each evasion took to install, and how often and for how long the traps of every proxy created
+ * through `utils.replaceWithProxy`, `utils.mockWithProxy` and `utils.createProxy` ran. The registry is stored
+ * under a non-enumerable `Symbol.for("playwright-stealth.metrics")` property of the window, where
+ * Stealth.collect_metrics_async / collect_metrics_sync read it from.
+ */
+utils.instrumentation = {
+  registry: { evasions: {}, traps: {} },
+  currentEvasion: null,
+  started: 0,
+};
+
+Object.defineProperty(window, Symbol.for("playwright-stealth.metrics"), {
+  value: utils.instrumentation.registry,
+  enumerable: false,
+  configurable: true,
+});
+
+utils.instrumentation.startEvasion = (name) => {
+  utils.instrumentation.currentEvasion = name;
+  utils.instrumentation.started = performance.now();
+};
+
+utils.instrumentation.endEvasion = (name) => {
+  utils.instrumentation.registry.evasions[name] = {
+    install_ms: performance.now() - utils.instrumentation.started,
+  };
+  utils.instrumentation.currentEvasion = null;
+};
+
+/**
+ * Returns a copy of the handler whose traps count their invocations and cumulative time.
+ *
+ * @param {string} name - The name the proxy is reported under, e.g. `canPlayType`
+ * @param {object} handler - The JS Proxy handler to instrument
+ */
+utils.instrumentation.instrumentHandler = (name, handler) => {
+  const key = `${utils.instrumentation.currentEvasion || "runtime"}:${name || "anonymous"}`;
+  const traps = (utils.instrumentation.registry.traps[key] = utils.instrumentation.registry.traps[key] || {});
+  const instrumented = {};
+  Object.getOwnPropertyNames(handler).forEach((trap) => {
+    const trapFn = handler[trap];
+    const counter = (traps[trap] = traps[trap] || { calls: 0, total_ms: 0 });
+    instrumented[trap] = function (a, b, c, d) {
+      const started = performance.now();
+      try {
+        return trapFn.call(this, a, b, c, d);
+      } finally {
+        counter.calls++;
+        counter.total_ms += performance.now() - started;
+      }
+    };
+  });
+  return instrumented;
+};
+
+const _replaceWithProxy = utils.replaceWithProxy;
+utils.replaceWithProxy = (obj, propName, handler) =>
+  _replaceWithProxy(obj, propName, utils.instrumentation.instrumentHandler(propName, handler));
+
+const _mockWithProxy = utils.mockWithProxy;
+utils.mockWithProxy = (obj, propName, pseudoTarget, handler) =>
+  _mockWithProxy(obj, propName, pseudoTarget, utils.instrumentation.instrumentHandler(propName, handler));
+
+const _createProxy = utils.createProxy;
+utils.createProxy = (pseudoTarget, handler) =>
+  _createProxy(pseudoTarget, utils.instrumentation.instrumentHandler(pseudoTarget && pseudoTarget.name, handler));
@@ -7,6 +7,9 @@ const utils = {};
  * Wraps a JS Proxy Handler and strips it's presence from error stacks, in case the traps throw.
  * The presence of a JS Proxy can be revealed as it shows up in error stack traces.
  *
+ * The wrappers sit on hot paths (e.g. `document.createElement`), so they forward a fixed number of arguments
+ * instead of going through `arguments` and `apply`, and only do any work beyond the call when a trap throws.
+ *
  * @param {object} handler - The JS Proxy handler to wrap
  */
 utils.stripProxyFromErrors = (handler = {}) => {
@@ -14,62 +17,73 @@ utils.stripProxyFromErrors = (handler = {}) => {
   // We wrap each trap in the handler in a try/catch and modify the error stack if they throw
   const traps = Object.getOwnPropertyNames(handler);
   traps.forEach((trap) => {
-    newHandler[trap] = function () {
+    const trapFn = handler[trap];
+    // No trap takes more than 4 arguments (`set`: target, key, value, receiver)
+    newHandler[trap] = function (a, b, c, d) {
       try {
         // Forward the call to the defined proxy handler
-        return handler[trap].apply(this, arguments || []);
+        return trapFn.call(this, a, b, c, d);
       } catch (err) {
-        // Stack traces differ per browser, we only support chromium based ones currently
-        if (!err || !err.stack || !err.stack.includes(`at `)) {
-          throw err;
-        }
-
-        // When something throws within one of our traps the Proxy will show up in error stacks
-        // An earlier implementation of this code would simply strip lines with a blacklist,
-        // but it makes sense to be more surgical here and only remove lines related to our Proxy.
-        // We try to use a known "anchor" line for that and strip it with everything above it.
-        // If the anchor line cannot be found for some reason we fall back to our blacklist approach.
-
-        const stripWithBlacklist = (stack) => {
-          const blacklist = [
-            `at Reflect.${trap} `, // e.g. Reflect.get or Reflect.apply
-            `at Object.${trap} `, // e.g. Object.get or Object.apply
-            `at Object.newHandler.<computed> [as ${trap}] `, // caused by this very wrapper :-)
-          ];
-          return (
-            err.stack
-              .split("\n")
-              // Always remove the first (file) line in the stack (guaranteed to be our proxy)
-              .filter((line, index) => index !== 1)
-              // Check if the line starts with one of our blacklisted strings
-              .filter((line) => !blacklist.some((bl) => line.trim().startsWith(bl)))
-              .join("\n")
-          );
-        };
-
-        const stripWithAnchor = (stack) => {
-          const stackArr = stack.split("\n");
-          const anchor = `at Object.newHandler.<computed> [as ${trap}] `; // Known first Proxy line in chromium
-          const anchorIndex = stackArr.findIndex((line) => line.trim().startsWith(anchor));
-          if (anchorIndex === -1) {
-            return false; // 404, anchor not found
-          }
-          // Strip everything from the top until we reach the anchor line
-          // Note: We're keeping the 1st line (zero index) as it's unrelated (e.g. `TypeError`)
-          stackArr.splice(1, anchorIndex);
-          return stackArr.join("\n");
-        };
-
-        // Try using the anchor method, fallback to blacklist if necessary
-        err.stack = stripWithAnchor(err.stack) || stripWithBlacklist(err.stack);
-
-        throw err; // Re-throw our now sanitized error
+        throw utils.sanitizeProxyError(err, trap); // Re-throw our now sanitized error
       }
     };
   });
   return newHandler;
 };
 
+/**
+ * Removes the lines caused by a trap wrapped with `utils.stripProxyFromErrors` from an error stack.
+ *
+ * @param {object} err - The error thrown in the trap
+ * @param {string} trap - The name of the trap, e.g. `apply`
+ */
+utils.sanitizeProxyError = (err, trap) => {
+  // Stack traces differ per browser, we only support chromium based ones currently
+  if (!err || !err.stack || !err.stack.includes(`at `)) {
+    return err;
+  }
+
+  // When something throws within one of our traps the Proxy will show up in error stacks
+  // An earlier implementation of this code would simply strip lines with a blacklist,
+  // but it makes sense to be more surgical here and only remove lines related to our Proxy.
+  // We try to use a known "anchor" line for that and strip it with everything above it.
+  // If the anchor line cannot be found for some reason we fall back to our blacklist approach.
+
+  const stripWithBlacklist = (stack) => {
+    const blacklist = [
+      `at Reflect.${trap} `, // e.g. Reflect.get or Reflect.apply
+      `at Object.${trap} `, // e.g. Object.get or Object.apply
+      `at Object.newHandler.<computed> [as ${trap}] `, // caused by the wrapper in stripProxyFromErrors :-)
+    ];
+    return (
+      err.stack
+        .split("\n")
+        // Always remove the first (file) line in the stack (guaranteed to be our proxy)
+        .filter((line, index) => index !== 1)
+        // Check if the line starts with one of our blacklisted strings
+        .filter((line) => !blacklist.some((bl) => line.trim().startsWith(bl)))
+        .join("\n")
+    );
+  };
+
+  const stripWithAnchor = (stack) => {
+    const stackArr = stack.split("\n");
+    const anchor = `at Object.newHandler.<computed> [as ${trap}] `; // Known first Proxy line in chromium
+    const anchorIndex = stackArr.findIndex((line) => line.trim().startsWith(anchor));
+    if (anchorIndex === -1) {
+      return false; // 404, anchor not found
+    }
+    // Strip everything from the top until we reach the anchor line
+    // Note: We're keeping the 1st line (zero index) as it's unrelated (e.g. `TypeError`)
+    stackArr.splice(1, anchorIndex);
+    return stackArr.join("\n");
+  };
+
+  // Try using the anchor method, fallback to blacklist if necessary
+  err.stack = stripWithAnchor(err.stack) || stripWithBlacklist(err.stack);
+  return err;
+};
+
 /**
  * Strip error lines from stack traces until (and including) a known line the stack.
  *
@@ -162,21 +176,25 @@ utils.makeNativeString = (name = "") => {
 };
 
 /**
- * Helper function to modify the `toString()` result of the provided object.
- *
- * Note: Use `utils.redirectToString` instead when possible.
+ * Installs the single `Function.prototype.toString` proxy (once per execution context).
  *
- * There's a quirk in JS Proxies that will cause the `toString()` result to differ from the vanilla Object.
- * If no string is provided we will generate a `[native code]` thing based on the name of the property object.
+ * Objects whose `toString()` result we modify are kept in a WeakMap registry instead of wrapping the current
+ * `Function.prototype.toString` in yet another Proxy for each of them, so a `toString()` call costs one lookup
+ * no matter how many objects are patched (and patching objects at runtime, e.g. in `chrome.runtime.connect()`,
+ * doesn't grow a proxy chain).
  *
- * @example
- * patchToString(WebGLRenderingContext.prototype.getParameter, 'function getParameter() { [native code] }')
- *
- * @param {object} obj - The object for which to modify the `toString()` representation
- * @param {string} str - Optional string used as a return value
+ * Registry entries are either the string to return or a function producing it on first use.
  */
-utils.patchToString = (obj, str = "") => {
+utils.installToStringProxy = () => {
   utils.preloadCache();
+  if (utils.cache.toStringOverrides) {
+    return;
+  }
+  // Bound copies, so page scripts overriding WeakMap.prototype can't sniff or break our lookups
+  const overrides = new WeakMap();
+  const getOverride = WeakMap.prototype.get.bind(overrides);
+  const setOverride = WeakMap.prototype.set.bind(overrides);
+  utils.cache.toStringOverrides = { get: getOverride, set: setOverride };
 
   const toStringProxy = new Proxy(Function.prototype.toString, {
     apply: function (target, ctx) {
@@ -184,10 +202,14 @@ utils.patchToString = (obj, str = "") => {
       if (ctx === Function.prototype.toString) {
         return utils.makeNativeString("toString");
       }
-      // `toString` targeted at our proxied Object detected
-      if (ctx === obj) {
-        // We either return the optional string verbatim or derive the most desired result automatically
-        return str || utils.makeNativeString(obj.name);
+      // `toString` targeted at one of our proxied Objects detected
+      let override = getOverride(ctx);
+      if (override !== undefined) {
+        if (typeof override === "function") {
+          override = override();
+          setOverride(ctx, override);
+        }
+        return override;
       }
       // Check if the toString protype of the context is the same as the global prototype,
       // if not indicates that we are doing a check across different windows., e.g. the iframeWithdirect` test case
@@ -204,6 +226,26 @@ utils.patchToString = (obj, str = "") => {
   });
 };
 
+/**
+ * Helper function to modify the `toString()` result of the provided object.
+ *
+ * Note: Use `utils.redirectToString` instead when possible.
+ *
+ * There's a quirk in JS Proxies that will cause the `toString()` result to differ from the vanilla Object.
+ * If no string is provided we will generate a `[native code]` thing based on the name of the property object.
+ *
+ * @example
+ * patchToString(WebGLRenderingContext.prototype.getParameter, 'function getParameter() { [native code] }')
+ *
+ * @param {object} obj - The object for which to modify the `toString()` representation
+ * @param {string} str - Optional string used as a return value
+ */
+utils.patchToString = (obj, str = "") => {
+  utils.installToStringProxy();
+  // We either return the optional string verbatim or derive the most desired result automatically
+  utils.cache.toStringOverrides.set(obj, () => str || utils.makeNativeString(obj.name));
+};
+
 /**
  * Make all nested functions of an object native.
  *
@@ -220,40 +262,15 @@ utils.patchToStringNested = (obj = {}) => {
  * @param {object} originalObj - The object which toString result we wan to return
  */
 utils.redirectToString = (proxyObj, originalObj) => {
-  utils.preloadCache();
+  utils.installToStringProxy();
 
-  const toStringProxy = new Proxy(Function.prototype.toString, {
-    apply: function (target, ctx) {
-      // This fixes e.g. `HTMLMediaElement.prototype.canPlayType.toString + ""`
-      if (ctx === Function.prototype.toString) {
-        return utils.makeNativeString("toString");
-      }
-
-      // `toString` targeted at our proxied Object detected
-      if (ctx === proxyObj) {
-        const fallback = () =>
-          originalObj && originalObj.name
-            ? utils.makeNativeString(originalObj.name)
-            : utils.makeNativeString(proxyObj.name);
-
-        // Return the toString representation of our original object if possible
-        return originalObj + "" || fallback();
-      }
+  const fallback = () =>
+    originalObj && originalObj.name
+      ? utils.makeNativeString(originalObj.name)
+      : utils.makeNativeString(proxyObj.name);
 
-      // Check if the toString protype of the context is the same as the global prototype,
-      // if not indicates that we are doing a check across different windows., e.g. the iframeWithdirect` test case
-      const hasSameProto = Object.getPrototypeOf(Function.prototype.toString).isPrototypeOf(ctx.toString); // eslint-disable-line no-prototype-builtins
-      if (!hasSameProto) {
-        // Pass the call on to the local Function.prototype.toString instead
-        return ctx.toString();
-      }
-
-      return target.call(ctx);
-    },
-  });
-  utils.replaceProperty(Function.prototype, "toString", {
-    value: toStringProxy,
-  });
+  // Return the toString representation of our original object if possible
+  utils.cache.toStringOverrides.set(proxyObj, () => originalObj + "" || fallback());
 };
 
 /**
@@ -323,6 +340,36 @@ utils.createProxy = (pseudoTarget, handler) => {
   return proxyObj;
 };
 
+/**
+ * Creates a plain object whose properties are only defined once the object is first inspected in any way
+ * (property access, `in`, `Object.keys`, descriptors, prototype, ...), for large mocks most pages never touch.
+ *
+ * The properties are defined by `populate` on the proxy target itself, so their descriptors, order and identity
+ * are exactly those of an eagerly built object.
+ *
+ * @example
+ * window.chrome.app = utils.lazyObject((app) => Object.assign(app, { isInstalled: false }))
+ *
+ * @param {function} populate - Called once with the (still empty) object to define its properties
+ */
+utils.lazyObject = (populate) => {
+  const target = {};
+  let populated = false;
+  const handler = {};
+  Object.getOwnPropertyNames(Reflect).forEach((trap) => {
+    // captured now, before page scripts could tamper with `Reflect`
+    const forward = Reflect[trap];
+    handler[trap] = function (t, a, b, c) {
+      if (!populated) {
+        populated = true;
+        populate(target);
+      }
+      return forward(t, a, b, c);
+    };
+  });
+  return new Proxy(target, utils.stripProxyFromErrors(handler));
+};
+
 /**
  * Helper function to split a full path to an Object into the first part and property.
  *
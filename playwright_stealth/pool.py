@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+import abc
+import asyncio
+import copy
+import sys
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, NamedTuple, Optional, Sequence, Set
+
+from playwright import async_api, sync_api
+from playwright.async_api import async_playwright
+from playwright.sync_api import sync_playwright
+
+from playwright_stealth.stealth import Stealth
+
+
+class PoolStats(NamedTuple):
+    idle: int  # contexts ready to be handed out (queue depth)
+    in_use: int
+    waiting: int  # callers currently waiting for a context
+    acquired: int
+    # contexts replaced: on release with isolate_storage, after max_uses / max_age, or because their browser went away
+    recycled: int
+    mean_wait: float  # seconds
+    max_wait: float  # seconds
+
+
+class _PooledContext:
+    __slots__ = ("context", "browser_index", "created_at", "uses")
+
+    # context is None for a placeholder: a slot whose replacement failed, retried by the next acquisition
+    def __init__(self, context: Any, browser_index: int):
+        self.context = context
+        self.browser_index = browser_index
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+
+def _raise_first_error(results: Sequence[Any]) -> None:
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+class _StealthPoolBase(abc.ABC):
+    def __init__(
+            self,
+            stealth: Stealth,
+            browser_type: str = "chromium",
+            browsers: int = 1,
+            contexts_per_browser: int = 4,
+            max_uses: Optional[int] = 100,
+            max_age: Optional[float] = None,
+            isolate_storage: bool = True,
+            launch_kwargs: Optional[Dict[str, Any]] = None,
+            context_kwargs: Optional[Dict[str, Any]] = None,
+    ):
+        if browsers < 1 or contexts_per_browser < 1:
+            raise ValueError("a pool needs at least one browser and one context per browser")
+        if stealth.injection_strategy != "context":
+            # contexts are stealthed while warming up, handing out a page then only costs a new_page() call
+            stealth = copy.copy(stealth)
+            stealth.injection_strategy = "context"
+        self.stealth = stealth
+        self.browser_type = browser_type
+        self.browsers = browsers
+        self.contexts_per_browser = contexts_per_browser
+        # only apply with isolate_storage=False, isolated contexts are never handed out twice
+        self.max_uses = max_uses
+        self.max_age = max_age
+        # True: a returned context is replaced by a fresh one, nothing carries over to the next user
+        # False: it is reset (pages closed, cookies and permissions cleared) and reused until max_uses acquisitions
+        # or max_age seconds, which is cheaper but localStorage, sessionStorage, IndexedDB, service workers and the
+        # HTTP cache carry over
+        self.isolate_storage = isolate_storage
+        self.launch_kwargs = launch_kwargs or {}
+        self.context_kwargs = context_kwargs or {}
+
+        self._browsers: List[Any] = []
+        self._in_use = 0
+        self._waiting = 0
+        self._acquired = 0
+        self._recycled = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    @property
+    def stats(self) -> PoolStats:
+        return PoolStats(
+            idle=self._idle_count(),
+            in_use=self._in_use,
+            waiting=self._waiting,
+            acquired=self._acquired,
+            recycled=self._recycled,
+            mean_wait=self._total_wait / self._acquired if self._acquired else 0.0,
+            max_wait=self._max_wait,
+        )
+
+    @abc.abstractmethod
+    def _idle_count(self) -> int:
+        """Contexts ready to be handed out"""
+
+    def _is_expired(self, pooled: _PooledContext) -> bool:
+        if pooled.context is None:
+            return True
+        if self.max_uses is not None and pooled.uses >= self.max_uses:
+            return True
+        if self.max_age is not None and time.monotonic() - pooled.created_at >= self.max_age:
+            return True
+        return not self._browsers[pooled.browser_index].is_connected()
+
+    def _is_reusable(self, pooled: _PooledContext) -> bool:
+        return not self.isolate_storage and not self._is_expired(pooled)
+
+    def _record_acquisition(self, wait: float) -> None:
+        self._in_use += 1
+        self._acquired += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+
+
+class AsyncStealthPool(_StealthPoolBase):
+    """
+    Keeps browsers and pre-stealthed contexts warm, so a ready stealth page costs about one new_page() call.
+    Returned contexts are replaced by fresh ones in a background task, so no storage carries over and the release
+    doesn't wait for the close and the new stealthed context.
+    With isolate_storage=False they are only reset (pages closed, cookies and permissions cleared) and reused until
+    max_uses acquisitions or max_age seconds, max_uses and max_age have no effect otherwise: localStorage,
+    sessionStorage, IndexedDB, service workers and the HTTP cache are then NOT isolated between users.
+    A context whose replacement fails (e.g. the browser died and can't be relaunched) keeps its slot, it is replaced
+    again by the next acquisition.
+
+    async with AsyncStealthPool(Stealth(), browsers=2, contexts_per_browser=4) as pool:
+        async with pool.page() as page:
+            ...
+    """
+
+    def __init__(self, stealth: Stealth, **kwargs):
+        super().__init__(stealth, **kwargs)
+        self._manager = None
+        self._idle: Optional["asyncio.Queue[_PooledContext]"] = None
+        self._relaunch_locks: List[asyncio.Lock] = []
+        self._refills: Set["asyncio.Future[None]"] = set()
+
+    async def __aenter__(self) -> "AsyncStealthPool":
+        self._manager = self.stealth.use_async(async_playwright())
+        playwright = await self._manager.__aenter__()
+        try:
+            self._browser_type: async_api.BrowserType = playwright[self.browser_type]
+            self._idle = asyncio.Queue()
+            self._relaunch_locks = [asyncio.Lock() for _ in range(self.browsers)]
+            # every launch is awaited, so the browsers that did start are closed when another one fails
+            launched = await asyncio.gather(
+                *(self._browser_type.launch(**self.launch_kwargs) for _ in range(self.browsers)),
+                return_exceptions=True,
+            )
+            self._browsers = [browser for browser in launched if not isinstance(browser, BaseException)]
+            _raise_first_error(launched)
+            pooled_contexts = await asyncio.gather(
+                *(self._new_context(index) for index in range(self.browsers) for _ in range(self.contexts_per_browser)),
+                return_exceptions=True,
+            )
+            _raise_first_error(pooled_contexts)
+        except BaseException:
+            await self.__aexit__(*sys.exc_info())
+            raise
+        for pooled in pooled_contexts:
+            self._idle.put_nowait(pooled)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        try:
+            # replacements never raise, waiting for them keeps a browser they relaunch from leaking
+            await asyncio.gather(*self._refills, return_exceptions=True)
+            await asyncio.gather(*(browser.close() for browser in self._browsers), return_exceptions=True)
+        finally:
+            await self._manager.__aexit__(exc_type, exc_val, exc_tb)
+
+    @asynccontextmanager
+    async def context(self) -> AsyncIterator[async_api.BrowserContext]:
+        pooled = await self._acquire()
+        try:
+            yield pooled.context
+        finally:
+            await self._release(pooled)
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[async_api.Page]:
+        async with self.context() as context:
+            page = await context.new_page()
+            try:
+                yield page
+            finally:
+                await page.close()
+
+    def _idle_count(self) -> int:
+        return self._idle.qsize() if self._idle is not None else 0
+
+    async def _acquire(self) -> _PooledContext:
+        started = time.monotonic()
+        self._waiting += 1
+        try:
+            pooled = await self._idle.get()
+            if self._is_expired(pooled):
+                try:
+                    pooled = await self._replace(pooled)
+                except BaseException:
+                    self._idle.put_nowait(_PooledContext(None, pooled.browser_index))
+                    raise
+        finally:
+            self._waiting -= 1
+        self._record_acquisition(time.monotonic() - started)
+        return pooled
+
+    async def _release(self, pooled: _PooledContext) -> None:
+        """
+        Never raises an Exception: it runs in a finally block, where it would hide the caller's own exception.
+        A cancelled release still gives the slot back before re-raising.
+        """
+        self._in_use -= 1
+        pooled.uses += 1
+        try:
+            if self._is_reusable(pooled):
+                try:
+                    await asyncio.gather(*(page.close() for page in pooled.context.pages))
+                    await pooled.context.clear_cookies()
+                    await pooled.context.clear_permissions()
+                    self._idle.put_nowait(pooled)
+                    return
+                except Exception:
+                    pass  # a context that can't be reset is replaced
+        except BaseException:
+            self._idle.put_nowait(_PooledContext(None, pooled.browser_index))
+            raise
+        refill = asyncio.ensure_future(self._refill(pooled))
+        self._refills.add(refill)
+        refill.add_done_callback(self._refills.discard)
+
+    async def _refill(self, pooled: _PooledContext) -> None:
+        try:
+            pooled = await self._replace(pooled)
+        except Exception:
+            # the slot is kept, the next acquisition tries again
+            pooled = _PooledContext(None, pooled.browser_index)
+        except BaseException:
+            self._idle.put_nowait(_PooledContext(None, pooled.browser_index))
+            raise
+        self._idle.put_nowait(pooled)
+
+    async def _replace(self, pooled: _PooledContext) -> _PooledContext:
+        self._recycled += 1
+        if pooled.context is not None:
+            try:
+                await pooled.context.close()
+            except Exception:
+                pass  # the context or its browser is already gone
+        return await self._new_context(pooled.browser_index)
+
+    async def _new_context(self, browser_index: int) -> _PooledContext:
+        if not self._browsers[browser_index].is_connected():
+            async with self._relaunch_locks[browser_index]:
+                # another replacement on the same browser may have relaunched it while this one waited
+                if not self._browsers[browser_index].is_connected():
+                    self._browsers[browser_index] = await self._browser_type.launch(**self.launch_kwargs)
+        context = await self._browsers[browser_index].new_context(**self.context_kwargs)
+        return _PooledContext(context, browser_index)
+
+
+class SyncStealthPool(_StealthPoolBase):
+    """
+    Sync counterpart of AsyncStealthPool. The sync API is bound to one thread, so instead of waiting for a
+    context to be returned, acquiring one from an exhausted pool raises a RuntimeError, and returned contexts are
+    replaced before the release returns.
+
+    with SyncStealthPool(Stealth(), contexts_per_browser=2) as pool:
+        with pool.page() as page:
+            ...
+    """
+
+    def __init__(self, stealth: Stealth, **kwargs):
+        super().__init__(stealth, **kwargs)
+        self._manager = None
+        self._idle: Deque[_PooledContext] = deque()
+
+    def __enter__(self) -> "SyncStealthPool":
+        self._manager = self.stealth.use_sync(sync_playwright())
+        playwright = self._manager.__enter__()
+        try:
+            self._browser_type: sync_api.BrowserType = playwright[self.browser_type]
+            for _ in range(self.browsers):
+                self._browsers.append(self._browser_type.launch(**self.launch_kwargs))
+            for index in range(self.browsers):
+                for _ in range(self.contexts_per_browser):
+                    self._idle.append(self._new_context(index))
+        except BaseException:
+            self.__exit__(*sys.exc_info())
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        try:
+            for browser in self._browsers:
+                browser.close()
+        finally:
+            self._manager.__exit__(exc_type, exc_val, exc_tb)
+
+    @contextmanager
+    def context(self) -> Iterator[sync_api.BrowserContext]:
+        pooled = self._acquire()
+        try:
+            yield pooled.context
+        finally:
+            self._release(pooled)
+
+    @contextmanager
+    def page(self) -> Iterator[sync_api.Page]:
+        with self.context() as context:
+            page = context.new_page()
+            try:
+                yield page
+            finally:
+                page.close()
+
+    def _idle_count(self) -> int:
+        return len(self._idle)
+
+    def _acquire(self) -> _PooledContext:
+        if not self._idle:
+            raise RuntimeError(f"all {self.browsers * self.contexts_per_browser} pooled contexts are in use")
+        started = time.monotonic()
+        pooled = self._idle.popleft()
+        if self._is_expired(pooled):
+            try:
+                pooled = self._replace(pooled)
+            except BaseException:
+                self._idle.append(_PooledContext(None, pooled.browser_index))
+                raise
+        self._record_acquisition(time.monotonic() - started)
+        return pooled
+
+    def _release(self, pooled: _PooledContext) -> None:
+        """
+        Never raises an Exception: it runs in a finally block, where it would hide the caller's own exception.
+        An interrupted release (e.g. KeyboardInterrupt) still gives the slot back before re-raising.
+        """
+        self._in_use -= 1
+        pooled.uses += 1
+        try:
+            if self._is_reusable(pooled):
+                try:
+                    for page in pooled.context.pages:
+                        page.close()
+                    pooled.context.clear_cookies()
+                    pooled.context.clear_permissions()
+                    self._idle.append(pooled)
+                    return
+                except Exception:
+                    pass  # a context that can't be reset is replaced
+            try:
+                pooled = self._replace(pooled)
+            except Exception:
+                # the slot is kept, the next acquisition tries again
+                pooled = _PooledContext(None, pooled.browser_index)
+        except BaseException:
+            self._idle.append(_PooledContext(None, pooled.browser_index))
+            raise
+        self._idle.append(pooled)
+
+    def _replace(self, pooled: _PooledContext) -> _PooledContext:
+        self._recycled += 1
+        if pooled.context is not None:
+            try:
+                pooled.context.close()
+            except Exception:
+                pass  # the context or its browser is already gone
+        return self._new_context(pooled.browser_index)
+
+    def _new_context(self, browser_index: int) -> _PooledContext:
+        if not self._browsers[browser_index].is_connected():
+            self._browsers[browser_index] = self._browser_type.launch(**self.launch_kwargs)
+        context = self._browsers[browser_index].new_context(**self.context_kwargs)
+        return _PooledContext(context, browser_index)
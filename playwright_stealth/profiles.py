@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Catalog of consistent fingerprint profiles (user agent, platform, languages, hardware concurrency and WebGL
+vendor/renderer), see Stealth.from_profile and Stealth.random_profile.
+
+Catalog files are JSON: "fields" names the Stealth option each column maps to, "profiles" maps a profile name to
+its row, and user agents are stored once in "user_agents" and referenced by index, since many profiles share one.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+
+class ProfileCatalog:
+    """Fingerprint profiles by name, the file is only read on first use"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._catalog: Optional[Dict[str, Any]] = None
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+
+    def _load(self) -> Dict[str, Any]:
+        if self._catalog is None:
+            self._catalog = json.loads(self.path.read_text())
+        return self._catalog
+
+    @property
+    def names(self) -> List[str]:
+        return sorted(self._load()["profiles"])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._load()["profiles"]
+
+    def __len__(self) -> int:
+        return len(self._load()["profiles"])
+
+    def __getitem__(self, name: str) -> Dict[str, Any]:
+        """Returns the Stealth keyword arguments of a profile"""
+        profile = self._profiles.get(name)
+        if profile is None:
+            catalog = self._load()
+            try:
+                row = catalog["profiles"][name]
+            except KeyError:
+                raise KeyError(f"unknown fingerprint profile {name!r}, available: {', '.join(self.names)}") from None
+            profile = dict(zip(catalog["fields"], row))
+            profile["navigator_user_agent_override"] = catalog["user_agents"][profile["navigator_user_agent_override"]]
+            profile["navigator_languages_override"] = tuple(profile["navigator_languages_override"])
+            self._profiles[name] = profile
+        return dict(profile)
+
+
+DEFAULT_CATALOG = ProfileCatalog(Path(__file__).parent / "profiles.json")
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-process runner: shards tasks across worker processes that each own their own Playwright instance and browser.
+
+    async def fetch_title(page: Page, url: str) -> str:
+        await page.goto(url)
+        return await page.title()
+
+    for result in run(Stealth(), fetch_title, urls, processes=4, concurrency=8):
+        print(result.item, result.value, result.error)
+
+The task must be a module level async function (it is pickled by reference), it receives a fresh stealthed page
+in its own context for every item. Results are yielded as soon as they complete, not in submission order.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import traceback
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, NamedTuple, Optional
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from playwright_stealth.stealth import Stealth
+
+Task = Callable[[async_api.Page, Any], Awaitable[Any]]
+_STOP = "__playwright_stealth_runner_stop__"
+_NOTHING = object()
+
+
+class TaskResult(NamedTuple):
+    item: Any
+    value: Any
+    # formatted traceback if the task raised, exceptions themselves aren't necessarily picklable
+    error: Optional[str]
+    worker: int
+
+
+class _WorkerFailed(NamedTuple):
+    worker: int
+    error: str
+
+
+def run(
+        stealth: Stealth,
+        task: Task,
+        items: Iterable[Any],
+        processes: Optional[int] = None,
+        concurrency: int = 4,
+        browser_type: str = "chromium",
+        launch_kwargs: Optional[Dict[str, Any]] = None,
+        context_kwargs: Optional[Dict[str, Any]] = None,
+) -> Iterator[TaskResult]:
+    """
+    Runs task(page, item) for every item across a pool of processes, at most `concurrency` pages per process.
+    Items are handed out through a shared queue, so faster workers take more of them. The queue is bounded and
+    refilled as workers take items, so `items` may be a lazy iterable that is only consumed as the run progresses.
+    Raises RuntimeError if a worker process fails outside of a task (e.g. the browser can't be launched).
+    """
+    processes = processes or os.cpu_count() or 1
+    # fork is unsafe with the threads Playwright (and the caller) may already have running
+    mp_context = multiprocessing.get_context("spawn")
+    # a couple of items per consumer keeps every worker busy without pickling the whole input up front
+    capacity = processes * concurrency * 2
+    task_queue = mp_context.Queue(capacity)
+    result_queue = mp_context.Queue()
+
+    items = iter(items)
+    first_items = list(itertools.islice(items, capacity))
+    workers = [
+        mp_context.Process(
+            target=_worker,
+            args=(index, stealth, task, concurrency, browser_type, launch_kwargs or {}, context_kwargs or {},
+                  task_queue, result_queue),
+            daemon=True,
+        )
+        for index in range(min(processes, len(first_items)))
+    ]
+    unsent = itertools.chain(first_items, items)
+    stops = len(workers) * concurrency
+    held = _NOTHING  # the next item, once the queue had no room for it
+    pending = 0
+    for worker in workers:
+        worker.start()
+    try:
+        while True:
+            while unsent is not None or stops:
+                if held is _NOTHING:
+                    held = next(unsent, _NOTHING) if unsent is not None else _STOP
+                    if held is _NOTHING:
+                        unsent, held = None, _STOP
+                try:
+                    task_queue.put_nowait(held)
+                except queue.Full:
+                    break
+                if held is _STOP:
+                    stops -= 1
+                else:
+                    pending += 1
+                held = _NOTHING
+            if not pending and unsent is None:
+                break
+            try:
+                result = result_queue.get(timeout=1)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    raise RuntimeError(f"all workers exited with {pending} tasks left")
+                continue
+            if isinstance(result, _WorkerFailed):
+                raise RuntimeError(f"worker {result.worker} failed:\n{result.error}")
+            pending -= 1
+            yield result
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+
+
+def _worker(index: int, stealth: Stealth, task: Task, concurrency: int, browser_type: str,
+            launch_kwargs: Dict[str, Any], context_kwargs: Dict[str, Any],
+            task_queue: multiprocessing.Queue, result_queue: multiprocessing.Queue) -> None:
+    try:
+        asyncio.run(_run_worker(index, stealth, task, concurrency, browser_type, launch_kwargs, context_kwargs,
+                                task_queue, result_queue))
+    except BaseException:
+        result_queue.put(_WorkerFailed(index, traceback.format_exc()))
+
+
+async def _run_worker(index: int, stealth: Stealth, task: Task, concurrency: int, browser_type: str,
+                      launch_kwargs: Dict[str, Any], context_kwargs: Dict[str, Any],
+                      task_queue: multiprocessing.Queue, result_queue: multiprocessing.Queue) -> None:
+    loop = asyncio.get_running_loop()
+    async with stealth.use_async(async_playwright()) as playwright:
+        browser = await playwright[browser_type].launch(**launch_kwargs)
+
+        async def consume() -> None:
+            while True:
+                # the queue is shared between processes, so the blocking get is moved off the event loop
+                item = await loop.run_in_executor(None, task_queue.get)
+                if isinstance(item, str) and item == _STOP:
+                    return
+                context = None
+                try:
+                    # a context that can't be created is this item's error, it doesn't stop the run
+                    context = await browser.new_context(**context_kwargs)
+                    page = await context.new_page()
+                    result = TaskResult(item, await task(page, item), None, index)
+                except Exception:
+                    result = TaskResult(item, None, traceback.format_exc(), index)
+                finally:
+                    if context is not None:
+                        await context.close()
+                result_queue.put(result)
+
+        await asyncio.gather(*(consume() for _ in range(concurrency)))
+        await browser.close()
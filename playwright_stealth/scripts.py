@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Evasion script sources and what the payload variants are bundled from. Only uses the standard library, so the
+package build pre-builds the default bundles from this module and bundler.py without Playwright (see setup.py).
+"""
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+
+def from_file(name) -> str:
+    return (Path(__file__).parent / "js" / name).read_text()
+
+
+class _ScriptSources(Mapping):
+    """Script sources by name, each file is only read on first access and then cached"""
+
+    def __init__(self, file_names: Dict[str, str]):
+        self._file_names = file_names
+        self._sources: Dict[str, str] = {}
+
+    def __getitem__(self, name: str) -> str:
+        source = self._sources.get(name)
+        if source is None:
+            source = self._sources[name] = from_file(self._file_names[name])
+        return source
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._file_names)
+
+    def __len__(self) -> int:
+        return len(self._file_names)
+
+
+SCRIPTS: Mapping[str, str] = _ScriptSources({
+    "generate_magic_arrays": "generate.magic.arrays.js",
+    "utils": "utils.js",
+    "instrumentation": "instrumentation.js",
+    "chrome_app": "evasions/chrome.app.js",
+    "chrome_csi": "evasions/chrome.csi.js",
+    "chrome_hairline": "evasions/chrome.hairline.js",
+    "chrome_load_times": "evasions/chrome.load.times.js",
+    "chrome_runtime": "evasions/chrome.runtime.js",
+    "iframe_content_window": "evasions/iframe.contentWindow.js",
+    "media_codecs": "evasions/media.codecs.js",
+    "navigator_hardware_concurrency": "evasions/navigator.hardwareConcurrency.js",
+    "navigator_languages": "evasions/navigator.languages.js",
+    "navigator_permissions": "evasions/navigator.permissions.js",
+    "navigator_platform": "evasions/navigator.platform.js",
+    "navigator_plugins": "evasions/navigator.plugins.js",
+    "navigator_user_agent": "evasions/navigator.userAgent.js",
+    "navigator_vendor": "evasions/navigator.vendor.js",
+    "navigator_webdriver": "evasions/navigator.webdriver.js",
+    "webgl_vendor": "evasions/webgl.vendor.js",
+})
+
+# evasions enabled by Stealth() in payload order, every catalog profile uses this set as well
+DEFAULT_EVASIONS = (
+    "chrome_app",
+    "chrome_csi",
+    "chrome_hairline",
+    "chrome_load_times",
+    "iframe_content_window",
+    "media_codecs",
+    "navigator_languages",
+    "navigator_permissions",
+    "navigator_platform",
+    "navigator_plugins",
+    "navigator_user_agent",
+    "navigator_vendor",
+    "navigator_webdriver",
+    "webgl_vendor",
+)
+# evasions for Chromium quirks (or that make other engines look like Chrome), left out of the firefox / webkit payload
+_CHROMIUM_ONLY_EVASIONS = frozenset({
+    "chrome_app",
+    "chrome_csi",
+    "chrome_hairline",
+    "chrome_load_times",
+    "chrome_runtime",
+    "iframe_content_window",
+    "media_codecs",
+    "navigator_permissions",
+    "navigator_plugins",
+    "navigator_vendor",
+})
+# the stack stripping in utils.stripProxyFromErrors only understands V8 stack traces, elsewhere the wrapper is skipped
+_UTILS_OVERRIDES = {
+    "non_chromium": ("utils.stripProxyFromErrors = (handler = {}) => handler;",),
+}
+# payload variants, None being the full (chromium) payload
+VARIANTS = (None, "non_chromium")
+
+
+def variant_evasion_names(evasion_names: Iterable[str], variant: Optional[str]) -> Iterator[str]:
+    if variant is None:
+        return iter(evasion_names)
+    return (name for name in evasion_names if name not in _CHROMIUM_ONLY_EVASIONS)
+
+
+def bundle_inputs(
+        evasion_scripts: Tuple[str, ...], variant: Optional[str], without_logging: bool
+) -> Tuple[str, str, Tuple[str, ...], Tuple[str, ...], bool]:
+    """Arguments of bundler.bundle_evasions"""
+    # only read when an evasion may use it, bundle_evasions decides whether one actually does
+    may_use_magic_arrays = any("generateMagicArray" in script for script in evasion_scripts)
+    magic_arrays = SCRIPTS["generate_magic_arrays"] if may_use_magic_arrays else ""
+    return SCRIPTS["utils"], magic_arrays, evasion_scripts, _UTILS_OVERRIDES.get(variant, ()), without_logging
+
+
+def default_bundle_inputs() -> List[Tuple[str, str, Tuple[str, ...], Tuple[str, ...], bool]]:
+    """bundle_inputs of the default evasion set for every payload variant, see bundler.write_prebuilt_bundles"""
+    return [
+        bundle_inputs(
+            tuple(SCRIPTS[name] for name in variant_evasion_names(DEFAULT_EVASIONS, variant)), variant, True
+        )
+        for variant in VARIANTS
+    ]
@@ -1,45 +1,153 @@
 # -*- coding: utf-8 -*-
+import functools
+import asyncio
+import copy
+import hashlib
 import inspect
 import json
+import random
 import re
 import warnings
+import weakref
+from collections import OrderedDict
 from collections.abc import Callable
-from copy import deepcopy
-from pathlib import Path
-from typing import Dict, List, Union, Any
+from dataclasses import dataclass
+from typing import ContextManager, Dict, FrozenSet, Iterator, List, NamedTuple, Sequence, Union, Any
 
 from playwright import async_api, sync_api
 
+from playwright_stealth.bundler import bundle_evasions, specialize, write_prebuilt_bundles
+from playwright_stealth.hooks import (
+    AsyncLaunchHook, AsyncNewContextHook, AsyncNewPageHook, SyncLaunchHook, SyncNewContextHook, SyncNewPageHook,
+    hookable_method_names, is_coroutine_function,
+)
 from playwright_stealth.context_managers import AsyncWrappingContextManager, SyncWrappingContextManager
+from playwright_stealth.profiles import DEFAULT_CATALOG, ProfileCatalog
+from playwright_stealth.scripts import SCRIPTS, bundle_inputs, default_bundle_inputs, from_file, variant_evasion_names
+from playwright_stealth.tracing import NOOP_TRACER, NoopTracer, Tracer
 
 
-def from_file(name) -> str:
-    return (Path(__file__).parent / "js" / name).read_text()
-
-
-SCRIPTS: Dict[str, str] = {
-    "generate_magic_arrays": from_file("generate.magic.arrays.js"),
-    "utils": from_file("utils.js"),
-    "chrome_app": from_file("evasions/chrome.app.js"),
-    "chrome_csi": from_file("evasions/chrome.csi.js"),
-    "chrome_hairline": from_file("evasions/chrome.hairline.js"),
-    "chrome_load_times": from_file("evasions/chrome.load.times.js"),
-    "chrome_runtime": from_file("evasions/chrome.runtime.js"),
-    "iframe_content_window": from_file("evasions/iframe.contentWindow.js"),
-    "media_codecs": from_file("evasions/media.codecs.js"),
-    "navigator_hardware_concurrency": from_file("evasions/navigator.hardwareConcurrency.js"),
-    "navigator_languages": from_file("evasions/navigator.languages.js"),
-    "navigator_permissions": from_file("evasions/navigator.permissions.js"),
-    "navigator_platform": from_file("evasions/navigator.platform.js"),
-    "navigator_plugins": from_file("evasions/navigator.plugins.js"),
-    "navigator_user_agent": from_file("evasions/navigator.userAgent.js"),
-    "navigator_vendor": from_file("evasions/navigator.vendor.js"),
-    "navigator_webdriver": from_file("evasions/navigator.webdriver.js"),
-    "webgl_vendor": from_file("evasions/webgl.vendor.js"),
-}
-
 from typing import Tuple, Optional
 
+INJECTION_STRATEGIES = ("page", "context")
+FRAME_POLICIES = ("all", "top", "same-origin")
+ENGINES = ("chromium", "firefox", "webkit")
+# compiled payloads shared by all instances, keyed by configuration
+_COMPILED_PAYLOADS: "OrderedDict[Tuple, CompiledPayload]" = OrderedDict()
+_COMPILED_PAYLOADS_MAXSIZE = 512
+# bundles by evasion set, they don't depend on option values so there are only ever a handful of them
+_BUNDLES: Dict[Tuple, str] = {}
+
+_OPTIONS_KEY = json.dumps("__playwright_stealth_options__")
+_OPTIONS_PRELUDE = f"""const opts = globalThis[{_OPTIONS_KEY}];
+if (!opts) {{
+  return;
+}}
+delete globalThis[{_OPTIONS_KEY}];"""
+
+
+# user agent of every chromium browser without "Headless", read once per browser for native_first
+_BROWSER_USER_AGENTS: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+
+# reads the registry written by js/instrumentation.js
+_COLLECT_METRICS = """() => window[Symbol.for("playwright-stealth.metrics")] || null"""
+
+
+def _origin_pattern(globs: Sequence[str]) -> str:
+    """Regular expression (valid in both Python and JS) matching an origin against any of the globs"""
+    return "^(?:" + "|".join(".*".join(re.escape(part) for part in glob.split("*")) for glob in globs) + ")$"
+
+
+def _accept_language(languages: Sequence[str]) -> str:
+    """Accept-Language header the way Chrome builds it from a language list, e.g. fr-FR,fr;q=0.9"""
+    return ",".join(
+        language if index == 0 else f"{language};q={max(1.0 - index / 10, 0.1):.1f}"
+        for index, language in enumerate(languages)
+    )
+
+
+def _headful_user_agent(user_agent: str) -> str:
+    """What navigator.userAgent.js turns the user agent into"""
+    return user_agent.replace("HeadlessChrome/", "Chrome/")
+
+
+def _engine_variant(engine: Optional[str]) -> Optional[str]:
+    """Payload variant for an engine, None being the full payload"""
+    if engine is None or engine == "chromium":
+        return None
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {ENGINES}, got {engine!r}")
+    return "non_chromium"
+
+
+@functools.lru_cache(maxsize=64)
+def _digest(script: str) -> str:
+    return hashlib.sha256(script.encode()).hexdigest()
+
+# switches that take a comma separated list, we add our values to the user's instead of overriding them
+_FEATURE_LIST_SWITCHES = frozenset({
+    "--disable-blink-features",
+    "--enable-blink-features",
+    "--disable-features",
+    "--enable-features",
+})
+_NO_CLI_ARGS_PARAMETER = object()
+
+
+@functools.lru_cache(maxsize=None)
+def _default_cli_args(function: Callable) -> Any:
+    """Default of the launch method's `args` parameter, cached per function since inspect.signature isn't cheap"""
+    args_parameter = inspect.signature(function).parameters.get("args")
+    return _NO_CLI_ARGS_PARAMETER if args_parameter is None else args_parameter.default
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledPayload:
+    """
+    Immutable result of Stealth.compile().
+    Safe to share between pages, contexts and worker processes. Equality and hashing only look at the digest,
+    so comparing two payloads doesn't compare the (~50 KB) scripts themselves.
+    The bundle only depends on the enabled evasions and is shared by all configurations with the same evasion set,
+    the per-configuration part is the few hundred bytes options script.
+    """
+    options_script: str
+    bundle: str
+    digest: str
+
+    @classmethod
+    def create(cls, options_script: str, bundle: str) -> "CompiledPayload":
+        if not bundle:
+            # nothing would read the options
+            options_script = ""
+        return cls(options_script, bundle, hashlib.sha256((options_script + _digest(bundle)).encode()).hexdigest())
+
+    @functools.cached_property
+    def script(self) -> str:
+        """
+        Options and bundle as a single script, the bundle reads (and removes) what the options script set.
+        Concatenated once, on first access.
+        """
+        if not self.bundle:
+            return ""
+        return self.options_script + "\n" + self.bundle
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CompiledPayload):
+            return NotImplemented
+        return self.digest == other.digest
+
+    def __hash__(self) -> int:
+        return hash(self.digest)
+
+
+class TargetResult(NamedTuple):
+    """Outcome of Stealth.apply_to_browser_async / apply_to_browser_sync for one context, page or frame"""
+    target: Any  # BrowserContext, Page or Frame
+    # "registered": payload registered on the context, "skipped": it already was, "evaluated": payload ran in place,
+    # "failed": registering or evaluating raised, see error
+    action: str
+    error: Optional[str] = None
+
 
 class Stealth:
     """
@@ -69,7 +177,7 @@ class Stealth:
             chrome_runtime: bool = False,
             iframe_content_window: bool = True,
             media_codecs: bool = True,
-            navigator_hardware_concurrency: bool = True,
+            navigator_hardware_concurrency: Union[bool, int] = False,
             navigator_languages: bool = True,
             navigator_permissions: bool = True,
             navigator_platform: bool = True,
@@ -86,6 +194,15 @@ class Stealth:
             chrome_runtime_run_on_insecure_origins: bool = False,
             init_scripts_only: bool = False,
             script_logging: bool = False,
+            injection_strategy: str = "page",
+            frame_policy: str = "all",
+            frame_origin_allowlist: Sequence[str] = (),
+            frame_origin_blocklist: Sequence[str] = (),
+            minify_payload: bool = True,
+            specialize_payload: bool = False,
+            native_first: bool = False,
+            instrumentation: bool = False,
+            tracer: Optional[Tracer] = None,
     ):
         # scripts to load
         self.navigator_webdriver: bool = navigator_webdriver
@@ -96,7 +213,9 @@ class Stealth:
         self.chrome_runtime: bool = chrome_runtime
         self.iframe_content_window: bool = iframe_content_window
         self.media_codecs: bool = media_codecs
-        self.navigator_hardware_concurrency: int = navigator_hardware_concurrency
+        # off by default: only navigator is patched, workers keep reporting the real count
+        # True spoofs 4 cores, an int spoofs that many (profiles set it)
+        self.navigator_hardware_concurrency: Union[bool, int] = navigator_hardware_concurrency
         self.navigator_languages: bool = navigator_languages
         self.navigator_permissions: bool = navigator_permissions
         self.navigator_platform: bool = navigator_platform
@@ -115,6 +234,131 @@ class Stealth:
         self.chrome_runtime_run_on_insecure_origins: Optional[bool] = chrome_runtime_run_on_insecure_origins
         self.init_scripts_only: bool = init_scripts_only
         self.script_logging = script_logging
+        if injection_strategy not in INJECTION_STRATEGIES:
+            raise ValueError(f"injection_strategy must be one of {INJECTION_STRATEGIES}, got {injection_strategy!r}")
+        # "page": register the payload on every page created through hooked methods
+        # "context": register the payload once per BrowserContext, pages (and popups) inherit it
+        self.injection_strategy: str = injection_strategy
+        if frame_policy not in FRAME_POLICIES:
+            raise ValueError(f"frame_policy must be one of {FRAME_POLICIES}, got {frame_policy!r}")
+        # which subframes run the evasions (the top frame always does): "all", "top" (none) or "same-origin" (as the
+        # top frame), origin globs such as "https://*.example.com" are always (allowlist) or never (blocklist) stealthed
+        self.frame_policy: str = frame_policy
+        self.frame_origin_allowlist: Tuple[str, ...] = tuple(frame_origin_allowlist)
+        self.frame_origin_blocklist: Tuple[str, ...] = tuple(frame_origin_blocklist)
+        # ship a comment/whitespace-stripped bundle without unused utils helpers
+        self.minify_payload: bool = minify_payload
+        # inline the option values into the bundle and drop the branches they decide: less work in every frame, but
+        # one bundle per option set instead of one shared by all of them (needs minify_payload, off with script_logging)
+        self.specialize_payload: bool = specialize_payload
+        # hooked new_context / launch_persistent_context set the user agent and languages through context options
+        # (HTTP headers included) and leave the matching evasions out of the payload when they are fully covered
+        self.native_first: bool = native_first
+        # record per-evasion install times and proxy trap counters in the page, see collect_metrics_async
+        self.instrumentation: bool = instrumentation
+
+        # contexts that already have the payload registered, so it is never registered twice
+        self._stealthed_contexts = weakref.WeakSet()
+        # pages that have it registered on their own (injection_strategy="page"), so they are never evaluated again
+        self._stealthed_pages = weakref.WeakSet()
+        # per-context overrides given by profile name (new_context(stealth="...")), one instance per profile
+        self._profile_tenants: Dict[str, "Stealth"] = {}
+        # copies without the evasions native_first covered through context options, by covered evasions
+        self._native_tenants: Dict[FrozenSet[str], "Stealth"] = {}
+        # not part of the configuration, so it's neither pickled nor part of the payload cache key
+        self._tracer: Tracer = tracer or NOOP_TRACER
+
+    @property
+    def tracer(self) -> Tracer:
+        """Receives timing spans of the hooked Playwright lifecycle, see playwright_stealth.tracing"""
+        return self._tracer
+
+    @tracer.setter
+    def tracer(self, tracer: Optional[Tracer]) -> None:
+        self._tracer = tracer or NOOP_TRACER
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if not name.startswith("_"):
+            # any option change invalidates the memoized payloads, and the tenants derived from this configuration
+            super().__setattr__("_compiled_payloads", {})
+            super().__setattr__("_profile_tenants", {})
+            super().__setattr__("_native_tenants", {})
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # only the options are sent to other processes, the payload is rebuilt (and cached) on the other side
+        return {name: value for name, value in self.__dict__.items() if not name.startswith("_")}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._stealthed_contexts = weakref.WeakSet()
+        self._stealthed_pages = weakref.WeakSet()
+        self._profile_tenants = {}
+        self._native_tenants = {}
+        self._tracer = NOOP_TRACER
+        self._compiled_payloads = {}
+
+    def __copy__(self) -> "Stealth":
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        # the copy may be reconfigured, so it must not consider the original's contexts as stealthed
+        clone._stealthed_contexts = weakref.WeakSet()
+        clone._stealthed_pages = weakref.WeakSet()
+        clone._profile_tenants = {}
+        clone._native_tenants = {}
+        return clone
+
+    def compile(self, engine: Optional[str] = None) -> CompiledPayload:
+        """
+        Builds the payload for the current configuration, or returns the memoized one if no option changed since.
+        Note: options are compared by assignment, mutating e.g. a list option in place won't invalidate the cache.
+        engine: "chromium", "firefox" or "webkit" to leave out evasions that only apply to Chromium (None: all)
+        Returns: CompiledPayload of enabled scripts
+        """
+        variant = _engine_variant(engine)
+        compiled = self._compiled_payloads.get(variant)
+        if compiled is None:
+            # instances with the same configuration (e.g. the same profile) share one payload
+            config_key = self._config_key()
+            payload_key = (config_key, variant)
+            compiled = _COMPILED_PAYLOADS.get(payload_key) if config_key is not None else None
+            if compiled is None:
+                compiled = CompiledPayload.create(self.options_payload, self._bundle(variant))
+                if config_key is not None:
+                    _COMPILED_PAYLOADS[payload_key] = compiled
+                    if len(_COMPILED_PAYLOADS) > _COMPILED_PAYLOADS_MAXSIZE:
+                        _COMPILED_PAYLOADS.popitem(last=False)
+            else:
+                _COMPILED_PAYLOADS.move_to_end(payload_key)
+            self._compiled_payloads[variant] = compiled
+        return compiled
+
+    def _config_key(self) -> Optional[Tuple]:
+        """Hashable key of all options, or None if an option value isn't hashable"""
+        options = tuple(sorted(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in self.__dict__.items() if not name.startswith("_")
+        ))
+        try:
+            hash(options)
+        except TypeError:
+            return None
+        return type(self), options
+
+    @classmethod
+    def from_profile(cls, name: str, catalog: ProfileCatalog = DEFAULT_CATALOG, **kwargs) -> "Stealth":
+        """
+        Creates a Stealth configured with a consistent fingerprint profile from the catalog,
+        any keyword argument overrides the profile's value.
+
+        Stealth.from_profile("macos-chrome-apple-m1", navigator_languages_override=("de-DE", "de"))
+        """
+        return cls(**{**catalog[name], **kwargs})
+
+    @classmethod
+    def random_profile(cls, seed: Any = None, catalog: ProfileCatalog = DEFAULT_CATALOG, **kwargs) -> "Stealth":
+        """Like from_profile with a randomly chosen profile, the same seed always picks the same profile"""
+        return cls.from_profile(random.Random(seed).choice(catalog.names), catalog=catalog, **kwargs)
 
     @property
     def script_payload(self) -> str:
@@ -122,16 +366,58 @@ class Stealth:
         Generates an immediately invoked function expression for all enabled scripts
         Returns: string of enabled scripts in IIFE
         """
-        scripts_block = "\n".join(self.enabled_scripts)
+        return self.compile().script
+
+    def _bundle_key(self, variant: Optional[str] = None) -> Tuple:
+        """Everything the bundle depends on, option values are deliberately not part of it"""
+        return (
+            type(self), self.minify_payload, self.script_logging, self.instrumentation, variant,
+            tuple(self._variant_evasion_names(variant)),
+        )
+
+    @property
+    def _specialized(self) -> bool:
+        return self.specialize_payload and self.minify_payload and not self.script_logging
+
+    def _bundle(self, variant: Optional[str] = None) -> str:
+        if self._specialized:
+            # not shared between option sets, compile() caches it per configuration
+            return self._build_bundle(variant)
+        bundle_key = self._bundle_key(variant)
+        bundle = _BUNDLES.get(bundle_key)
+        if bundle is None:
+            bundle = _BUNDLES[bundle_key] = self._build_bundle(variant)
+        return bundle
+
+    def _build_bundle(self, variant: Optional[str] = None) -> str:
+        if type(self).enabled_scripts is Stealth.enabled_scripts:
+            scripts = self._enabled_scripts(variant)
+        else:
+            # subclasses extending enabled_scripts get the same scripts on every engine
+            scripts = self.enabled_scripts
+        scripts_block = "\n".join(scripts)
         if len(scripts_block) == 0:
             return ""
-        return "(() => {\n" + scripts_block + "\n})();"
+        return "(() => {\n" + _OPTIONS_PRELUDE + "\n" + scripts_block + "\n})();"
 
     @property
     def options_payload(self) -> str:
-        opts = {
+        # handed over to the bundle through a property it deletes before any page script runs
+        opts = json.dumps(self._options())
+        define = f"Object.defineProperty(globalThis, {_OPTIONS_KEY}, {{value: {opts}, configurable: true}});"
+        guard = self._frame_guard()
+        if guard is None:
+            return define
+        # frames excluded by the frame policy don't get the options, so the bundle returns before doing any work
+        return "(() => {\n" + guard + "\n" + define + "\n})();"
+
+    def _options(self) -> Dict[str, Any]:
+        """The `opts` object of the payload"""
+        return {
             "chrome_runtime_run_on_insecure_origins": self.chrome_runtime_run_on_insecure_origins,
-            "navigator_hardware_concurrency": self.navigator_hardware_concurrency,
+            "navigator_hardware_concurrency": (
+                4 if self.navigator_hardware_concurrency is True else self.navigator_hardware_concurrency
+            ),
             "navigator_languages_override": self.navigator_languages_override,
             "navigator_platform": self.navigator_platform_override,
             "navigator_user_agent": self.navigator_user_agent_override,
@@ -140,51 +426,109 @@ class Stealth:
             "webgl_vendor": self.webgl_vendor_override,
             "script_logging": self.script_logging,
         }
-        return f"const opts = {json.dumps(opts)};"
+
+    def _frame_guard(self) -> Optional[str]:
+        """Statements returning early in the subframes excluded by the frame policy, None if none are"""
+        if self.frame_policy == "all" and not self.frame_origin_blocklist:
+            return None
+        # window.origin, unlike location.origin ("null"), is inherited by about:srcdoc and about:blank frames
+        lines = ["if (window !== window.top) {", "  const origin = self.origin;"]
+        if self.frame_origin_blocklist:
+            pattern = json.dumps(_origin_pattern(self.frame_origin_blocklist))
+            lines.append(f"  if (new RegExp({pattern}).test(origin)) return;")
+        if self.frame_policy != "all":
+            condition = "true"
+            if self.frame_origin_allowlist:
+                condition = f"!new RegExp({json.dumps(_origin_pattern(self.frame_origin_allowlist))}).test(origin)"
+            lines.append(f"  if ({condition}) {{")
+            if self.frame_policy == "top":
+                lines.append("    return;")
+            else:
+                # reading the top frame's origin throws when it is cross-origin
+                lines += [
+                    "    let topOrigin = null;",
+                    "    try { topOrigin = window.top.origin; } catch (e) {}",
+                    "    if (topOrigin !== origin) return;",
+                ]
+            lines.append("  }")
+        lines.append("}")
+        return "\n".join(lines)
 
     @property
-    def enabled_scripts(self):
-        evasion_script_block = "\n".join(self._evasion_scripts)
-        if len(evasion_script_block) == 0:
-            return ""
+    def enabled_scripts(self) -> Iterator[str]:
+        return self._enabled_scripts()
+
+    def _enabled_scripts(self, variant: Optional[str] = None) -> Iterator[str]:
+        evasion_names = tuple(self._variant_evasion_names(variant))
+        evasion_scripts = tuple(SCRIPTS[name] for name in evasion_names)
+        if len("".join(evasion_scripts)) == 0:
+            return
+        if self.instrumentation:
+            evasion_scripts = (SCRIPTS["instrumentation"],) + tuple(
+                f"utils.instrumentation.startEvasion({json.dumps(name)});\n{script}\n"
+                f"utils.instrumentation.endEvasion({json.dumps(name)});"
+                for name, script in zip(evasion_names, evasion_scripts)
+            )
+        inputs = bundle_inputs(evasion_scripts, variant, not self.script_logging)
+
+        if self.minify_payload:
+            bundle = bundle_evasions(*inputs)
+            if self._specialized:
+                scalars = tuple(sorted(
+                    (name, value) for name, value in self._options().items() if not isinstance(value, (list, tuple))
+                ))
+                bundle = specialize(bundle, scalars)
+            yield bundle
+        else:
+            yield SCRIPTS["utils"]
+            yield from inputs[3]  # utils overrides
+            yield SCRIPTS["generate_magic_arrays"]
+            yield "\n".join(evasion_scripts)
+
+    def _variant_evasion_names(self, variant: Optional[str]) -> Iterator[str]:
+        return variant_evasion_names(self._evasion_names, variant)
 
-        yield self.options_payload
-        yield SCRIPTS["utils"]
-        yield SCRIPTS["generate_magic_arrays"]
-        yield evasion_script_block
+    @property
+    def _evasion_scripts(self) -> Iterator[str]:
+        """Sources of all enabled evasions, regardless of engine"""
+        for name in self._evasion_names:
+            yield SCRIPTS[name]
 
     @property
-    def _evasion_scripts(self) -> str:
+    def _evasion_names(self) -> Iterator[str]:
+        """SCRIPTS names of the enabled evasions"""
         if self.chrome_app:
-            yield SCRIPTS["chrome_app"]
+            yield "chrome_app"
         if self.chrome_csi:
-            yield SCRIPTS["chrome_csi"]
+            yield "chrome_csi"
         if self.hairline:
-            yield SCRIPTS["chrome_hairline"]
+            yield "chrome_hairline"
         if self.chrome_load_times:
-            yield SCRIPTS["chrome_load_times"]
+            yield "chrome_load_times"
         if self.chrome_runtime:
-            yield SCRIPTS["chrome_runtime"]
+            yield "chrome_runtime"
         if self.iframe_content_window:
-            yield SCRIPTS["iframe_content_window"]
+            yield "iframe_content_window"
         if self.media_codecs:
-            yield SCRIPTS["media_codecs"]
+            yield "media_codecs"
+        if self.navigator_hardware_concurrency:
+            yield "navigator_hardware_concurrency"
         if self.navigator_languages:
-            yield SCRIPTS["navigator_languages"]
+            yield "navigator_languages"
         if self.navigator_permissions:
-            yield SCRIPTS["navigator_permissions"]
+            yield "navigator_permissions"
         if self.navigator_platform:
-            yield SCRIPTS["navigator_platform"]
+            yield "navigator_platform"
         if self.navigator_plugins:
-            yield SCRIPTS["navigator_plugins"]
+            yield "navigator_plugins"
         if self.navigator_user_agent:
-            yield SCRIPTS["navigator_user_agent"]
+            yield "navigator_user_agent"
         if self.navigator_vendor:
-            yield SCRIPTS["navigator_vendor"]
+            yield "navigator_vendor"
         if self.navigator_webdriver:
-            yield SCRIPTS["navigator_webdriver"]
+            yield "navigator_webdriver"
         if self.webgl_vendor:
-            yield SCRIPTS["webgl_vendor"]
+            yield "webgl_vendor"
 
     def use_async(self, ctx: async_api.PlaywrightContextManager) -> AsyncWrappingContextManager:
         """
@@ -208,151 +552,363 @@ class Stealth:
         """
         return SyncWrappingContextManager(self, ctx)
 
-    async def apply_stealth_async(self, page_or_context: Union[async_api.Page, async_api.BrowserContext]) -> None:
-        if len(self.script_payload) > 0:
-            await page_or_context.add_init_script(self.script_payload)
+    async def apply_stealth_async(
+            self,
+            page_or_context: Union[async_api.Page, async_api.BrowserContext],
+            engine: Optional[str] = None,
+    ) -> None:
+        """
+        engine ("chromium", "firefox" or "webkit") selects the payload variant for that engine (see compile), and tags
+        the "inject" span (see playwright_stealth.tracing). The hooked methods pass it automatically.
+        """
+        compiled = self.compile(engine)
+        if compiled.bundle:
+            with self._span("inject", engine):
+                # init scripts run in registration order, the shared bundle isn't concatenated per option set
+                await page_or_context.add_init_script(compiled.options_script)
+                await page_or_context.add_init_script(compiled.bundle)
+            if isinstance(page_or_context, async_api.BrowserContext):
+                self._stealthed_contexts.add(page_or_context)
+            else:
+                self._stealthed_pages.add(page_or_context)
+
+    def apply_stealth_sync(
+            self,
+            page_or_context: Union[sync_api.Page, sync_api.BrowserContext],
+            engine: Optional[str] = None,
+    ) -> None:
+        """
+        engine ("chromium", "firefox" or "webkit") selects the payload variant for that engine (see compile), and tags
+        the "inject" span (see playwright_stealth.tracing). The hooked methods pass it automatically.
+        """
+        compiled = self.compile(engine)
+        if compiled.bundle:
+            with self._span("inject", engine):
+                page_or_context.add_init_script(compiled.options_script)
+                page_or_context.add_init_script(compiled.bundle)
+            if isinstance(page_or_context, sync_api.BrowserContext):
+                self._stealthed_contexts.add(page_or_context)
+            else:
+                self._stealthed_pages.add(page_or_context)
+
+    async def _apply_stealth_to_context_once_async(
+            self, context: async_api.BrowserContext, engine: Optional[str] = None
+    ) -> None:
+        if context not in self._stealthed_contexts:
+            # mark before awaiting, concurrent new_page calls on this context must not register it again
+            self._stealthed_contexts.add(context)
+            try:
+                await self.apply_stealth_async(context, engine)
+            except BaseException:
+                # not registered after all, the next new_page tries again instead of handing out unstealthed pages
+                self._stealthed_contexts.discard(context)
+                raise
+
+    def _apply_stealth_to_context_once_sync(
+            self, context: sync_api.BrowserContext, engine: Optional[str] = None
+    ) -> None:
+        if context not in self._stealthed_contexts:
+            self._stealthed_contexts.add(context)
+            try:
+                self.apply_stealth_sync(context, engine)
+            except BaseException:
+                self._stealthed_contexts.discard(context)
+                raise
+
+    async def apply_to_browser_async(
+            self,
+            browser: async_api.Browser,
+            max_concurrency: int = 16,
+            evaluate_existing: bool = False,
+            engine: Optional[str] = None,
+    ) -> List[TargetResult]:
+        """
+        Registers the payload on every context of an already running browser (e.g. one attached to with
+        connect_over_cdp) concurrently, at most max_concurrency calls in flight. Contexts this instance already
+        stealthed are skipped.
+        Init scripts only run on the next navigation, evaluate_existing also runs the payload in every frame of the
+        pages that are already open, in the contexts registered by this call only. Pages this instance stealthed on
+        their own (injection_strategy="page") aren't evaluated, but since their context gets the payload registered
+        too, they run it twice from their next navigation on.
+        Returns: a TargetResult per context and (with evaluate_existing) per frame, errors don't stop the others
+        """
+        engine = engine or browser.browser_type.name
+        compiled = self.compile(engine)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def register(context: async_api.BrowserContext) -> TargetResult:
+            if context in self._stealthed_contexts:
+                return TargetResult(context, "skipped")
+            async with semaphore:
+                try:
+                    await self._apply_stealth_to_context_once_async(context, engine)
+                except Exception as error:
+                    return TargetResult(context, "failed", repr(error))
+            return TargetResult(context, "registered")
+
+        async def evaluate(frame: async_api.Frame) -> TargetResult:
+            async with semaphore:
+                try:
+                    await frame.evaluate(compiled.script)
+                except Exception as error:
+                    return TargetResult(frame, "failed", repr(error))
+            return TargetResult(frame, "evaluated")
+
+        results = list(await asyncio.gather(*(register(context) for context in browser.contexts)))
+        if evaluate_existing and compiled.bundle:
+            results += await asyncio.gather(*(
+                evaluate(frame) for frame in self._frames_to_evaluate(results)
+            ))
+        return results
+
+    def apply_to_browser_sync(
+            self,
+            browser: sync_api.Browser,
+            evaluate_existing: bool = False,
+            engine: Optional[str] = None,
+    ) -> List[TargetResult]:
+        """Sync counterpart of apply_to_browser_async, the sync API can't overlap calls so targets are done in turn"""
+        engine = engine or browser.browser_type.name
+        compiled = self.compile(engine)
+        results = []
+        for context in browser.contexts:
+            if context in self._stealthed_contexts:
+                results.append(TargetResult(context, "skipped"))
+                continue
+            try:
+                self._apply_stealth_to_context_once_sync(context, engine)
+                results.append(TargetResult(context, "registered"))
+            except Exception as error:
+                results.append(TargetResult(context, "failed", repr(error)))
+        if evaluate_existing and compiled.bundle:
+            for frame in self._frames_to_evaluate(results):
+                try:
+                    frame.evaluate(compiled.script)
+                    results.append(TargetResult(frame, "evaluated"))
+                except Exception as error:
+                    results.append(TargetResult(frame, "failed", repr(error)))
+        return results
+
+    def _frames_to_evaluate(self, registrations: List[TargetResult]) -> Iterator[Any]:
+        """Frames of the open pages of the contexts registered by this call, except pages stealthed on their own"""
+        for registration in registrations:
+            if registration.action == "registered":
+                for page in registration.target.pages:
+                    if page not in self._stealthed_pages:
+                        yield from page.frames
+
+    def _span(self, name: str, engine: Optional[str]) -> ContextManager[Any]:
+        if isinstance(self._tracer, NoopTracer):
+            # skip building the attributes, this runs for every page
+            return self._tracer.span(name, {})
+        evasions = tuple(self._variant_evasion_names(_engine_variant(engine)))
+        return self._tracer.span(name, {"engine": engine or "unknown", "evasions": evasions})
+
+    async def collect_metrics_async(
+            self, page_or_frame: Union[async_api.Page, async_api.Frame]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Reads the metrics recorded in a page (or frame) stealthed with instrumentation=True.
+        Returns: {"evasions": {name: {"install_ms"}}, "traps": {"evasion:proxy": {trap: {"calls", "total_ms"}}}},
+            or None if the page wasn't instrumented
+        """
+        return await page_or_frame.evaluate(_COLLECT_METRICS)
 
-    def apply_stealth_sync(self, page_or_context: Union[sync_api.Page, sync_api.BrowserContext]) -> None:
-        if len(self.script_payload) > 0:
-            page_or_context.add_init_script(self.script_payload)
+    def collect_metrics_sync(self, page_or_frame: Union[sync_api.Page, sync_api.Frame]) -> Optional[Dict[str, Any]]:
+        """Sync counterpart of collect_metrics_async"""
+        return page_or_frame.evaluate(_COLLECT_METRICS)
 
     def _kwargs_with_patched_cli_arg(self, method: Callable, packed_kwargs: Dict[str, Any], chromium_mode: bool) -> \
             Dict[str, Any]:
-        signature = inspect.signature(method).parameters
-        args_parameter = signature.get("args")
-
-        # deep just in case
-        new_kwargs = deepcopy(packed_kwargs)
-        if args_parameter is not None:
-            if chromium_mode and not self.init_scripts_only:
-                new_cli_args = new_kwargs.get("args", args_parameter.default)
-                if self.navigator_webdriver:
-                    new_cli_args = self._patch_blink_features_cli_args(new_cli_args or [])
-                if self.navigator_languages:
-                    languages_cli_flag = f"--accept-lang={','.join(self.navigator_languages_override)}"
-                    new_cli_args = self._patch_cli_arg(new_cli_args or [], languages_cli_flag)
-                new_kwargs["args"] = new_cli_args
+        if not chromium_mode or self.init_scripts_only:
+            return packed_kwargs
+        default_cli_args = _default_cli_args(getattr(method, "__func__", method))
+        if default_cli_args is _NO_CLI_ARGS_PARAMETER:
+            return packed_kwargs
+
+        flags = []
+        if self.navigator_webdriver:
+            flags.append("--disable-blink-features=AutomationControlled")
+        if self.navigator_languages:
+            flags.append(f"--accept-lang={','.join(self.navigator_languages_override)}")
+        if not flags:
+            return packed_kwargs
+
+        # shallow copy, proxy/env/storage_state etc. are passed through untouched, only the args list is rebuilt
+        new_kwargs = dict(packed_kwargs)
+        new_kwargs["args"] = self._patch_cli_args(new_kwargs.get("args", default_cli_args), flags)
         return new_kwargs
 
+    def _context_tenant(self, kwargs: Dict[str, Any]) -> Tuple["Stealth", Dict[str, Any]]:
+        """
+        Resolves the `stealth` override of a hooked new_context call (a Stealth, a profile name or None for this
+        instance), returns it with the kwargs to pass on to Playwright. A profile name keeps every other option of
+        this instance.
+        """
+        if "stealth" not in kwargs:
+            return self, kwargs
+        kwargs = dict(kwargs)
+        tenant = kwargs.pop("stealth")
+        if tenant is None:
+            return self, kwargs
+        if isinstance(tenant, str):
+            name = tenant
+            tenant = self._profile_tenants.get(name)
+            if tenant is None:
+                # this instance's configuration with only the profile's fingerprint applied
+                tenant = self._profile_tenants[name] = copy.copy(self)
+                for option, value in DEFAULT_CATALOG[name].items():
+                    setattr(tenant, option, value)
+        elif not isinstance(tenant, Stealth):
+            raise TypeError(f"stealth must be a Stealth instance or a profile name, got {tenant!r}")
+        return tenant, tenant._reconciled_context_kwargs(self, kwargs)
+
+    def _reconciled_context_kwargs(self, launched_by: "Stealth", kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        --accept-lang is browser wide and set from the Stealth that launched the browser, so a context stealthed with
+        other languages sends them through its locale and Accept-Language header instead. The caller's own locale or
+        header win. (--disable-blink-features=AutomationControlled is browser wide as well, but navigator.webdriver
+        is covered in the page either way.)
+        """
+        if not self.navigator_languages or not self.navigator_languages_override:
+            return kwargs
+        launched_languages = launched_by.navigator_languages and tuple(launched_by.navigator_languages_override)
+        if tuple(self.navigator_languages_override) == launched_languages:
+            return kwargs
+        return self._language_context_kwargs(kwargs)
+
+    def _language_context_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Sets the locale and Accept-Language header of a context from the languages, unless the caller did"""
+        languages = self.navigator_languages_override
+        headers = dict(kwargs.get("extra_http_headers") or {})
+        if not any(name.lower() == "accept-language" for name in headers):
+            headers["Accept-Language"] = _accept_language(languages)
+            kwargs["extra_http_headers"] = headers
+        kwargs.setdefault("locale", languages[0])
+        return kwargs
+
+    def _native_context(self, kwargs: Dict[str, Any], default_user_agent: Optional[str] = None) -> \
+            Tuple["Stealth", Dict[str, Any]]:
+        """
+        native_first: moves the user agent and languages to the options of a new context, returns the Stealth to
+        apply to it (without the evasions the options fully cover) and the rewritten kwargs.
+        default_user_agent is the browser's own user agent without "Headless", when known.
+        """
+        kwargs = dict(kwargs)
+        covered = set()
+        if self.navigator_user_agent:
+            user_agent = kwargs.get("user_agent") or self.navigator_user_agent_override or default_user_agent
+            if user_agent:
+                # also sent as the User-Agent header and seen by workers, which the evasion doesn't patch
+                kwargs["user_agent"] = user_agent
+                covered.add("navigator_user_agent")
+        if self.navigator_languages and self.navigator_languages_override:
+            kwargs = self._language_context_kwargs(kwargs)
+            # the locale sets navigator.languages to that single language, longer lists still need the evasion
+            if list(self.navigator_languages_override) == [kwargs["locale"]]:
+                covered.add("navigator_languages")
+        if not covered:
+            return self, kwargs
+        covered = frozenset(covered)
+        tenant = self._native_tenants.get(covered)
+        if tenant is None:
+            tenant = self._native_tenants[covered] = copy.copy(self)
+            for name in covered:
+                setattr(tenant, name, False)
+        return tenant, kwargs
+
+    async def _native_context_async(self, browser: Optional[async_api.Browser], kwargs: Dict[str, Any]) -> \
+            Tuple["Stealth", Dict[str, Any]]:
+        default_user_agent = None
+        if self._needs_default_user_agent(browser, kwargs):
+            default_user_agent = _BROWSER_USER_AGENTS.get(browser)
+            if default_user_agent is None:
+                session = await browser.new_browser_cdp_session()
+                try:
+                    version = await session.send("Browser.getVersion")
+                finally:
+                    await session.detach()
+                default_user_agent = _BROWSER_USER_AGENTS[browser] = _headful_user_agent(version["userAgent"])
+        return self._native_context(kwargs, default_user_agent)
+
+    def _native_context_sync(self, browser: Optional[sync_api.Browser], kwargs: Dict[str, Any]) -> \
+            Tuple["Stealth", Dict[str, Any]]:
+        default_user_agent = None
+        if self._needs_default_user_agent(browser, kwargs):
+            default_user_agent = _BROWSER_USER_AGENTS.get(browser)
+            if default_user_agent is None:
+                session = browser.new_browser_cdp_session()
+                try:
+                    version = session.send("Browser.getVersion")
+                finally:
+                    session.detach()
+                default_user_agent = _BROWSER_USER_AGENTS[browser] = _headful_user_agent(version["userAgent"])
+        return self._native_context(kwargs, default_user_agent)
+
+    def _needs_default_user_agent(self, browser: Any, kwargs: Dict[str, Any]) -> bool:
+        """Whether the browser's user agent has to be read (over CDP, so chromium only) for native_first"""
+        return (
+            self.navigator_user_agent and not self.navigator_user_agent_override and not kwargs.get("user_agent")
+            and browser is not None and browser.browser_type.name == "chromium"
+        )
+
     def hook_playwright_context(self, ctx: Union[async_api.Playwright, sync_api.Playwright]) -> None:
         """
         Given a Playwright context object, hooks all the browser type object methods that return a Browser object.
         Can be used with sync and async methods contexts
         """
         for browser_type in (ctx.chromium, ctx.firefox, ctx.webkit):
-            for name, method in inspect.getmembers(browser_type, predicate=inspect.ismethod):
-                if method.__annotations__.get('return') in ("Browser", "BrowserContext"):
-                    chromium_mode = browser_type.name == "chromium"
-                    method = self._generate_hooked_method_that_returns_browser(method, chromium_mode)
+            chromium_mode = browser_type.name == "chromium"
+            for name in hookable_method_names(type(browser_type)):
+                method = getattr(browser_type, name)
+                if inspect.ismethod(method):  # not hooked yet
+                    method = self._generate_hooked_method_that_returns_browser(method, chromium_mode, browser_type.name)
                     setattr(browser_type, name, method)
 
-    def _generate_hooked_method_that_returns_browser(self, method: Callable, chromium_mode: bool):
-        async def async_hooked_method(*args, **kwargs) -> Union[async_api.Browser, async_api.BrowserContext]:
-            browser_or_context = await method(*args, **self._kwargs_with_patched_cli_arg(method, kwargs, chromium_mode))
-            if isinstance(browser_or_context, async_api.BrowserContext):
-                context: async_api.BrowserContext = browser_or_context
-                context.new_page = self._generate_hooked_new_page(context.new_page)
-            elif isinstance(browser_or_context, async_api.Browser):
-                browser: async_api.Browser = browser_or_context
-                browser.new_page = self._generate_hooked_new_page(browser.new_page)
-                browser.new_context = self._generate_hooked_new_context(browser.new_context)
-            else:
-                raise TypeError(f"unexpected type from function (bug): {method.__name__} returned {browser_or_context}")
-
-            return browser_or_context
-
-        def sync_hooked_method(*args, **kwargs) -> Union[sync_api.Browser, sync_api.BrowserContext]:
-            browser_or_context = method(*args, **self._kwargs_with_patched_cli_arg(method, kwargs, chromium_mode))
-            if isinstance(browser_or_context, sync_api.BrowserContext):
-                context: sync_api.BrowserContext = browser_or_context
-                context.new_page = self._generate_hooked_new_page(context.new_page)
-            elif isinstance(browser_or_context, sync_api.Browser):
-                browser: sync_api.Browser = browser_or_context
-                browser.new_page = self._generate_hooked_new_page(browser.new_page)
-                browser.new_context = self._generate_hooked_new_context(browser.new_context)
-            else:
-                raise TypeError(f"unexpected type from function (bug): {method.__name__} returned {browser_or_context}")
-
-            return browser_or_context
+    def _generate_hooked_method_that_returns_browser(
+            self, method: Callable, chromium_mode: bool, engine: Optional[str] = None
+    ) -> Callable:
+        if is_coroutine_function(method):
+            return AsyncLaunchHook(self, method, engine, chromium_mode)
+        return SyncLaunchHook(self, method, engine, chromium_mode)
 
-        if inspect.iscoroutinefunction(method):
-            return async_hooked_method
-        return sync_hooked_method
+    def _generate_hooked_new_context(self, new_context_method: Callable, engine: Optional[str] = None) -> Callable:
+        if is_coroutine_function(new_context_method):
+            return AsyncNewContextHook(self, new_context_method, engine)
+        return SyncNewContextHook(self, new_context_method, engine)
 
-    def _generate_hooked_new_context(self, new_context_method: Callable) -> Callable:
-        async def hooked_new_context_async(*args, **kwargs):
-            context = await new_context_method(*args, **kwargs)
-            context.new_page = self._generate_hooked_new_page(context.new_page)
-            return context
+    def _generate_hooked_new_page(self, new_page_method: Callable, engine: Optional[str] = None) -> Callable:
+        """Returns a hooked method (async or sync) for new_page"""
+        if is_coroutine_function(new_page_method):
+            return AsyncNewPageHook(self, new_page_method, engine)
+        return SyncNewPageHook(self, new_page_method, engine)
 
-        def hooked_browser_method_sync(*args, **kwargs):
-            context = new_context_method(*args, **kwargs)
-            context.new_page = self._generate_hooked_new_page(context.new_page)
-            return context
-
-        if inspect.iscoroutinefunction(new_context_method):
-            return hooked_new_context_async
-        return hooked_browser_method_sync
-
-    def _generate_hooked_new_page(self, new_page_method: Callable) -> Callable:
+    @staticmethod
+    def _patch_cli_args(existing_args: Optional[Sequence[str]], flags: Sequence[str]) -> List[str]:
         """
-        Returns a hooked method (async or sync) for new_page or new_context.
-        *args and **kwargs even though these methods may not take any number of arguments,
-        we want to preserve accurate stack traces when caller passes args improperly
+        Patches CLI args list with all given flags in a single pass, while preserving other args.
+        Feature list switches (e.g. --disable-blink-features) are merged with the user's value,
+        any other switch the user passed in themselves is overridden with a warning.
         """
-
-        async def hooked_browser_method_async(*args, **kwargs):
-            page_or_context = await new_page_method(*args, **kwargs)
-            await self.apply_stealth_async(page_or_context)
-            return page_or_context
-
-        def hooked_browser_method_sync(*args, **kwargs):
-            page_or_context = new_page_method(*args, **kwargs)
-            self.apply_stealth_sync(page_or_context)
-            return page_or_context
-
-        if inspect.iscoroutinefunction(new_page_method):
-            return hooked_browser_method_async
-        return hooked_browser_method_sync
-
-    @staticmethod
-    def _patch_blink_features_cli_args(existing_args: Optional[List[str]]) -> List[str]:
-        """Patches CLI args list to disable AutomationControlled blink feature, while preserving other args"""
+        pending = {flag.split("=", 1)[0]: flag for flag in flags}
         new_args = []
-        disable_blink_features_prefix = "--disable-blink-features="
-        automation_controlled_feature_name = "AutomationControlled"
         for arg in existing_args or []:
             stripped_arg = arg.strip()
-            if stripped_arg.startswith(disable_blink_features_prefix):
-                if automation_controlled_feature_name not in stripped_arg:
-                    stripped_arg += f",{automation_controlled_feature_name}"
-                new_args.append(stripped_arg)
-            else:
+            switch_name, _, existing_value = stripped_arg.partition("=")
+            flag = pending.pop(switch_name, None)
+            if flag is None:
                 new_args.append(arg)
-        else:  # no break
-            # the user has specified no extra blink features disabled,
-            # so no need to be careful how we modify the command line
-            new_args.append(f"{disable_blink_features_prefix}{automation_controlled_feature_name}")
-        return new_args
-
-    @staticmethod
-    def _patch_cli_arg(existing_args: List[str], flag: str) -> List[str]:
-        """Patches CLI args list with any arg, warns if the user passed their own value in themselves"""
-        new_args = []
-        switch_name = re.search("(.*)=?", flag).group(1)
-        for arg in existing_args:
-            stripped_arg = arg.strip()
-            if stripped_arg.startswith(switch_name):
+            elif switch_name in _FEATURE_LIST_SWITCHES:
+                values = [value for value in existing_value.split(",") if value]
+                values += [value for value in flag.partition("=")[2].split(",") if value not in values]
+                new_args.append(f"{switch_name}={','.join(values)}")
+            else:
                 warnings.warn("playwright-stealth is trying to modify a flag you have set yourself already."
                               f"Either disable the mitigation or don't specify this flag manually {flag=}"
                               f"to avoid this warning. playwright-stealth has overridden your flag")
                 new_args.append(flag)
-                break
-            else:
-                new_args.append(arg)
-        else:  # no break
-            # none of the existing switches overlap with the one we're trying to set
-            new_args.append(flag)
+        # none of the existing switches overlap with these
+        new_args.extend(pending.values())
         return new_args
 
 
@@ -374,3 +930,11 @@ ALL_EVASIONS_DISABLED_KWARGS = {
     "navigator_vendor": False,
     "hairline": False,
 }
+
+
+def write_default_bundles(path: str) -> None:
+    """
+    Pre-builds the bundles of the default evasion set (every catalog profile uses it) for every engine variant.
+    The package build does the same without importing Playwright, see setup.py.
+    """
+    write_prebuilt_bundles(path, default_bundle_inputs())
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Timing hooks for the hooked Playwright lifecycle. Pass a tracer to Stealth(tracer=...) to receive a span for
+every step:
+
+ - "launch": a hooked launch / connect / launch_persistent_context call, including CLI arg patching
+ - "patch_cli_args": CLI arg patching alone
+ - "new_context": a hooked new_context call, including the injection with injection_strategy="context"
+ - "new_page": a hooked new_page call, including the injection with injection_strategy="page"
+ - "inject": registering the payload with add_init_script
+
+Every span is tagged with the browser engine ("chromium", "firefox", "webkit" or "unknown") and the enabled
+evasions. The default tracer does nothing and costs nothing, HistogramTracer keeps histograms in memory and
+OpenTelemetryTracer / PrometheusTracer forward spans to those libraries (which aren't dependencies of this package,
+pass in objects created with them).
+"""
+import abc
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Dict, Iterator, List, Mapping, NamedTuple, Sequence, Tuple
+
+# seconds, the same defaults as prometheus_client
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+
+class Tracer(abc.ABC):
+    """Interface of the tracers, span() is entered around every traced step"""
+
+    @abc.abstractmethod
+    def span(self, name: str, attributes: Mapping[str, Any]) -> ContextManager[Any]:
+        """Context manager around one traced step, attributes carry the engine and the enabled evasions"""
+
+
+class NoopTracer(Tracer):
+    _span = nullcontext()
+
+    def span(self, name: str, attributes: Mapping[str, Any]) -> ContextManager[Any]:
+        return self._span
+
+
+NOOP_TRACER = NoopTracer()
+
+
+class HistogramSnapshot(NamedTuple):
+    count: int
+    total: float  # seconds
+    min: float
+    max: float
+    # (upper bound in seconds, cumulative count), the last bound is infinity
+    buckets: Tuple[Tuple[float, int], ...]
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self, bucket_count: int):
+        self.counts = [0] * bucket_count
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+
+class HistogramTracer(Tracer):
+    """
+    Keeps a histogram of span durations per span name and engine in memory, thread safe.
+
+    tracer = HistogramTracer()
+    async with Stealth(tracer=tracer).use_async(async_playwright()) as p:
+        ...
+    print(tracer.snapshot()[("inject", "chromium")].mean)
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets: List[float] = sorted(buckets) + [float("inf")]
+        self._histograms: Dict[Tuple[str, str], _Histogram] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, attributes: Mapping[str, Any]) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, attributes.get("engine", "unknown"), time.perf_counter() - started)
+
+    def observe(self, name: str, engine: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get((name, engine))
+            if histogram is None:
+                histogram = self._histograms[(name, engine)] = _Histogram(len(self.buckets))
+            histogram.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram.count += 1
+            histogram.total += seconds
+            histogram.min = min(histogram.min, seconds)
+            histogram.max = max(histogram.max, seconds)
+
+    def snapshot(self) -> Dict[Tuple[str, str], HistogramSnapshot]:
+        """Returns: histograms by (span name, engine)"""
+        with self._lock:
+            result = {}
+            for key, histogram in self._histograms.items():
+                cumulative, buckets = 0, []
+                for bound, count in zip(self.buckets, histogram.counts):
+                    cumulative += count
+                    buckets.append((bound, cumulative))
+                result[key] = HistogramSnapshot(
+                    histogram.count, histogram.total, histogram.min, histogram.max, tuple(buckets)
+                )
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+class OpenTelemetryTracer(Tracer):
+    """
+    Forwards spans to an OpenTelemetry tracer, e.g. OpenTelemetryTracer(opentelemetry.trace.get_tracer(__name__)).
+    Spans are named "playwright_stealth.<name>".
+    """
+
+    def __init__(self, tracer: Any):
+        self.tracer = tracer
+
+    def span(self, name: str, attributes: Mapping[str, Any]) -> ContextManager[Any]:
+        return self.tracer.start_as_current_span(
+            f"playwright_stealth.{name}",
+            attributes={
+                "browser.engine": attributes.get("engine", "unknown"),
+                "playwright_stealth.evasions": list(attributes.get("evasions", ())),
+            },
+        )
+
+
+class PrometheusTracer(Tracer):
+    """
+    Observes span durations in a prometheus_client Histogram with "span" and "engine" labels:
+
+    PrometheusTracer(Histogram("playwright_stealth_seconds", "Stealth overhead", ["span", "engine"]))
+    """
+
+    def __init__(self, histogram: Any):
+        self.histogram = histogram
+
+    def span(self, name: str, attributes: Mapping[str, Any]) -> ContextManager[Any]:
+        return self.histogram.labels(span=name, engine=attributes.get("engine", "unknown")).time()
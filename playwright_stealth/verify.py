@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+"""
+Offline verification matrix: checks that every enabled evasion actually took effect, in real browsers, for a set of
+configurations, against fixture pages served from localhost (no network access needed).
+
+    python -m playwright_stealth.verify --engines chromium firefox
+
+One browser is launched per engine and every (configuration, engine) pair runs in its own context, concurrently.
+The checks run in the top frame and in a same-origin subframe. Passing results are cached by a hash of the compiled
+payload, the browser version and the checks themselves, so a configuration that didn't change is not verified again.
+Failures are never cached. The exit status is 1 if any check failed, which makes it usable as a pre-deploy gate.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Mapping, NamedTuple, Optional, Sequence
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from playwright_stealth.profiles import DEFAULT_CATALOG
+from playwright_stealth.stealth import CompiledPayload, Stealth, _OPTIONS_KEY, _engine_variant
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "playwright-stealth", "verify.json")
+# entries kept in the cache file, the least recently verified are dropped first
+_CACHE_MAXSIZE = 1024
+
+# evasion name -> JS function of the payload's `opts`, returning nothing if the evasion took effect or what was seen
+CHECKS: Dict[str, str] = {
+    "chrome_app": """() => {
+        if (typeof chrome.app !== "object" || chrome.app.isInstalled !== false) return "chrome.app is not mocked";
+        if (typeof chrome.app.getDetails !== "function") return "chrome.app.getDetails is missing";
+    }""",
+    "chrome_csi": """() => {
+        if (typeof chrome.csi !== "function") return "chrome.csi is missing";
+        if (typeof chrome.csi().startE !== "number") return "chrome.csi() has no timings";
+    }""",
+    "chrome_hairline": """() => {
+        const modernizr = document.createElement("div");
+        modernizr.id = "modernizr";
+        const plain = document.createElement("div");
+        plain.textContent = "hairline";
+        document.body.append(modernizr, plain);
+        try {
+            if (modernizr.offsetHeight !== 1) return `#modernizr offsetHeight is ${modernizr.offsetHeight}`;
+            if (!(plain.offsetHeight > 0)) return `a div with text has offsetHeight ${plain.offsetHeight}`;
+        } finally {
+            modernizr.remove();
+            plain.remove();
+        }
+    }""",
+    "chrome_load_times": """() => {
+        if (typeof chrome.loadTimes !== "function") return "chrome.loadTimes is missing";
+        if (!("connectionInfo" in chrome.loadTimes())) return "chrome.loadTimes() has no connectionInfo";
+    }""",
+    "chrome_runtime": """opts => {
+        const expected = location.protocol.startsWith("https") || !!opts.chrome_runtime_run_on_insecure_origins;
+        if (expected !== ("runtime" in chrome)) return `chrome.runtime ${expected ? "is missing" : "is exposed"}`;
+        if (expected && typeof chrome.runtime.connect !== "function") return "chrome.runtime.connect is missing";
+    }""",
+    "iframe_content_window": """() => {
+        const iframe = document.createElement("iframe");
+        iframe.srcdoc = "<p>frame</p>";
+        document.body.appendChild(iframe);
+        try {
+            if (!iframe.contentWindow || iframe.contentWindow === window) return "srcdoc iframe has no own window";
+            if (iframe.contentWindow.frameElement !== iframe) return "contentWindow.frameElement is not the iframe";
+            if (iframe.contentWindow.self === window.top) return "contentWindow.self is the top window";
+        } finally {
+            iframe.remove();
+        }
+    }""",
+    "media_codecs": """() => {
+        const answer = document.createElement("video").canPlayType('video/mp4; codecs="avc1.42E01E"');
+        if (answer !== "probably") return `canPlayType(h264) is ${JSON.stringify(answer)}`;
+    }""",
+    "navigator_hardware_concurrency": """opts => {
+        const seen = navigator.hardwareConcurrency;
+        if (seen !== opts.navigator_hardware_concurrency) return `navigator.hardwareConcurrency is ${seen}`;
+    }""",
+    "navigator_languages": """opts => {
+        const seen = JSON.stringify(navigator.languages);
+        if (seen !== JSON.stringify(opts.navigator_languages_override)) return `navigator.languages is ${seen}`;
+    }""",
+    "navigator_permissions": """async () => {
+        const status = await navigator.permissions.query({ name: "notifications" });
+        if (!(status instanceof PermissionStatus)) return "permissions.query() doesn't resolve to a PermissionStatus";
+        if (status.state !== Notification.permission) return `notifications permission is ${status.state}`;
+    }""",
+    "navigator_platform": """opts => {
+        if (opts.navigator_platform && navigator.platform !== opts.navigator_platform) {
+            return `navigator.platform is ${navigator.platform}`;
+        }
+    }""",
+    "navigator_plugins": """() => {
+        if (!(navigator.plugins instanceof PluginArray) || !navigator.plugins.length) return "navigator.plugins is empty";
+        if (!navigator.mimeTypes.length) return "navigator.mimeTypes is empty";
+        if (navigator.plugins[0][0].enabledPlugin !== navigator.plugins[0]) return "mime types don't link back";
+    }""",
+    "navigator_user_agent": """opts => {
+        const seen = navigator.userAgent;
+        if (opts.navigator_user_agent ? seen !== opts.navigator_user_agent : seen.includes("HeadlessChrome")) {
+            return `navigator.userAgent is ${seen}`;
+        }
+    }""",
+    "navigator_vendor": """opts => {
+        const expected = opts.navigator_vendor || "Google Inc.";
+        if (navigator.vendor !== expected) return `navigator.vendor is ${navigator.vendor}`;
+    }""",
+    "navigator_webdriver": """() => {
+        if (navigator.webdriver !== false) return `navigator.webdriver is ${navigator.webdriver}`;
+        const getter = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(navigator), "webdriver").get;
+        if (!Function.prototype.toString.call(getter).includes("[native code]")) return "the getter isn't native";
+    }""",
+    "webgl_vendor": """opts => {
+        const gl = document.createElement("canvas").getContext("webgl");
+        // no WebGL in this browser, nothing to spoof
+        if (!gl) return;
+        const vendor = gl.getParameter(37445), renderer = gl.getParameter(37446);
+        if (vendor !== (opts.webgl_vendor || "Intel Inc.")) return `UNMASKED_VENDOR_WEBGL is ${vendor}`;
+        if (renderer !== (opts.webgl_renderer || "Intel Iris OpenGL Engine")) {
+            return `UNMASKED_RENDERER_WEBGL is ${renderer}`;
+        }
+    }""",
+}
+# run for every configuration: the payload loaded without errors and removed its options
+PAYLOAD_CHECK = f"""() => {{
+    if ({_OPTIONS_KEY} in globalThis) return "the options global was not removed";
+}}"""
+
+_FIXTURES = {
+    "/": b"<html><head><title>verify</title></head><body><iframe src='/frame'></iframe></body></html>",
+    "/frame": b"<html><head><title>frame</title></head><body>frame</body></html>",
+}
+# any change to the checks or fixtures invalidates the cached results
+_CHECKS_DIGEST = hashlib.sha256(json.dumps(
+    [CHECKS, PAYLOAD_CHECK, {path: body.decode() for path, body in _FIXTURES.items()}], sort_keys=True
+).encode()).hexdigest()
+
+_OVERRIDES = {
+    "navigator_user_agent_override": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/124.0.0.0 Safari/537.36"
+    ),
+    "navigator_platform_override": "MacIntel",
+    "navigator_vendor_override": "Google Inc.",
+    "navigator_languages_override": ("fr-FR", "fr"),
+    "navigator_hardware_concurrency": 12,
+    "webgl_vendor_override": "Apple Inc.",
+    "webgl_renderer_override": "Apple M1",
+    "chrome_runtime": True,
+    "chrome_runtime_run_on_insecure_origins": True,
+}
+
+
+class CheckResult(NamedTuple):
+    configuration: str
+    engine: str
+    browser_version: str
+    # evasion name, or "payload" for the checks run for every configuration
+    check: str
+    # what was seen instead, None if the check passed
+    error: Optional[str]
+    # the result is from the cache
+    cached: bool
+
+    @property
+    def passed(self) -> bool:
+        return self.error is None
+
+
+def default_configurations() -> Dict[str, Stealth]:
+    """The defaults, every option overridden, the payload build modes and every profile of the default catalog"""
+    configurations = {
+        "default": Stealth(),
+        "overrides": Stealth(**_OVERRIDES),
+        "specialized": Stealth(specialize_payload=True, **_OVERRIDES),
+        "unminified": Stealth(minify_payload=False),
+        "instrumented": Stealth(instrumentation=True),
+        "logging": Stealth(script_logging=True),
+    }
+    for name in DEFAULT_CATALOG.names:
+        configurations[f"profile:{name}"] = Stealth.from_profile(name)
+    return configurations
+
+
+def cache_key(compiled: CompiledPayload, engine: str, browser_version: str) -> str:
+    """Key of a (configuration, engine) result: everything the outcome of the checks depends on"""
+    return hashlib.sha256(f"{compiled.digest}:{engine}:{browser_version}:{_CHECKS_DIGEST}".encode()).hexdigest()
+
+
+def checks_script(names: Sequence[str]) -> str:
+    """
+    One function evaluated per frame, running the payload check and the checks of the given evasions
+    Returns (in the page): {check name: error or null}
+    """
+    lines = ["async opts => {", "  const results = {};"]
+    for name, source in [("payload", PAYLOAD_CHECK)] + [(name, CHECKS[name]) for name in names]:
+        lines += [
+            "  try {",
+            f"    results[{json.dumps(name)}] = (await ({source})(opts)) || null;",
+            "  } catch (error) {",
+            f"    results[{json.dumps(name)}] = `threw ${{error}}`;",
+            "  }",
+        ]
+    lines += ["  return results;", "}"]
+    return "\n".join(lines)
+
+
+def _load_cache(path: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    if path is None:
+        return {}
+    try:
+        with open(path) as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        # missing or corrupt, everything gets verified again
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _store_cache(path: Optional[str], cache: Dict[str, Dict[str, Any]]) -> None:
+    if path is None:
+        return
+    entries = list(cache.items())[-_CACHE_MAXSIZE:]
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # replaced atomically, so concurrent runs never read a partially written file
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w") as cache_file:
+            json.dump(dict(entries), cache_file)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+@contextmanager
+def fixture_server() -> Iterator[str]:
+    """Serves the fixture pages on localhost, yields the URL of the top page"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = _FIXTURES.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+async def _run_checks(browser: async_api.Browser, engine: str, stealth: Stealth, url: str) -> Dict[str, Optional[str]]:
+    """Returns: {check name: error or None} for the top frame and the subframe of the fixture page"""
+    names = [name for name in stealth._variant_evasion_names(_engine_variant(engine)) if name in CHECKS]
+    script = checks_script(names)
+    context = await browser.new_context()
+    try:
+        page = await context.new_page()
+        page_errors: List[str] = []
+        page.on("pageerror", lambda error: page_errors.append(str(error)))
+        await stealth.apply_stealth_async(page, engine)
+        await page.goto(url)
+        outcome = await page.main_frame.evaluate(script, stealth._options())
+        for frame in page.main_frame.child_frames:
+            for name, error in (await frame.evaluate(script, stealth._options())).items():
+                if error is not None and outcome[name] is None:
+                    outcome[name] = f"in the subframe: {error}"
+        if page_errors and outcome["payload"] is None:
+            outcome["payload"] = f"page errors: {'; '.join(page_errors)}"
+        return outcome
+    finally:
+        await context.close()
+
+
+async def verify_async(
+        configurations: Optional[Mapping[str, Stealth]] = None,
+        engines: Sequence[str] = ("chromium", "firefox"),
+        concurrency: int = 8,
+        cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+        launch_kwargs: Optional[Dict[str, Any]] = None,
+) -> List[CheckResult]:
+    """
+    Runs the checks of every enabled evasion for every configuration on every engine, at most `concurrency`
+    contexts at a time. The browsers are launched without Stealth, so the evasions are what's being verified.
+    configurations: by name, default_configurations() if None
+    cache_path: JSON file of the passing results, None to verify everything and cache nothing
+    Returns: one CheckResult per configuration, engine and check
+    """
+    configurations = default_configurations() if configurations is None else configurations
+    cache = _load_cache(cache_path)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def verify(browser: async_api.Browser, engine: str, name: str, stealth: Stealth) -> List[CheckResult]:
+        key = cache_key(stealth.compile(engine), engine, browser.version)
+        outcome = cache.pop(key, None)
+        cached = outcome is not None
+        if not cached:
+            async with semaphore:
+                outcome = await _run_checks(browser, engine, stealth, url)
+        if all(error is None for error in outcome.values()):
+            # (re)inserted last, so it's the last to be dropped
+            cache[key] = outcome
+        return [
+            CheckResult(name, engine, browser.version, check, error, cached)
+            for check, error in outcome.items()
+        ]
+
+    with fixture_server() as url:
+        async with async_playwright() as playwright:
+            browsers = await asyncio.gather(*(playwright[engine].launch(**(launch_kwargs or {})) for engine in engines))
+            try:
+                batches = await asyncio.gather(*(
+                    verify(browser, engine, name, stealth)
+                    for engine, browser in zip(engines, browsers)
+                    for name, stealth in configurations.items()
+                ))
+            finally:
+                for browser in browsers:
+                    await browser.close()
+    _store_cache(cache_path, cache)
+    return [result for batch in batches for result in batch]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    configurations = default_configurations()
+    parser = argparse.ArgumentParser(
+        prog="python -m playwright_stealth.verify", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument("--engines", nargs="+", default=["chromium", "firefox"], choices=["chromium", "firefox"])
+    parser.add_argument("--configurations", nargs="+", choices=list(configurations), metavar="CONFIGURATION",
+                        help="all by default")
+    parser.add_argument("--concurrency", type=int, default=8, help="contexts verified at a time")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="JSON file of the passing results")
+    parser.add_argument("--no-cache", action="store_true", help="verify every configuration again")
+    arguments = parser.parse_args(argv)
+    if arguments.configurations:
+        configurations = {name: configurations[name] for name in arguments.configurations}
+
+    results = asyncio.run(verify_async(
+        configurations, arguments.engines, arguments.concurrency, None if arguments.no_cache else arguments.cache
+    ))
+    failures = [result for result in results if not result.passed]
+    for result in failures:
+        print(f"FAIL {result.configuration} {result.engine} {result.browser_version} {result.check}: {result.error}")
+    cached = sum(result.cached for result in results)
+    print(f"{len(results) - len(failures)}/{len(results)} checks passed ({cached} cached)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,34 @@
+import importlib.util
+import os
+import sys
+
 import setuptools
+from setuptools.command.build_py import build_py
+
+
+def _load_module(name):
+    """Loads playwright_stealth/<name>.py on its own, the package itself imports Playwright"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "playwright_stealth", f"{name}.py")
+    spec = importlib.util.spec_from_file_location(f"_playwright_stealth_build_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class BuildPyWithBundles(build_py):
+    """Also ships the minified bundles of the default evasion set, so they aren't minified at runtime"""
+
+    def run(self):
+        super().run()
+        if self.dry_run:
+            return
+        # bundler.py and scripts.py only use the standard library, building doesn't need Playwright
+        bundler, scripts = _load_module("bundler"), _load_module("scripts")
+        bundler.write_prebuilt_bundles(
+            os.path.join(self.build_lib, "playwright_stealth", "js", "bundles.json"), scripts.default_bundle_inputs()
+        )
+
 
 with open("README.md", "r") as fh:
     long_description = fh.read()
@@ -18,7 +48,8 @@ setuptools.setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    package_data={"playwright_stealth": ["js/*.js", "js/**/*.js"]},
+    package_data={"playwright_stealth": ["js/*.js", "js/**/*.js", "profiles.json"]},
+    cmdclass={"build_py": BuildPyWithBundles},
     python_requires=">=3.8",
     install_requires=[
         "playwright",
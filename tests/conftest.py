@@ -1,3 +1,6 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
 from playwright import async_api, sync_api
 from playwright.async_api import async_playwright
@@ -20,3 +23,25 @@ def hooked_sync_browser(request) -> sync_api.Browser:
     with Stealth(script_logging=script_logging).use_sync(sync_playwright()) as ctx:
         browser = ctx[request.param].launch()
         yield browser
+
+
+@pytest.fixture(scope="session")
+def local_server() -> str:
+    """Serves a minimal page on localhost, so tests don't depend on the network"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = f"<html><head><title>{self.path}</title></head><body>stealth</body></html>".encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
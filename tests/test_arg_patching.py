@@ -6,14 +6,14 @@ from playwright_stealth import Stealth
 
 
 @pytest.mark.parametrize("browser_type", ["chromium", "firefox"])
-async def test_cli_args_are_patched_correctly(browser_type: str):
+async def test_cli_args_are_patched_correctly(browser_type: str, local_server: str):
     config = Stealth(script_logging=True, navigator_languages_override=("fr-CA", "fr"))
     async with config.use_async(async_playwright()) as ctx:
         browser = await ctx[browser_type].launch()
         page = await browser.new_page()
         console_messages = await collect_log_messages(page)
 
-        await page.goto("http://example.org")
+        await page.goto(local_server)
         webdriver_js_was_patched = not any(map(lambda x: "not patching navigator.webdriver" in x, console_messages))
         languages_js_was_patched = not any(map(lambda x: "not patching navigator.languages" in x, console_messages))
         # iff browser is chromium, we should patch the CLI args
@@ -44,3 +44,30 @@ async def collect_log_messages(page):
 
     page.on("console", collect_log_message)
     return console_messages
+
+
+def test_cli_args_patched_in_single_pass():
+    existing_args = ["--mute-audio", " --disable-blink-features=Foo", "--accept-lang=de", "--no-sandbox"]
+    flags = ["--disable-blink-features=AutomationControlled", "--accept-lang=fr-CA,fr"]
+    with pytest.warns(UserWarning):
+        new_args = Stealth._patch_cli_args(existing_args, flags)
+    assert new_args == [
+        "--mute-audio",
+        "--disable-blink-features=Foo,AutomationControlled",
+        "--accept-lang=fr-CA,fr",
+        "--no-sandbox",
+    ]
+    assert Stealth._patch_cli_args(None, flags) == flags
+
+
+def test_launch_kwargs_are_copied_shallowly():
+    proxy = {"server": "http://localhost:3128"}
+    kwargs = {"proxy": proxy, "args": ["--mute-audio"]}
+    new_kwargs = Stealth()._kwargs_with_patched_cli_arg(async_api.BrowserType.launch, kwargs, chromium_mode=True)
+    assert new_kwargs["proxy"] is proxy
+    assert kwargs["args"] == ["--mute-audio"]
+    assert new_kwargs["args"] == [
+        "--mute-audio",
+        "--disable-blink-features=AutomationControlled",
+        "--accept-lang=en-US,en",
+    ]
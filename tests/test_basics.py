@@ -1,42 +1,47 @@
 import asyncio
+import gc
+import inspect
 import logging
+import sys
+import weakref
 
 import pytest
 from playwright import sync_api
 from playwright.async_api import async_playwright
 from playwright.sync_api import sync_playwright, Browser
 
+from playwright_stealth.hooks import hookable_method_names
 from playwright_stealth.stealth import Stealth, ALL_EVASIONS_DISABLED_KWARGS
 
 
 @pytest.mark.parametrize("browser_type", ["chromium", "firefox"])
-async def test_async_smoketest(browser_type: str):
+async def test_async_smoketest(browser_type: str, local_server: str):
     # we test this because exceptions won't propagate with page.add_init_scripts, but will with page.evaluate
     async with async_playwright() as p:
         browser = await getattr(p, browser_type).launch()
         page = await browser.new_page()
-        await page.goto("http://example.org")
+        await page.goto(local_server)
         await page.evaluate(Stealth().script_payload)
 
 
 @pytest.mark.parametrize("browser_type", ["chromium", "firefox"])
-def test_sync_smoketest(browser_type: str):
+def test_sync_smoketest(browser_type: str, local_server: str):
     with sync_playwright() as p:
         browser = getattr(p, browser_type).launch()
         page = browser.new_page()
-        page.goto("http://example.org")
+        page.goto(local_server)
         page.evaluate(Stealth().script_payload)
 
 
-async def test_async_navigator_webdriver_smoketest(hooked_async_browser):
+async def test_async_navigator_webdriver_smoketest(hooked_async_browser, local_server: str):
     for page in [await hooked_async_browser.new_page(), await (await hooked_async_browser.new_context()).new_page()]:
-        await page.goto("http://example.org")
+        await page.goto(local_server)
         assert await page.evaluate("navigator.webdriver") is False
 
 
-def test_sync_navigator_webdriver_smoketest(hooked_sync_browser):
+def test_sync_navigator_webdriver_smoketest(hooked_sync_browser, local_server: str):
     for page in [hooked_sync_browser.new_page(), hooked_sync_browser.new_context().new_page()]:
-        page.goto("http://example.org")
+        page.goto(local_server)
         assert page.evaluate("navigator.webdriver") is False
 
 
@@ -56,3 +61,424 @@ def test_empty_payload_not_injected():
     assert not init_script_added
 
 
+def test_context_injection_strategy_registers_once():
+    class MockPage:
+        def __init__(self, context):
+            self.context = context
+
+    class MockContext:
+        def __init__(self):
+            self.init_scripts = []
+
+        def add_init_script(self, script):
+            self.init_scripts.append(script)
+
+        def new_page(self):
+            return MockPage(self)
+
+    stealth = Stealth(injection_strategy="context")
+    # noinspection PyTypeChecker
+    context = stealth._generate_hooked_new_context(MockContext)()
+    context.new_page()
+    context.new_page()
+    assert context.init_scripts == [stealth.compile().options_script, stealth.compile().bundle]
+
+
+def test_context_registration_is_retried_after_a_failure():
+    class MockContext:
+        def __init__(self):
+            self.init_scripts = []
+            self.failures = 1
+
+        def add_init_script(self, script):
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("transient driver error")
+            self.init_scripts.append(script)
+
+    stealth = Stealth(injection_strategy="context")
+    context = MockContext()
+    # noinspection PyTypeChecker
+    with pytest.raises(RuntimeError):
+        stealth._apply_stealth_to_context_once_sync(context)
+    # the next new_page registers it instead of skipping it
+    assert context not in stealth._stealthed_contexts
+    # noinspection PyTypeChecker
+    stealth._apply_stealth_to_context_once_sync(context)
+    assert context in stealth._stealthed_contexts
+    assert context.init_scripts == [stealth.compile().options_script, stealth.compile().bundle]
+
+
+async def test_async_context_injection_strategy_covers_popups(local_server: str):
+    stealth = Stealth(injection_strategy="context", navigator_platform_override="stealth-platform")
+    async with stealth.use_async(async_playwright()) as ctx:
+        browser = await ctx.chromium.launch()
+        page = await (await browser.new_context()).new_page()
+        await page.goto(local_server)
+        async with page.expect_popup() as popup_info:
+            await page.evaluate(f"window.open('{local_server}')")
+        popup = await popup_info.value
+        await popup.wait_for_load_state()
+        assert await page.evaluate("navigator.platform") == "stealth-platform"
+        assert await popup.evaluate("navigator.platform") == "stealth-platform"
+
+
+@pytest.mark.parametrize("browser_type", ["chromium", "firefox"])
+async def test_to_string_of_patched_and_page_functions(browser_type: str, local_server: str):
+    async with async_playwright() as p:
+        browser = await p[browser_type].launch()
+        context = await browser.new_context()
+        await Stealth().apply_stealth_async(context)
+        page = await context.new_page()
+        await page.goto(local_server)
+        native = await page.evaluate("Element.prototype.getAttribute.toString()")
+        assert await page.evaluate("""() => [
+            HTMLMediaElement.prototype.canPlayType.toString(),
+            Function.prototype.toString.call(HTMLMediaElement.prototype.canPlayType),
+            Function.prototype.toString.toString(),
+            (function pageFunction(a) { return a; }).toString(),
+        ]""") == [
+            native.replace("getAttribute", "canPlayType"),
+            native.replace("getAttribute", "canPlayType"),
+            native.replace("getAttribute", "toString"),
+            "function pageFunction(a) { return a; }",
+        ]
+        await browser.close()
+
+
+async def test_proxied_apis_fast_paths_keep_behavior(local_server: str):
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+        context = await browser.new_context()
+        await Stealth().apply_stealth_async(context)
+        page = await context.new_page()
+        await page.goto(local_server)
+        assert await page.evaluate("""() => {
+            const video = document.createElement("video");
+            const iframe = document.createElement("IFRAME");
+            iframe.srcdoc = "<p>frame</p>";
+            document.body.appendChild(iframe);
+            return [
+                video.canPlayType('video/mp4; codecs="avc1.42E01E"'),
+                video.canPlayType('video/mp4; codecs="avc1.42E01E"'),
+                video.canPlayType("audio/x-m4a"),
+                video.canPlayType("video/nonexistent"),
+                video.canPlayType(undefined),
+                iframe.contentWindow.frameElement === iframe,
+                document.createElement("div").tagName,
+            ];
+        }""") == ["probably", "probably", "maybe", "", "", True, "DIV"]
+        await browser.close()
+
+
+async def test_instrumentation_metrics(local_server: str):
+    stealth = Stealth(instrumentation=True)
+    async with stealth.use_async(async_playwright()) as p:
+        browser = await p.chromium.launch()
+        page = await browser.new_page()
+        await page.goto(local_server)
+        await page.evaluate("document.createElement('video').canPlayType('video/mp4')")
+        metrics = await stealth.collect_metrics_async(page)
+        assert set(metrics["evasions"]) == set(stealth._evasion_names)
+        assert metrics["traps"]["media_codecs:canPlayType"]["apply"]["calls"] == 1
+        assert await page.evaluate("Object.keys(window).some(key => key.includes('metrics'))") is False
+        await browser.close()
+
+
+async def test_apply_to_browser_registers_contexts_and_evaluates_pages_concurrently():
+    in_flight = max_in_flight = 0
+
+    async def round_trip(*args):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    class MockFrame:
+        evaluate = staticmethod(round_trip)
+
+    class MockPage:
+        def __init__(self):
+            self.frames = [MockFrame(), MockFrame()]
+
+    class MockContext:
+        add_init_script = staticmethod(round_trip)
+
+        def __init__(self):
+            self.pages = [MockPage() for _ in range(5)]
+
+    class MockBrowser:
+        browser_type = type("BrowserType", (), {"name": "chromium"})
+        contexts = [MockContext() for _ in range(10)]
+
+    stealth = Stealth()
+    # noinspection PyTypeChecker
+    results = await stealth.apply_to_browser_async(MockBrowser(), max_concurrency=4, evaluate_existing=True)
+    assert [result.action for result in results] == ["registered"] * 10 + ["evaluated"] * 100
+    assert all(result.error is None for result in results)
+    assert max_in_flight == 4
+    # already stealthed contexts are neither registered nor evaluated again
+    # noinspection PyTypeChecker
+    results = await stealth.apply_to_browser_async(MockBrowser(), evaluate_existing=True)
+    assert [result.action for result in results] == ["skipped"] * 10
+
+
+async def test_apply_to_browser_reports_failures_and_skips_pages_stealthed_on_their_own():
+    evaluated = []
+
+    class MockFrame:
+        async def evaluate(self, script):
+            evaluated.append(self)
+
+    class MockPage:
+        def __init__(self):
+            self.frames = [MockFrame()]
+
+        async def add_init_script(self, script):
+            pass
+
+    class MockContext:
+        def __init__(self, fails=False):
+            self.fails = fails
+            self.pages = [MockPage(), MockPage()]
+
+        async def add_init_script(self, script):
+            if self.fails:
+                raise RuntimeError("context closed")
+
+    stealthed, failing = MockContext(), MockContext(fails=True)
+
+    class MockBrowser:
+        browser_type = type("BrowserType", (), {"name": "chromium"})
+        contexts = [stealthed, failing]
+
+    stealth = Stealth()
+    # noinspection PyTypeChecker
+    await stealth.apply_stealth_async(stealthed.pages[0])
+    # noinspection PyTypeChecker
+    results = await stealth.apply_to_browser_async(MockBrowser(), evaluate_existing=True)
+    assert [(result.action, result.error is None) for result in results] == [
+        ("registered", True), ("failed", False), ("evaluated", True),
+    ]
+    assert evaluated == stealthed.pages[1].frames
+
+
+def test_hooks_are_slotted_and_do_not_keep_their_target_alive():
+    class MockPage:
+        context = None
+
+    class MockContext:
+        def new_page(self) -> MockPage:
+            return MockPage()
+
+    context = MockContext()
+    context.new_page = Stealth()._generate_hooked_new_page(context.new_page)
+    assert not hasattr(context.new_page, "__dict__")
+    hook, target = context.new_page, weakref.ref(context)
+    del context
+    gc.collect()
+    assert target() is None
+    with pytest.raises(ReferenceError):
+        hook()
+
+
+def test_async_hooks_pass_as_coroutine_functions():
+    class MockContext:
+        async def new_page(self):
+            pass
+
+        def sync_new_page(self):
+            pass
+
+    context = MockContext()
+    stealth = Stealth()
+    context.new_page = stealth._generate_hooked_new_page(context.new_page)
+    context.sync_new_page = stealth._generate_hooked_new_page(context.sync_new_page)
+    assert asyncio.iscoroutinefunction(context.new_page)
+    assert not asyncio.iscoroutinefunction(context.sync_new_page)
+    # hooking a hooked method again keeps it async
+    assert asyncio.iscoroutinefunction(stealth._generate_hooked_new_page(context.new_page))
+    if sys.version_info >= (3, 12):
+        assert inspect.iscoroutinefunction(context.new_page)
+        assert not inspect.iscoroutinefunction(context.sync_new_page)
+
+
+def test_hookable_method_names_are_cached_per_class():
+    assert hookable_method_names(sync_api.BrowserType) == (
+        "connect", "connect_over_cdp", "launch", "launch_persistent_context"
+    )
+    assert hookable_method_names(sync_api.BrowserType) is hookable_method_names(sync_api.BrowserType)
+
+
+async def test_frame_policy_skips_cross_origin_frames(local_server: str):
+    cross_origin = local_server.replace("127.0.0.1", "localhost")
+    stealth = Stealth(frame_policy="same-origin", navigator_platform_override="stealth-platform")
+    async with stealth.use_async(async_playwright()) as p:
+        browser = await p.chromium.launch()
+        page = await browser.new_page()
+        await page.goto(local_server)
+        await page.evaluate("""urls => Promise.all(urls.map(url => new Promise(resolve => {
+            const iframe = document.createElement("iframe");
+            iframe.onload = resolve;
+            if (url === "about:srcdoc") {
+                iframe.srcdoc = "<p>srcdoc</p>";
+            } else {
+                iframe.src = url;
+            }
+            document.body.appendChild(iframe);
+        })))""", [f"{local_server}/same", f"{cross_origin}/cross", "about:srcdoc"])
+        platforms = {frame.url: await frame.evaluate("navigator.platform") for frame in page.frames}
+        stealthed = {url: platform == "stealth-platform" for url, platform in platforms.items()}
+        # srcdoc frames inherit the origin of their parent, although their location.origin is "null"
+        assert stealthed == {
+            local_server + "/": True, f"{local_server}/same": True, f"{cross_origin}/cross": False, "about:srcdoc": True,
+        }
+        await browser.close()
+
+
+async def test_lazy_chrome_mocks_look_eagerly_built(local_server: str):
+    async with Stealth(chrome_runtime=True, chrome_runtime_run_on_insecure_origins=True).use_async(
+        async_playwright()
+    ) as p:
+        browser = await p.chromium.launch()
+        page = await browser.new_page()
+        await page.goto(local_server)
+        assert await page.evaluate("""() => [
+            Object.getOwnPropertyDescriptor(window.chrome, "runtime").writable,
+            Object.keys(chrome.runtime).includes("sendMessage"),
+            chrome.runtime.sendMessage.toString(),
+            chrome.app.isInstalled,
+            chrome.app.getDetails.toString(),
+        ]""") == [
+            True,
+            True,
+            "function sendMessage() { [native code] }",
+            False,
+            "function getDetails() { [native code] }",
+        ]
+        await browser.close()
+
+
+async def test_new_context_accepts_a_per_context_stealth():
+    class MockContext:
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+            self.init_scripts = []
+
+        async def add_init_script(self, script):
+            self.init_scripts.append(script)
+
+        async def new_page(self):
+            pass
+
+    class MockBrowser:
+        async def new_context(self, **kwargs) -> MockContext:
+            return MockContext(**kwargs)
+
+    # profiles spoof the number of cores, with the same evasion set every context shares one bundle
+    stealth = Stealth(injection_strategy="context", navigator_hardware_concurrency=True)
+    browser = MockBrowser()
+    browser.new_context = stealth._generate_hooked_new_context(browser.new_context)
+    default = await browser.new_context()
+    french = await browser.new_context(stealth="windows-chrome-nvidia-rtx4070-fr", viewport=None)
+    custom_stealth = Stealth(
+        navigator_platform_override="custom-platform", injection_strategy="context", navigator_hardware_concurrency=True
+    )
+    custom = await browser.new_context(stealth=custom_stealth)
+    assert default.kwargs == {} and default.init_scripts[0] == stealth.compile().options_script
+    assert french.kwargs == {
+        "viewport": None,
+        "extra_http_headers": {"Accept-Language": "fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7"},
+        "locale": "fr-FR",
+    }
+    assert '"navigator_languages_override": ["fr-FR", "fr", "en-US", "en"]' in french.init_scripts[0]
+    # same languages as the browser's --accept-lang: nothing to reconcile
+    assert custom.kwargs == {}
+    assert '"navigator_platform": "custom-platform"' in custom.init_scripts[0]
+    assert default.init_scripts[1] is french.init_scripts[1] is custom.init_scripts[1]
+    assert french.new_page.stealth is stealth._profile_tenants["windows-chrome-nvidia-rtx4070-fr"]
+    with pytest.raises(TypeError):
+        await browser.new_context(stealth=object())
+
+    # the launching instance doesn't register its own payload on top of a tenant's
+    browser.browser_type = type("BrowserType", (), {"name": "chromium"})
+    browser.contexts = [default, french, custom]
+    # noinspection PyTypeChecker
+    results = await stealth.apply_to_browser_async(browser)
+    assert [result.action for result in results] == ["skipped"] * 3
+    assert len(french.init_scripts) == len(custom.init_scripts) == 2
+
+
+async def test_native_first_moves_user_agent_and_languages_to_context_options():
+    cdp_calls = []
+
+    class MockSession:
+        async def send(self, method):
+            cdp_calls.append(method)
+            return {"userAgent": "Mozilla/5.0 (X11; Linux x86_64) HeadlessChrome/124.0.0.0 Safari/537.36"}
+
+        async def detach(self):
+            pass
+
+    class MockContext:
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+            self.init_scripts = []
+
+        async def add_init_script(self, script):
+            self.init_scripts.append(script)
+
+        async def new_page(self):
+            pass
+
+    class MockBrowser:
+        browser_type = type("BrowserType", (), {"name": "chromium"})
+
+        async def new_context(self, **kwargs) -> MockContext:
+            return MockContext(**kwargs)
+
+        async def new_browser_cdp_session(self) -> MockSession:
+            return MockSession()
+
+    stealth = Stealth(native_first=True, injection_strategy="context", navigator_languages_override=("de-DE",))
+    browser = MockBrowser()
+    browser.new_context = stealth._generate_hooked_new_context(browser.new_context)
+    first, second = await browser.new_context(), await browser.new_context()
+    assert first.kwargs == second.kwargs == {
+        "user_agent": "Mozilla/5.0 (X11; Linux x86_64) Chrome/124.0.0.0 Safari/537.36",
+        "extra_http_headers": {"Accept-Language": "de-DE"},
+        "locale": "de-DE",
+    }
+    assert cdp_calls == ["Browser.getVersion"]
+    assert "current_ua" not in first.init_scripts[1] and "navigator.languages" not in first.init_scripts[1]
+    assert "current_ua" in stealth.compile().bundle
+
+    # more than one language: the locale alone can't produce navigator.languages, the evasion stays
+    stealth = Stealth(native_first=True, injection_strategy="context", navigator_user_agent_override="custom")
+    browser = MockBrowser()
+    browser.new_context = stealth._generate_hooked_new_context(browser.new_context)
+    context = await browser.new_context(locale="en-GB")
+    assert context.kwargs == {
+        "user_agent": "custom", "locale": "en-GB", "extra_http_headers": {"Accept-Language": "en-US,en;q=0.9"}
+    }
+    assert "current_ua" not in context.init_scripts[1] and "navigator.languages" in context.init_scripts[1]
+
+    # reconfiguring the instance reaches the copies derived from it
+    stealth.navigator_platform_override = "reconfigured"
+    assert stealth._native_tenants == {}
+    assert '"navigator_platform": "reconfigured"' in (await browser.new_context()).init_scripts[0]
+    stealth._context_tenant({"stealth": "macos-chrome-apple-m1"})
+    stealth.injection_strategy = "page"
+    assert stealth._profile_tenants == {}
+    assert stealth._context_tenant({"stealth": "macos-chrome-apple-m1"})[0].injection_strategy == "page"
+
+
+def test_profile_tenants_keep_the_launchers_options():
+    stealth = Stealth(frame_policy="top", minify_payload=False, chrome_csi=False, instrumentation=True)
+    tenant, kwargs = stealth._context_tenant({"stealth": "macos-chrome-apple-m1", "viewport": None})
+    assert kwargs == {"viewport": None}
+    assert tenant.navigator_platform_override == "MacIntel"
+    assert (tenant.frame_policy, tenant.minify_payload, tenant.chrome_csi, tenant.instrumentation) == \
+        ("top", False, False, True)
+    assert tenant.tracer is stealth.tracer
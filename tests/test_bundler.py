@@ -0,0 +1,107 @@
+import pytest
+from playwright.async_api import async_playwright
+
+from playwright_stealth import Stealth, ALL_EVASIONS_DISABLED_KWARGS
+from playwright_stealth import bundler, stealth as stealth_module
+from playwright_stealth.bundler import emit, fold_constant_branches, inline_options, minify, strip_logging, tokenize
+from playwright_stealth.scripts import DEFAULT_EVASIONS
+from playwright_stealth.stealth import SCRIPTS, write_default_bundles
+
+FINGERPRINT_JS = """() => ({
+    webdriver: navigator.webdriver,
+    languages: navigator.languages,
+    platform: navigator.platform,
+    vendor: navigator.vendor,
+    userAgent: navigator.userAgent,
+    plugins: Array.from(navigator.plugins, (plugin) => plugin.name),
+    mimeTypes: Array.from(navigator.mimeTypes, (mimeType) => mimeType.type),
+    chrome: Object.keys(window.chrome || {}),
+    canPlayType: document.createElement("video").canPlayType('video/mp4; codecs="avc1.42E01E"'),
+    canPlayTypeToString: HTMLMediaElement.prototype.canPlayType.toString(),
+    toStringToString: Function.prototype.toString.toString(),
+})"""
+
+
+@pytest.mark.parametrize("name", sorted(SCRIPTS))
+def test_minify_preserves_tokens(name: str):
+    source = SCRIPTS[name]
+    minified = minify(source)
+    assert len(minified) < len(source)
+    assert [token.text for token in tokenize(minified)] == [token.text for token in tokenize(source)]
+
+
+def test_unused_utils_are_tree_shaken():
+    payload = Stealth(**{**ALL_EVASIONS_DISABLED_KWARGS, "navigator_webdriver": True}).script_payload
+    assert "utils.replaceProperty" in payload
+    for unused_helper in ("stringifyFns", "materializeFns", "execRecursively", "generateMagicArray", "lazyObject"):
+        assert unused_helper not in payload
+
+
+@pytest.mark.parametrize("browser_type", ["chromium", "firefox"])
+async def test_minified_and_unminified_bundles_behave_the_same(browser_type: str, local_server: str):
+    async with async_playwright() as p:
+        browser = await p[browser_type].launch()
+        fingerprints = []
+        for options in ({"minify_payload": True}, {"minify_payload": False}, {"specialize_payload": True}):
+            page = await browser.new_page()
+            await Stealth(**options).apply_stealth_async(page)
+            await page.goto(local_server)
+            fingerprints.append(await page.evaluate(FINGERPRINT_JS))
+        assert fingerprints[0] == fingerprints[1] == fingerprints[2]
+
+
+def test_logging_calls_are_stripped():
+    source = (
+        'log("a", expensive());\nif (c) warn(1);\nconst f = () => log(2);\nconsole.log(3);\n'
+        "const o = { log(a) { return a; } };"
+    )
+    assert emit(strip_logging(tokenize(source))) == (
+        "if(c)void 0;const f=()=>void 0;console.log(3);const o={log(a){return a;}};"
+    )
+    # only the line break ends the statement before the call
+    assert emit(strip_logging(tokenize('const x = foo()\nlog("a")\nbar()'))) == "const x=foo()\nvoid 0\nbar()"
+
+
+def test_options_are_inlined_and_constant_branches_folded():
+    source = "if (opts.a) { x(); } else { y(); }\nif (!opts.b) { z(opts.c); }\nopts.c = 1;\nw(opts.d);"
+    tokens = inline_options(tokenize(source), {"a": None, "b": "", "c": 3, "d": ["list"]})
+    assert emit(fold_constant_branches(tokens)) == "{y();}\n{z(3);}\nopts.c=1;w(opts.d);"
+    for literal, kept in (("0x0", "y"), ("0b1", "x"), ("0o0", "y"), ("0n", "y"), ("1_000", "x"), (".5e1", "x")):
+        assert emit(fold_constant_branches(tokenize(f"if ({literal}) {{ x() }} else {{ y() }}"))) == f"{{{kept}()}}"
+
+
+def test_specialized_payload():
+    generic = Stealth().compile().bundle
+    assert 'log("loading' not in generic
+    assert 'log("loading' in Stealth(script_logging=True).compile().bundle
+    specialized = Stealth(specialize_payload=True, navigator_hardware_concurrency=8).compile().bundle
+    assert "opts.navigator_platform" not in specialized and "opts.navigator_platform" in generic
+    assert "opts.navigator_hardware_concurrency" not in specialized
+    # lists keep coming from the options object, so getters keep returning the same array
+    assert "opts.navigator_languages_override" in specialized
+    platform = Stealth(specialize_payload=True, navigator_platform_override="MacIntel")
+    assert 'get:()=>"MacIntel"' in platform.compile().bundle
+
+
+def test_default_bundles_are_prebuilt(tmp_path, monkeypatch):
+    # the package build pre-builds scripts.DEFAULT_EVASIONS without instantiating Stealth
+    assert tuple(Stealth()._evasion_names) == DEFAULT_EVASIONS
+    runtime = {engine: Stealth().compile(engine) for engine in ("chromium", "firefox")}
+    path = tmp_path / "bundles.json"
+    write_default_bundles(str(path))
+    monkeypatch.setattr(bundler, "PREBUILT_BUNDLES_PATH", path)
+    for cached in (bundler._prebuilt_bundles, bundler.bundle_evasions, bundler.build_bundle):
+        cached.cache_clear()
+    monkeypatch.setattr(stealth_module, "_BUNDLES", {})
+    monkeypatch.setattr(stealth_module, "_COMPILED_PAYLOADS", stealth_module.OrderedDict())
+    try:
+        for engine, compiled in runtime.items():
+            assert Stealth().compile(engine) == compiled
+        # the pre-built bundles were used, nothing was minified
+        assert bundler.build_bundle.cache_info().currsize == 0
+        # other evasion sets are still minified at runtime
+        assert Stealth(chrome_runtime=True).compile().bundle
+        assert bundler.build_bundle.cache_info().currsize == 1
+    finally:
+        bundler._prebuilt_bundles.cache_clear()
+        bundler.bundle_evasions.cache_clear()
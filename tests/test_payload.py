@@ -0,0 +1,95 @@
+import pickle
+import re
+import subprocess
+import sys
+
+import pytest
+
+from playwright_stealth import Stealth, CompiledPayload, ALL_EVASIONS_DISABLED_KWARGS
+from playwright_stealth.stealth import _origin_pattern
+
+
+def test_payload_is_memoized():
+    stealth = Stealth()
+    assert stealth.script_payload is stealth.script_payload
+    assert stealth.compile() is stealth.compile()
+
+
+def test_payload_cache_invalidated_on_option_change():
+    stealth = Stealth()
+    before = stealth.compile()
+    stealth.webgl_vendor_override = "Some Vendor"
+    after = stealth.compile()
+    assert before != after
+    assert "Some Vendor" in after.script
+
+
+def test_compiled_payload_is_hashable_and_comparable():
+    first, second = Stealth().compile(), Stealth().compile()
+    assert first == second
+    assert len({first, second}) == 1
+    assert first != Stealth(**ALL_EVASIONS_DISABLED_KWARGS).compile()
+    assert pickle.loads(pickle.dumps(first)) == first
+    assert isinstance(first, CompiledPayload)
+
+
+def test_script_sources_are_read_lazily():
+    check = (
+        "import playwright_stealth.stealth as s;"
+        "assert not s.SCRIPTS._sources;"
+        "s.Stealth(**{**s.ALL_EVASIONS_DISABLED_KWARGS, 'navigator_webdriver': True}).script_payload;"
+        "assert set(s.SCRIPTS._sources) == {'utils', 'navigator_webdriver'}, set(s.SCRIPTS._sources)"
+    )
+    subprocess.run([sys.executable, "-c", check], check=True)
+
+
+def test_bundle_is_shared_between_option_sets():
+    first = Stealth(navigator_user_agent_override="first user agent").compile()
+    second = Stealth(navigator_user_agent_override="second user agent").compile()
+    assert first.bundle is second.bundle
+    assert "user agent" not in first.bundle
+    assert "first user agent" in first.options_script
+    assert len(first.options_script) < 1000
+    assert first != second
+
+
+def test_instrumentation_is_only_bundled_when_enabled():
+    assert "instrumentation" not in Stealth().compile().bundle
+    instrumented = Stealth(instrumentation=True).compile().bundle
+    assert 'utils.instrumentation.startEvasion("media_codecs")' in instrumented
+
+
+def test_engine_variants_drop_chromium_only_evasions():
+    stealth = Stealth()
+    chromium, firefox = stealth.compile("chromium"), stealth.compile("firefox")
+    assert chromium is stealth.compile()
+    assert firefox is stealth.compile("firefox") is stealth.compile("webkit")
+    assert len(firefox.bundle) < len(chromium.bundle) / 2
+    assert "window.chrome" not in firefox.bundle and "window.chrome" in chromium.bundle
+    assert "sanitizeProxyError" not in firefox.bundle
+    with pytest.raises(ValueError):
+        stealth.compile("netscape")
+
+
+def test_frame_policy_guards_the_options_script():
+    assert Stealth().options_payload.startswith("Object.defineProperty(")
+    assert Stealth(frame_origin_allowlist=["https://*.example.com"]).options_payload.startswith("Object.defineProperty(")
+    top_only = Stealth(frame_policy="top").compile()
+    assert "window.top" in top_only.options_script
+    assert top_only.bundle == Stealth().compile().bundle
+    with pytest.raises(ValueError):
+        Stealth(frame_policy="cross-origin")
+
+
+def test_frame_origin_globs():
+    pattern = re.compile(_origin_pattern(["https://*.example.com", "http://localhost:8080"]))
+    assert pattern.match("https://cdn.example.com")
+    assert pattern.match("http://localhost:8080")
+    assert not pattern.match("https://cdn.example.com.evil.org")
+    assert not pattern.match("http://localhost:80800")
+
+
+def test_chrome_runtime_reads_its_insecure_origins_option():
+    stealth = Stealth(**{**ALL_EVASIONS_DISABLED_KWARGS, "chrome_runtime": True})
+    assert "opts.chrome_runtime_run_on_insecure_origins" in stealth.compile().bundle
+    assert '"chrome_runtime_run_on_insecure_origins": false' in stealth.compile().options_script
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from playwright_stealth import Stealth, AsyncStealthPool, SyncStealthPool
+from playwright_stealth.pool import _PooledContext
+
+
+@pytest.mark.parametrize("browser_type", ["chromium", "firefox"])
+async def test_async_pool_hands_out_stealthed_pages(browser_type: str, local_server: str):
+    async with AsyncStealthPool(Stealth(), browser_type=browser_type, contexts_per_browser=2, max_uses=2) as pool:
+        async def visit():
+            async with pool.page() as page:
+                await page.goto(local_server)
+                return await page.evaluate("navigator.webdriver")
+
+        assert await asyncio.gather(*(visit() for _ in range(5))) == [False] * 5
+        await asyncio.gather(*pool._refills)  # returned contexts are replaced in the background
+        stats = pool.stats
+        assert stats.acquired == 5
+        assert stats.recycled >= 1
+        assert stats.idle == 2
+        assert stats.in_use == stats.waiting == 0
+
+
+def test_sync_pool_raises_when_exhausted(local_server: str):
+    with SyncStealthPool(Stealth(), contexts_per_browser=1) as pool:
+        with pool.page() as page:
+            page.goto(local_server)
+            assert page.evaluate("navigator.webdriver") is False
+            with pytest.raises(RuntimeError):
+                with pool.context():
+                    pass
+        assert pool.stats.idle == 1
+
+
+def test_failed_replacement_keeps_the_slot_and_the_callers_error():
+    class Browser:
+        connected = True
+
+        def is_connected(self):
+            return self.connected
+
+    class Context:
+        def close(self):
+            pass
+
+    class FailingBrowserType:
+        def launch(self, **kwargs):
+            raise RuntimeError("relaunch failed")
+
+    pool = SyncStealthPool(Stealth(), contexts_per_browser=1)
+    browser = Browser()
+    pool._browsers = [browser]
+    pool._browser_type = FailingBrowserType()
+    pool._idle.append(_PooledContext(Context(), 0))
+
+    with pytest.raises(ValueError):
+        with pool.context():
+            browser.connected = False
+            raise ValueError("the caller's error")
+    assert pool.stats.idle == 1
+    with pytest.raises(RuntimeError, match="relaunch failed"):
+        with pool.context():
+            pass
+    assert pool.stats.idle == 1
+    assert pool.stats.in_use == 0
+
+
+async def test_concurrent_replacements_relaunch_a_dead_browser_once():
+    class Browser:
+        def __init__(self, connected=True):
+            self.connected = connected
+
+        def is_connected(self):
+            return self.connected
+
+        async def new_context(self, **kwargs):
+            return object()
+
+    class BrowserType:
+        launches = 0
+
+        async def launch(self, **kwargs):
+            self.launches += 1
+            await asyncio.sleep(0)
+            return Browser()
+
+    pool = AsyncStealthPool(Stealth())
+    pool._browsers = [Browser(connected=False)]
+    pool._browser_type = browser_type = BrowserType()
+    pool._relaunch_locks = [asyncio.Lock()]
+
+    await asyncio.gather(*(pool._new_context(0) for _ in range(4)))
+    assert browser_type.launches == 1
+
+
+async def test_cancelled_release_keeps_the_slot():
+    class Context:
+        pages = []
+
+        async def clear_cookies(self):
+            await asyncio.Event().wait()  # hangs until cancelled
+
+    class Browser:
+        def is_connected(self):
+            return True
+
+    pool = AsyncStealthPool(Stealth(), contexts_per_browser=1, isolate_storage=False)
+    pool._browsers = [Browser()]
+    pool._idle = asyncio.Queue()
+    pool._idle.put_nowait(_PooledContext(Context(), 0))
+
+    async def use():
+        async with pool.context():
+            pass
+
+    task = asyncio.ensure_future(use())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert pool.stats.idle == 1
+    assert pool.stats.in_use == 0
@@ -0,0 +1,30 @@
+import pytest
+
+from playwright_stealth import Stealth
+from playwright_stealth.profiles import DEFAULT_CATALOG
+
+
+def test_from_profile_sets_consistent_options():
+    stealth = Stealth.from_profile("macos-chrome-apple-m1")
+    assert stealth.navigator_platform_override == "MacIntel"
+    assert "Macintosh" in stealth.navigator_user_agent_override
+    assert "Apple M1" in stealth.webgl_renderer_override
+    assert isinstance(stealth.navigator_hardware_concurrency, int)
+
+
+def test_from_profile_overrides_and_unknown_profiles():
+    stealth = Stealth.from_profile("windows-chrome-intel-uhd620", navigator_languages_override=("de-DE", "de"))
+    assert stealth.navigator_languages_override == ("de-DE", "de")
+    with pytest.raises(KeyError):
+        Stealth.from_profile("no-such-profile")
+
+
+def test_random_profile_is_deterministic_per_seed():
+    assert Stealth.random_profile(seed=42).compile() == Stealth.random_profile(seed=42).compile()
+    profiles = {Stealth.random_profile(seed=seed).navigator_user_agent_override for seed in range(50)}
+    assert len(profiles) > 1
+
+
+def test_profile_payloads_are_shared():
+    for name in DEFAULT_CATALOG.names:
+        assert Stealth.from_profile(name).compile() is Stealth.from_profile(name).compile()
@@ -0,0 +1,46 @@
+import pickle
+
+from playwright import async_api
+
+from playwright_stealth import Stealth
+from playwright_stealth.runner import run
+
+
+async def visit(page: async_api.Page, url: str):
+    await page.goto(url)
+    return await page.title(), await page.evaluate("navigator.webdriver")
+
+
+async def fail(page: async_api.Page, url: str):
+    raise ValueError(url)
+
+
+def test_stealth_is_picklable():
+    stealth = Stealth(navigator_platform_override="MacIntel")
+    expected_payload = stealth.compile()
+    unpickled = pickle.loads(pickle.dumps(stealth))
+    assert unpickled.navigator_platform_override == "MacIntel"
+    assert unpickled.compile() == expected_payload
+
+
+def test_runner_streams_results_from_all_items(local_server):
+    urls = [f"{local_server}/page-{i}" for i in range(6)]
+    results = list(run(Stealth(), visit, urls, processes=2, concurrency=2))
+    assert sorted(result.item for result in results) == sorted(urls)
+    for result in results:
+        assert result.error is None, result.error
+        assert result.value == (result.item[len(local_server):], False)
+
+
+def test_runner_reports_task_errors(local_server):
+    results = list(run(Stealth(), fail, [local_server], processes=1, concurrency=1))
+    assert len(results) == 1
+    assert "ValueError" in results[0].error
+
+
+def test_runner_reports_context_errors_per_item(local_server):
+    urls = [f"{local_server}/page-{i}" for i in range(3)]
+    results = list(run(Stealth(), visit, iter(urls), processes=1, concurrency=1,
+                       context_kwargs={"color_scheme": "not-a-scheme"}))
+    assert sorted(result.item for result in results) == urls
+    assert all("color" in result.error.lower() for result in results)
@@ -0,0 +1,79 @@
+import pickle
+from contextlib import contextmanager
+
+import pytest
+
+from playwright_stealth import Stealth
+from playwright_stealth.tracing import NOOP_TRACER, HistogramTracer, OpenTelemetryTracer, Tracer
+
+
+class MockPage:
+    def __init__(self, context):
+        self.context = context
+
+    def add_init_script(self, script):
+        pass
+
+
+class MockContext:
+    def add_init_script(self, script):
+        pass
+
+    def new_page(self):
+        return MockPage(self)
+
+
+def test_hooked_methods_emit_spans():
+    tracer = HistogramTracer()
+    # noinspection PyTypeChecker
+    context = Stealth(tracer=tracer)._generate_hooked_new_context(MockContext, "chromium")()
+    context.new_page()
+    context.new_page()
+    snapshot = tracer.snapshot()
+    assert snapshot[("new_context", "chromium")].count == 1
+    assert snapshot[("new_page", "chromium")].count == 2
+    assert snapshot[("inject", "chromium")].count == 2
+    assert snapshot[("new_page", "chromium")].buckets[-1] == (float("inf"), 2)
+
+
+def test_histogram_buckets_are_cumulative():
+    tracer = HistogramTracer(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.5, 5.0):
+        tracer.observe("launch", "firefox", seconds)
+    histogram = tracer.snapshot()[("launch", "firefox")]
+    assert histogram.buckets == ((0.1, 1), (1.0, 3), (float("inf"), 4))
+    assert (histogram.count, histogram.min, histogram.max, histogram.mean) == (4, 0.05, 5.0, 1.5125)
+
+
+def test_open_telemetry_adapter_tags_spans():
+    started = []
+
+    class MockOpenTelemetryTracer:
+        @contextmanager
+        def start_as_current_span(self, name, attributes):
+            started.append((name, attributes))
+            yield
+
+    stealth = Stealth(tracer=OpenTelemetryTracer(MockOpenTelemetryTracer()), chrome_app=False)
+    # noinspection PyTypeChecker
+    stealth.apply_stealth_sync(MockContext(), engine="webkit")
+    [(name, attributes)] = started
+    assert name == "playwright_stealth.inject"
+    assert attributes["browser.engine"] == "webkit"
+    assert "navigator_webdriver" in attributes["playwright_stealth.evasions"]
+    # left out of the webkit payload
+    assert "media_codecs" not in attributes["playwright_stealth.evasions"]
+
+
+def test_tracer_is_not_pickled():
+    stealth = Stealth(tracer=HistogramTracer())
+    assert pickle.loads(pickle.dumps(stealth)).tracer is NOOP_TRACER
+    assert Stealth().tracer is NOOP_TRACER
+
+
+def test_incomplete_tracers_fail_when_created():
+    class IncompleteTracer(Tracer):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteTracer()
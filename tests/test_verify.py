@@ -0,0 +1,51 @@
+import json
+
+from playwright_stealth import Stealth
+from playwright_stealth.stealth import ENGINES
+from playwright_stealth.verify import (
+    CHECKS, cache_key, checks_script, default_configurations, verify_async, _load_cache, _store_cache,
+)
+
+
+def test_every_evasion_has_a_check():
+    stealth = Stealth(chrome_runtime=True, navigator_hardware_concurrency=True)
+    assert set(stealth._evasion_names) == set(CHECKS)
+    assert all(f"results[{json.dumps(name)}]" in checks_script(list(CHECKS)) for name in CHECKS)
+
+
+def test_cache_key_depends_on_payload_engine_and_browser_version():
+    payload = Stealth().compile()
+    keys = {
+        cache_key(payload, "chromium", "124.0"),
+        cache_key(payload, "chromium", "125.0"),
+        cache_key(payload, "firefox", "124.0"),
+        cache_key(Stealth(navigator_platform_override="Win32").compile(), "chromium", "124.0"),
+    }
+    assert len(keys) == 4
+    assert cache_key(Stealth().compile(), "chromium", "124.0") in keys
+
+
+def test_cache_round_trips_and_tolerates_corrupt_files(tmp_path):
+    path = str(tmp_path / "nested" / "verify.json")
+    assert _load_cache(path) == {}
+    _store_cache(path, {"key": {"payload": None}})
+    assert _load_cache(path) == {"key": {"payload": None}}
+    with open(path, "w") as cache_file:
+        cache_file.write("{not json")
+    assert _load_cache(path) == {}
+
+
+def test_default_configurations_compile_for_every_engine():
+    for stealth in default_configurations().values():
+        for engine in ENGINES:
+            assert stealth.compile(engine).bundle
+
+
+async def test_verification_matrix_passes_and_is_cached(tmp_path):
+    cache_path = str(tmp_path / "verify.json")
+    configurations = {name: default_configurations()[name] for name in ("default", "overrides", "specialized")}
+    results = await verify_async(configurations, cache_path=cache_path)
+    assert [result for result in results if not result.passed] == []
+    assert not any(result.cached for result in results)
+    # nothing changed, nothing is verified again
+    assert all(result.cached for result in await verify_async(configurations, cache_path=cache_path))